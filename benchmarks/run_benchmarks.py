@@ -0,0 +1,155 @@
+"""Runtime and peak memory benchmarks of grading and plotting on synthetic chart-scale data.
+
+    python benchmarks/run_benchmarks.py --scale small --output results.json
+    python benchmarks/run_benchmarks.py --scale small --output new.json --baseline results.json
+
+Synthetic data is generated once per scale and seed, and reused by later runs.
+With a baseline, exits with status 1 if any benchmark got slower or used more
+memory than the baseline by more than the tolerance.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from nugrade import MetricOptions, Reaction, grade_many_isotopes, plot_grades
+from nugrade.calc_energy_coverage import calc_energy_coverage
+from nugrade.chart_engine import get_chart_table_cache
+from nugrade.data_cache import get_data_cache
+from nugrade.data_store import load_channel
+from nugrade.grading_stages import get_stage_cache
+from nugrade.nuclide import plot_precision_data
+from nugrade.synthetic import write_synthetic_dataset
+
+# Nuclides, and typical points per reaction channel, of each benchmark scale
+SCALES = {"small": (20, 2000),
+          "medium": (300, 5000),
+          "large": (3000, 1000)}
+
+
+def measure(function, repeats):
+    """Best runtime over repeats, and the peak memory traced during one more call."""
+    seconds = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        seconds += [time.perf_counter() - start]
+    tracemalloc.start()
+    function()
+    peak_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"seconds": min(seconds), "peak_bytes": peak_bytes}
+
+
+def clear_caches():
+    get_data_cache().clear()
+    get_stage_cache().clear()
+    get_chart_table_cache().clear()
+
+
+def run_benchmarks(repeats):
+    options = MetricOptions()
+    options.set_neutrons()
+    options.required_reaction_channels = [(1, 'N,TOT'), (102, 'N,G')]
+    channel_files = [file_name for file_name in os.listdir("data") if file_name.endswith(".csv")
+                     and file_name != "all_reactions.csv"]
+    largest_file = max(channel_files, key=lambda file_name: os.path.getsize(os.path.join("data", file_name)))
+    reaction = Reaction(1, "N,TOT")
+    reaction.load_data(os.path.join("data", largest_file), options.get_data_columns())
+    channel_data = reaction.data[reaction.data['Energy'].between(options.lower_energy, options.upper_energy)]
+
+    def grade_cold():
+        clear_caches()
+        return grade_many_isotopes(options)
+
+    def grade_cached_data():
+        get_stage_cache().clear()
+        return grade_many_isotopes(options)
+
+    def grade_chart_cold():
+        clear_caches()
+        return grade_many_isotopes(options, engine="chart")
+
+    metrics = grade_cold()
+    benchmarks = {
+        "calc_energy_coverage": lambda: calc_energy_coverage(channel_data, options),
+        "Reaction.calc_metrics": lambda: reaction.calc_metrics(options),
+        "grade_many_isotopes": grade_cold,
+        "grade_many_isotopes (cached data)": grade_cached_data,
+        "grade_many_isotopes (chart)": grade_chart_cold,
+        "grade_many_isotopes (chart, cached)": lambda: grade_many_isotopes(options, engine="chart"),
+        "plot_grades": lambda: plot_grades(metrics, options),
+        "plot_precision_data": lambda: plot_precision_data(reaction, options.evaluation),
+    }
+    results = {}
+    for name, function in benchmarks.items():
+        print(f"Running {name}...", file=sys.stderr)
+        results[name] = measure(function, repeats)
+    return results, {"largest_channel": largest_file, "largest_channel_points": len(reaction.data)}
+
+
+def compare(results, baseline, tolerance):
+    """Descriptions of every benchmark that regressed by more than tolerance against baseline."""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        for measurement in ("seconds", "peak_bytes"):
+            ratio = result[measurement] / max(baseline[name][measurement], 1E-12)
+            if ratio > 1 + tolerance:
+                regressions += [f"{name}: {measurement} {baseline[name][measurement]:.4g} -> "
+                                f"{result[measurement]:.4g} ({ratio:.2f}x)"]
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark grading and plotting on synthetic data.")
+    parser.add_argument("--scale", choices=SCALES.keys(), default="small")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--work-dir", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "work"),
+                        help="Where synthetic datasets are generated and kept between runs.")
+    parser.add_argument("--columnar", action="store_true", help="Also write the columnar channel store.")
+    parser.add_argument("--output", required=True, help="JSON file the results are written to.")
+    parser.add_argument("--baseline", default=None, help="Results JSON of an earlier run to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative regression.")
+    args = parser.parse_args(argv)
+    output_path = os.path.abspath(args.output)
+    baseline_path = None if args.baseline is None else os.path.abspath(args.baseline)
+
+    # The data path is relative, so the benchmarks run from the dataset's directory
+    num_nuclides, points_per_channel = SCALES[args.scale]
+    dataset_dir = os.path.join(args.work_dir, f"{args.scale}-{args.seed}{'-columnar' * args.columnar}")
+    if not os.path.isfile(os.path.join(dataset_dir, "data", "all_reactions.csv")):
+        print(f"Generating the {args.scale} synthetic dataset...", file=sys.stderr)
+        write_synthetic_dataset(os.path.join(dataset_dir, "data"), num_nuclides, points_per_channel,
+                                seed=args.seed, columnar=args.columnar)
+    os.chdir(dataset_dir)
+
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        results, details = run_benchmarks(args.repeats)
+    report = {"scale": args.scale, "seed": args.seed, "num_nuclides": num_nuclides,
+              "points_per_channel": points_per_channel, **details,
+              "python": platform.python_version(), "numpy": np.__version__, "results": results}
+    with open(output_path, "w") as output_file:
+        json.dump(report, output_file, indent=1)
+    for name, result in results.items():
+        print(f"{name:36s} {result['seconds']*1000:10.2f} ms {result['peak_bytes']/1024**2:10.2f} MiB")
+
+    if baseline_path is not None:
+        with open(baseline_path) as baseline_file:
+            regressions = compare(results, json.load(baseline_file)["results"], args.tolerance)
+        for regression in regressions:
+            print("Regression: " + regression)
+        if len(regressions) > 0:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
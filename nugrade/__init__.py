@@ -1,8 +1,17 @@
 from .nuclide import Nuclide, Reaction
 from .metric_options import MetricOptions
-from .grading_functions import grade_isotope, grade_many_isotopes, plot_grades, nuclide_symbol_format
-from .ai_agent import NuclearDataAgent
+from .grading_functions import grade_isotope, grade_many_isotopes, plot_grades, plot_grades_json, nuclide_symbol_format
+from .result_cache import GradeCache
+from .sweep import sweep_grades
 
 __all__ = ['Nuclide', 'Reaction', 'MetricOptions',
-           'grade_isotope', 'grade_many_isotopes', 'plot_grades',
-           'nuclide_symbol_format']
+           'grade_isotope', 'grade_many_isotopes', 'plot_grades', 'plot_grades_json',
+           'nuclide_symbol_format', 'GradeCache', 'sweep_grades']
+
+
+def __getattr__(name):
+    # The AI agent pulls in the anthropic client, so it is only imported when first used
+    if name == "NuclearDataAgent":
+        from .ai_agent import NuclearDataAgent
+        return NuclearDataAgent
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
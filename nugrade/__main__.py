@@ -1,7 +1,206 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import pandas as pd
+from .config import NUGRADE_GRADING_WORKERS, NUGRADE_EVALUATIONS_PATH, NUGRADE_SNAPSHOT_PATH
+from .evaluations import register_library, register_libraries_directory
+from .metric_options import MetricOptions
+from .grading_functions import grade_many_isotopes, reaction_results_table, experiment_results_table, GRADING_ENGINES
+from .instrumentation import enable_instrumentation, disable_instrumentation, timing_logger
+from .snapshot import data_fingerprint, load_snapshot, save_snapshot
+from .weighting_functions import TabulatedSpectrum, register_spectrum
 
-def main():
+try:
+    import yaml
+except ImportError:  # PyYAML is only needed for YAML presets
+    yaml = None
+
+# Flags mirroring the MetricOptions fields, which override those of every preset
+OPTION_FLAGS = {"lower_energy": float,
+                "upper_energy": float,
+                "energy_width": float,
+                "energy_coverage_scale": str,
+                "evaluation": str,
+                "scored_metric": str,
+                "weighting_function": str}
+
+OUTPUT_FORMATS = (".jsonl", ".csv", ".parquet")
+
+
+def load_presets(preset_path):
+    """Reads named option dicts from a JSON or YAML file.
+
+    The file holds either a mapping of preset names to option dicts or a single
+    option dict, which is named after the file.
+    """
+    with open(preset_path) as preset_file:
+        if os.path.splitext(preset_path)[1].lower() in (".yaml", ".yml"):
+            if yaml is None:
+                raise ImportError("PyYAML is required to read YAML presets.")
+            presets = yaml.safe_load(preset_file)
+        else:
+            presets = json.load(preset_file)
+    if not all(isinstance(value, dict) for value in presets.values()):
+        presets = {os.path.splitext(os.path.basename(preset_path))[0]: presets}
+    return presets
+
+
+def build_options(preset, overrides):
+    """MetricOptions from the projectile's defaults, a preset dict and flag overrides."""
+    options = MetricOptions()
+    # A projectile given as a flag selects the defaults over the preset's
+    if (overrides.get("projectile") or preset.get("projectile", "n")) == "p":
+        options.set_protons()
+    else:
+        options.set_neutrons()
+    options.set_from_dict(preset)
+    options.set_from_dict(overrides)
+    return options
+
+
+def write_table(table, output_path):
+    """Writes a results table as JSON lines, CSV or Parquet depending on the file extension."""
+    extension = os.path.splitext(output_path)[1].lower()
+    if extension == ".jsonl":
+        table.to_json(output_path, orient="records", lines=True)
+    elif extension == ".csv":
+        table.to_csv(output_path, index=False)
+    elif extension == ".parquet":
+        table.to_parquet(output_path, index=False)
+    else:
+        raise ValueError(f"Unsupported output format: {output_path} (use .jsonl, .csv or .parquet)")
+
+
+def grade_command(args):
+    # Fail on unsupported output files before grading rather than after
+    for output_path in (args.output, args.experiments_output):
+        if output_path is not None and os.path.splitext(output_path)[1].lower() not in OUTPUT_FORMATS:
+            raise ValueError(f"Unsupported output format: {output_path} (use .jsonl, .csv or .parquet)")
+    register_libraries_directory(NUGRADE_EVALUATIONS_PATH)
+    for library in args.library:
+        name, separator, library_path = library.partition("=")
+        if separator == "":
+            raise ValueError(f"Libraries are given as NAME=PATH, not {library}")
+        register_library(name, library_path)
+    for spectrum in args.spectrum:
+        name, separator, spectrum_path = spectrum.partition("=")
+        if separator == "":
+            raise ValueError(f"Spectra are given as NAME=PATH, not {spectrum}")
+        register_spectrum(name, TabulatedSpectrum.from_csv(spectrum_path))
+    overrides = {field: getattr(args, field) for field in OPTION_FLAGS.keys() if getattr(args, field) is not None}
+    if args.projectile is not None:
+        overrides["projectile"] = args.projectile
+    if args.reactions is not None:
+        overrides["required_reaction_channels"] = args.reactions
+    presets = {}
+    for preset_path in args.preset:
+        presets.update(load_presets(preset_path))
+    if len(presets) == 0:
+        presets = {"default": {}}
+    if args.timing_log is not None:
+        timing_handler = logging.FileHandler(args.timing_log, mode="w")
+        timing_handler.setFormatter(logging.Formatter("%(message)s"))
+        timing_logger.addHandler(timing_handler)
+        timing_logger.setLevel(logging.INFO)
+        enable_instrumentation(log=True)
+        try:
+            grade_presets(args, presets, overrides)
+        finally:
+            disable_instrumentation()
+            timing_logger.removeHandler(timing_handler)
+            timing_handler.close()
+    else:
+        grade_presets(args, presets, overrides)
+
+
+def grade_presets(args, presets, overrides):
+    reaction_tables = []
+    experiment_tables = []
+    for preset_name, preset in presets.items():
+        options = build_options(preset, overrides)
+        metrics = grade_preset(args, preset_name, options)
+        reaction_table = reaction_results_table(metrics, options)
+        reaction_table.insert(0, "preset", preset_name)
+        reaction_tables += [reaction_table]
+        if args.experiments_output is not None:
+            experiment_table = experiment_results_table(metrics)
+            experiment_table.insert(0, "preset", preset_name)
+            experiment_tables += [experiment_table]
+
+    write_table(pd.concat(reaction_tables, ignore_index=True), args.output)
+    if args.experiments_output is not None:
+        write_table(pd.concat(experiment_tables, ignore_index=True), args.experiments_output)
+
+
+def grade_preset(args, preset_name, options):
+    # Whole charts are reused from their snapshot unless an input file changed since it was taken
+    use_snapshot = args.nuclides is None and not args.no_snapshot
+    if use_snapshot:
+        metrics = load_snapshot(options, catalogue_path=args.catalogue, snapshot_path=args.snapshot_dir,
+                                engine=args.engine)
+        if metrics is not None:
+            print(f"Loaded preset {preset_name} from its snapshot.", file=sys.stderr)
+            return metrics
+        fingerprint = data_fingerprint(options, catalogue_path=args.catalogue)
+    print(f"Grading preset {preset_name}...", file=sys.stderr)
+    metrics = grade_many_isotopes(options, catalogue_path=args.catalogue, workers=args.workers,
+                                  nuclides=args.nuclides, engine=args.engine)
+    if use_snapshot:
+        try:
+            save_snapshot(metrics, options, catalogue_path=args.catalogue, snapshot_path=args.snapshot_dir,
+                          fingerprint=fingerprint, engine=args.engine)
+        except OSError as e:
+            print(f"Could not save the snapshot of preset {preset_name}: {e}", file=sys.stderr)
+    return metrics
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="nugrade", description="Grade nuclear data against evaluations.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    grade_parser = subparsers.add_parser("grade", help="Grade the chart of nuclides without the web application.")
+    grade_parser.add_argument("--preset", action="append", default=[],
+                              help="JSON or YAML file of named option presets (may be repeated).")
+    grade_parser.add_argument("--projectile", choices=["n", "p"], help="Projectile, selecting the default options.")
+    for field, field_type in OPTION_FLAGS.items():
+        grade_parser.add_argument("--" + field.replace("_", "-"), dest=field, type=field_type,
+                                  help=f"Overrides {field} of every preset.")
+    grade_parser.add_argument("--library", action="append", default=[],
+                              help="Directory of pointwise evaluated cross sections usable as an evaluation, as NAME=PATH.")
+    grade_parser.add_argument("--spectrum", action="append", default=[],
+                              help="Tabulated flux spectrum CSV usable as a weighting function, as NAME=PATH.")
+    grade_parser.add_argument("--reactions", nargs="+", help="Reaction channels to grade, e.g. N,TOT N,G.")
+    grade_parser.add_argument("--nuclides", nargs="+", help="Nuclides to grade, e.g. 7Li Be-9. Default: all.")
+    grade_parser.add_argument("--workers", type=int, default=NUGRADE_GRADING_WORKERS,
+                              help="Worker processes used for grading.")
+    grade_parser.add_argument("--engine", choices=GRADING_ENGINES, default="nuclide",
+                              help="Grade nuclide by nuclide, or the whole chart in one vectorized pass.")
+    grade_parser.add_argument("--catalogue", default=None, help="Catalogue of nuclides with data available.")
+    grade_parser.add_argument("--output", required=True,
+                              help="Per-reaction results file (.jsonl, .csv or .parquet).")
+    grade_parser.add_argument("--experiments-output", default=None,
+                              help="Per-experiment results file (.jsonl, .csv or .parquet).")
+    grade_parser.add_argument("--timing-log", default=None,
+                              help="JSON lines file recording the time and rows of every grading stage.")
+    grade_parser.add_argument("--snapshot-dir", default=NUGRADE_SNAPSHOT_PATH,
+                              help="Directory of graded charts reused while their input files are unchanged.")
+    grade_parser.add_argument("--no-snapshot", action="store_true",
+                              help="Grade every preset from scratch, neither reading nor writing snapshots.")
+    grade_parser.set_defaults(run=grade_command)
+    return parser
+
+
+def main(argv=None):
     """Management script for the nugrade application."""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        args.run(args)
+    except (ImportError, KeyError, ValueError) as e:
+        parser.exit(1, f"nugrade: error: {e}\n")
 
 
 if __name__ == "__main__":  # pragma: no cover
-    main()
\ No newline at end of file
+    main()
@@ -1,20 +1,38 @@
-from anthropic import Anthropic
+from anthropic import Anthropic, AsyncAnthropic
+import asyncio
+import functools
 import os
 import json
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from .grading_functions import nuclide_symbol_format
+from .channel_summary import channel_summary
 
 class NuclearDataAgent:
-    def __init__(self, api_key):
-        self.client = Anthropic(api_key=api_key)
+    model = "claude-sonnet-4-5-20250929"
+    max_tokens = 4096
+
+    def __init__(self, api_key, base_url=None, tool_workers=4):
+        # base_url points the agent at another Messages API endpoint, e.g. a local stub server
+        self.client = Anthropic(api_key=api_key, base_url=base_url)
+        self.async_client = AsyncAnthropic(api_key=api_key, base_url=base_url)
         self.tools = self._define_tools()
         self.skill = self._load_skill()
+        # The tool definitions and the skill are the same every turn, so they are
+        # marked as a cached prompt prefix instead of being processed anew each time
+        self.tools[-1]["cache_control"] = {"type": "ephemeral"}
+        self.system = [{"type": "text", "text": self.skill, "cache_control": {"type": "ephemeral"}}]
+        self.tool_executor = ThreadPoolExecutor(max_workers=tool_workers)
+        self._loop = None
+        self._loop_lock = threading.Lock()
     
     def _define_tools(self):
         """Define available tools for Claude"""
         return [
             {
                 "name": "get_nuclear_data",
-                "description": "Retrieve experimental and evaluated cross section data for a specific nuclide and reaction.",
+                "description": "Retrieve a summary of the experimental cross section data for a specific nuclide and reaction compared to the evaluation being graded against: statistics of each experiment in log-energy bins, the worst fitting points and the widest energy gaps without data.",
                 "input_schema": {
                     "type": "object",
                     "properties": {
@@ -51,33 +69,44 @@ class NuclearDataAgent:
         with open('skills/nuclear-data-quality-assessment.md', 'r') as f:
             return f.read()
     
+    async def _execute_tools(self, tool_uses, metrics, options):
+        """Runs the tool calls of one turn concurrently in the tool worker pool,
+        returning their results as a single user message."""
+        loop = asyncio.get_running_loop()
+        tool_results = await asyncio.gather(*[
+            loop.run_in_executor(self.tool_executor, functools.partial(
+                self._safe_execute_tool, tool_use.name, tool_use.input, metrics=metrics, options=options))
+            for tool_use in tool_uses])
+        return {"role": "user",
+                "content": [{"type": "tool_result", "tool_use_id": tool_use.id, "content": tool_result}
+                            for tool_use, tool_result in zip(tool_uses, tool_results)]}
+
+    def _safe_execute_tool(self, tool_name, tool_input, metrics=None, options=None):
+        # A failing tool is reported to Claude rather than ending the conversation
+        try:
+            return self.execute_tool(tool_name, tool_input, metrics=metrics, options=options)
+        except Exception as e:
+            return f"Tool {tool_name} failed: {e}"
+
     def execute_tool(self, tool_name, tool_input, metrics=None, options=None):
         """Execute the requested tool"""
         if tool_name == "get_nuclear_data":
-            return self._get_nuclear_data(**tool_input, metrics=metrics)
+            return self._get_nuclear_data(**tool_input, metrics=metrics, options=options)
         elif tool_name == "list_available_nuclides":
             return self._list_available_nuclides(**tool_input, metrics=metrics)
         elif tool_name == "get_nugrade_report":
             return self._get_nugrade_report(**tool_input, metrics=metrics, options=options)
     
-    def _get_nuclear_data(self, nuclide, reaction_name, metrics):
-        """Accesses up to 500 points of nuclear cross section data for a given nuclide and reaction."""
+    def _get_nuclear_data(self, nuclide, reaction_name, metrics, options):
+        """Summarizes the cross section data of a given nuclide and reaction against the active evaluation.
+        Summaries are cached per channel and kept within NUGRADE_AGENT_SUMMARY_TOKENS."""
         nuclide_clean = nuclide_symbol_format(nuclide)
-        message = ""
-        if nuclide_clean in metrics.keys():
-            full_data = metrics[nuclide_clean].reactions[reaction_name].data
-            filtered_data =  full_data.sort_values(by="endf8_relative_error")
-            drop_columns = ['dEnergy', 'dData_assumed', 'MT', 'Dataset_Number', 'endf7-1_chi_squared', 
-            'endf7-1_relative_error','endf8_relative_error', 'endf8_chi_squared']
-            filtered_data = filtered_data.drop(columns=drop_columns).reset_index(drop=True)
-            if len(filtered_data) > 500:
-                message += f"Data long ({len(filtered_data)} points. Truncating to 500 points with highest error. "
-                filtered_data = filtered_data.iloc[0:500]
-            data_str = filtered_data.to_csv()
-        else:
-            message += f"{nuclide_clean} not found in data. "
-            data_str = ""
-        return data_str + f"\n{message}"
+        if nuclide_clean not in metrics.keys():
+            return f"{nuclide_clean} not found in data. "
+        if reaction_name not in metrics[nuclide_clean].reactions.keys():
+            return f"{reaction_name} of {nuclide_clean} is not being graded. "
+        return channel_summary(metrics[nuclide_clean].reactions[reaction_name].data, options.evaluation,
+                               label=f"{nuclide_clean} ({reaction_name})")
 
     def _get_nugrade_report(self, nuclide, reaction_name, metrics, options):
         """Accesses NuGrade computed summary for a given nuclide and reaction including energy coverage, 
@@ -114,9 +143,9 @@ class NuclearDataAgent:
         
         while True:
             response = self.client.messages.create(
-                model="claude-sonnet-4-5-20250929",
-                max_tokens=4096,
-                system=self.skill,
+                model=self.model,
+                max_tokens=self.max_tokens,
+                system=self.system,
                 tools=self.tools,
                 messages=conversation_history
             )
@@ -171,3 +200,80 @@ class NuclearDataAgent:
                 
                 return final_response, conversation_history
 
+    async def chat_stream(self, user_message, metrics, options, conversation_history=None):
+        """Streams the reply to user_message while it is generated.
+
+        Yields {"type": "text", "text": ...} for each text delta and
+        {"type": "tool_use", "name": ..., "input": ...} for each tool Claude calls.
+        The tools of one turn run concurrently. conversation_history is extended in place,
+        and left as it was if the turn fails or is abandoned before Claude's final answer.
+        """
+        if conversation_history is None:
+            conversation_history = []
+        turn_start = len(conversation_history)
+        conversation_history.append({
+            "role": "user",
+            "content": [{
+                "type": "text",
+                "text": user_message
+            }]
+        })
+
+        try:
+            while True:
+                async with self.async_client.messages.stream(
+                    model=self.model,
+                    max_tokens=self.max_tokens,
+                    system=self.system,
+                    tools=self.tools,
+                    messages=conversation_history
+                ) as stream:
+                    async for text in stream.text_stream:
+                        yield {"type": "text", "text": text}
+                    response = await stream.get_final_message()
+
+                conversation_history.append({
+                    "role": "assistant",
+                    "content": [block.to_dict() for block in response.content]
+                })
+                if response.stop_reason != "tool_use":
+                    return
+                tool_uses = [b for b in response.content if b.type == "tool_use"]
+                for tool_use in tool_uses:
+                    yield {"type": "tool_use", "name": tool_use.name, "input": tool_use.input}
+                conversation_history.append(await self._execute_tools(tool_uses, metrics, options))
+        except BaseException:
+            # A trailing user message or unanswered tool_use would make the next turn invalid
+            del conversation_history[turn_start:]
+            raise
+
+    def _event_loop(self):
+        # A single event loop thread owns the async client, so its connections are reused across chats
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, daemon=True).start()
+            return self._loop
+
+    def stream_chat(self, user_message, metrics, options, conversation_history=None):
+        """Iterates over the events of chat_stream from synchronous code, e.g. a Flask route.
+
+        A failure ends the stream with an {"type": "error", "error": ...} event.
+        """
+        events = queue.Queue()
+
+        async def produce():
+            try:
+                async for event in self.chat_stream(user_message, metrics, options, conversation_history):
+                    events.put(event)
+            except Exception as e:
+                events.put({"type": "error", "error": str(e)})
+            finally:
+                events.put(None)
+
+        asyncio.run_coroutine_threadsafe(produce(), self._event_loop())
+        while True:
+            event = events.get()
+            if event is None:
+                return
+            yield event
@@ -2,31 +2,87 @@ import numpy as np
 
 
 
-def calc_energy_coverage(channel_data, options):
-    lower_energy = options.lower_energy
-    upper_energy = options.upper_energy
+def calc_energy_coverage_segments(energies, offsets, options):
+    """Computes the energy coverage of many segments of one energy array in a single call.
+
+    Segment i spans energies[offsets[i]:offsets[i+1]], and the energies must be
+    ascending within each segment. Returns one coverage (%) per segment.
+    """
     energy_width = options.energy_width
-    scale = options.energy_coverage_scale
-    energies = channel_data['Energy'].to_numpy()
+    energies = scale_energies(np.asarray(energies, dtype=np.float64), options.energy_coverage_scale)
+    lower_energy, upper_energy = scale_energies(np.array([options.lower_energy, options.upper_energy]),
+                                                options.energy_coverage_scale)
+    offsets = np.asarray(offsets, dtype=np.intp)
 
-    if scale == "log":
-        energies = np.log10(channel_data['Energy'].to_numpy())
-        lower_energy = np.log10(lower_energy)
-        upper_energy = np.log10(upper_energy)
+    # Gaps between neighbouring points, excluding those that span two segments
+    num_points = len(energies)
+    gaps = np.diff(energies)
+    segment_breaks = offsets[(offsets > 0) & (offsets < num_points)] - 1
+    inner_gaps = np.ones(len(gaps), dtype=bool)
+    inner_gaps[segment_breaks] = False
 
-    elif scale == "linear":
-        pass
+    assert_message = "calc_energy_coverage failed, energies not ascending."
+    assert np.all(gaps[inner_gaps] >= 0), assert_message
 
-    else:
-        raise Exception(f"Unknown energy coverage scale option: {scale}")
+    # Space in excess of the energy width, padded so every segment end is a valid index
+    excess_space = np.zeros(num_points + 1)
+    excess_space[:-2][inner_gaps] = np.maximum(gaps[inner_gaps] - energy_width, 0.0)
+
+    starts = offsets[:-1]
+    ends = offsets[1:]
+    occupied = ends > starts
+    inner_space = np.zeros(len(starts))
+    if np.any(occupied):
+        inner_space[occupied] = np.add.reduceat(excess_space,
+                                                np.column_stack((starts[occupied], ends[occupied])).ravel())[::2]
+    return _coverage_from_space(energies, starts, ends, inner_space, lower_energy, upper_energy, energy_width)
+
+
+def scale_energies(energies, scale):
+    if scale == "log":
+        return np.log10(energies)
+    elif scale == "linear":
+        return energies
+    raise Exception(f"Unknown energy coverage scale option: {scale}")
 
-    assert_message = "calc_energy_coverage failed, energies not ascending."
-    assert np.all(energies[:-1] <= energies[1:]), assert_message
 
-    energies = np.hstack((lower_energy, energies, upper_energy))
+def _coverage_from_space(energies, starts, ends, inner_space, lower_energy, upper_energy, energy_width):
+    # Adds the space left before the first and after the last point of each
+    # segment to the space between its points, and converts it to a coverage (%)
+    occupied = ends > starts
     total_energy_space = upper_energy - lower_energy
-    differences = np.diff(energies)
-    differences[0] += energy_width/2
-    differences[-1] += energy_width/2
-    unoccupied_space = np.sum(differences[differences>energy_width]-energy_width)
-    return round((total_energy_space-unoccupied_space)/total_energy_space*100,7)
+
+    # Empty segments leave the whole energy range unoccupied
+    unoccupied_space = np.full(len(starts), total_energy_space)
+    if np.any(occupied):
+        starts = starts[occupied]
+        ends = ends[occupied]
+        leading_gap = energies[starts] - lower_energy + energy_width/2
+        trailing_gap = upper_energy - energies[ends - 1] + energy_width/2
+        unoccupied_space[occupied] = inner_space[occupied] + \
+                                     np.where(leading_gap > energy_width, leading_gap - energy_width, 0.0) + \
+                                     np.where(trailing_gap > energy_width, trailing_gap - energy_width, 0.0)
+    return np.round((total_energy_space-unoccupied_space)/total_energy_space*100, 7)
+
+
+def calc_energy_coverage_prefix(energies, gap_prefix_sums, starts, ends, options):
+    """Energy coverage of segments [starts, ends) of an ascending (scaled) energy layout.
+
+    gap_prefix_sums are the prefix sums of the space between neighbouring points
+    in excess of the energy width, so each segment costs O(1) however many
+    points it holds.
+    """
+    lower_energy, upper_energy = scale_energies(np.array([options.lower_energy, options.upper_energy]),
+                                                options.energy_coverage_scale)
+    starts = np.asarray(starts, dtype=np.intp)
+    ends = np.asarray(ends, dtype=np.intp)
+    occupied = ends > starts
+    inner_space = np.zeros(len(starts))
+    inner_space[occupied] = gap_prefix_sums[ends[occupied] - 1] - gap_prefix_sums[starts[occupied]]
+    return _coverage_from_space(energies, starts, ends, inner_space, lower_energy, upper_energy,
+                                options.energy_width)
+
+
+def calc_energy_coverage(channel_data, options):
+    energies = channel_data['Energy'].to_numpy()
+    return calc_energy_coverage_segments(energies, [0, len(energies)], options)[0]
@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+from .calc_energy_coverage import scale_energies
+from .data_store import DATA_FILE_COLUMNS
+
+
+def _prefix_sum(values, dtype=np.float64):
+    # Prefix sums with a leading zero, so the sum over [start, end) is P[end] - P[start]
+    prefix = np.zeros(len(values) + 1, dtype=dtype)
+    np.cumsum(values, out=prefix[1:])
+    return prefix
+
+
+class ChannelIndex:
+    """Layout of a channel's points built once, answering energy-window queries by binary search.
+
+    Channel data is sorted by energy, so any energy window is a contiguous range
+    of rows. Points are also laid out experiment by experiment, in row order,
+    under integer keys entry_code * num_points + row, so one vectorized
+    searchsorted finds every experiment's segment of a window. Prefix sums over
+    these layouts turn per-experiment counts, metric sums and coverage gaps of
+    any window into differences.
+    """
+    def __init__(self, data):
+        self.num_points = len(data)
+        self.energies = np.array(data["Energy"], dtype=np.float64)
+        assert np.all(self.energies[1:] >= self.energies[:-1]), \
+            "calc_energy_coverage failed, energies not ascending."
+
+        # Experiments, as the points of each EXFOR entry
+        self.entry_codes, entries = pd.factorize(data["EXFOR_Entry"])
+        self.num_entries = len(entries)
+        self.entry_order = np.argsort(self.entry_codes, kind="stable")
+        self.entry_keys = self.entry_codes[self.entry_order].astype(np.int64) * self.num_points + self.entry_order
+        # Completeness of the measured columns, whichever evaluation columns were loaded alongside
+        measured = data[[column for column in DATA_FILE_COLUMNS if column in data.columns]]
+        self.complete_rows = measured.notna().all(axis=1).to_numpy()[self.entry_order]
+
+        # Reported experiments, as distinct (EXFOR entry, author) pairs
+        pair_codes = data.groupby(["EXFOR_Entry", "Author"], sort=False, dropna=False).ngroup().to_numpy()
+        self.num_pairs = int(pair_codes.max()) + 1 if self.num_points > 0 else 0
+        self.pair_order = np.argsort(pair_codes, kind="stable")
+        self.pair_keys = pair_codes[self.pair_order].astype(np.int64) * self.num_points + self.pair_order
+        self.pair_ends = np.searchsorted(self.pair_keys, (np.arange(self.num_pairs) + 1) * self.num_points)
+
+        self.w_unc_rows = np.flatnonzero(data["dData"].notna().to_numpy())
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in (self.energies, self.entry_codes, self.entry_order, self.entry_keys,
+                                              self.complete_rows, self.pair_order, self.pair_keys,
+                                              self.pair_ends, self.w_unc_rows))
+
+    def window(self, lower_energy, upper_energy):
+        """Rows [start, end) with energies within [lower_energy, upper_energy] (inclusive)."""
+        return (int(np.searchsorted(self.energies, lower_energy, side="left")),
+                int(np.searchsorted(self.energies, upper_energy, side="right")))
+
+    def entry_segments(self, start, end):
+        """Start and end positions of each experiment's points within rows [start, end) in the entry layout."""
+        entry_keys = np.arange(self.num_entries, dtype=np.int64) * self.num_points
+        return np.searchsorted(self.entry_keys, entry_keys + start), np.searchsorted(self.entry_keys, entry_keys + end)
+
+    def first_experiment_rows(self, start, end):
+        """First row of each (EXFOR entry, author) pair within rows [start, end), in row order."""
+        pair_keys = np.arange(self.num_pairs, dtype=np.int64) * self.num_points
+        first = np.searchsorted(self.pair_keys, pair_keys + start)
+        present = first < self.pair_ends
+        present[present] = self.pair_order[first[present]] < end
+        return np.sort(self.pair_order[first[present]])
+
+    def num_w_unc(self, start, end):
+        return int(np.searchsorted(self.w_unc_rows, end) - np.searchsorted(self.w_unc_rows, start))
+
+    def coverage_layouts(self, energy_width, scale):
+        """Scaled energies and prefix sums of the space between neighbouring points in excess
+        of the energy width, for all points, the points with uncertainty and the entry layout."""
+        energies = scale_energies(self.energies, scale)
+        layouts = []
+        for layout_energies in (energies, energies[self.w_unc_rows], energies[self.entry_order]):
+            excess_space = np.maximum(np.diff(layout_energies) - energy_width, 0.0)
+            layouts += [(layout_energies, _prefix_sum(excess_space, dtype=np.longdouble))]
+        return layouts
+
+    def metric_prefix_sums(self, metric_values):
+        """Sums of the non-NaN metric values of every experiment over any window, and prefix
+        counts over the entry layout of the points with a metric and of the complete points
+        with one, as points without a metric are not complete."""
+        metric_values = metric_values[self.entry_order]
+        has_metric = ~np.isnan(metric_values)
+        return (EntryMetricSums(np.where(has_metric, metric_values, 0.0), self.entry_keys, self.num_entries,
+                                self.num_points),
+                _prefix_sum(has_metric, dtype=np.int64),
+                _prefix_sum(self.complete_rows & has_metric, dtype=np.int64))
+
+
+class EntryMetricSums:
+    """Prefix sums of non-negative values laid out experiment by experiment, banded by binary exponent.
+
+    Values are summed band by band in increasing order of exponent, so all values
+    before a band are smaller than any in it, and the difference of two prefix
+    sums is accurate relative to the values between them. Weights spanning many
+    orders of magnitude, as with thermal spectra, therefore do not swamp the sum
+    over a window of small values, while each window is still answered by
+    binary search.
+    """
+    def __init__(self, values, entry_keys, num_entries, num_points):
+        self.num_entries = num_entries
+        self.num_points = num_points
+        self.key_span = max(num_entries * num_points, 1)
+        nonzero = values > 0
+        values = values[nonzero]
+        band_codes = np.unique(np.frexp(values)[1], return_inverse=True)[1].ravel()
+        self.num_bands = int(band_codes.max(initial=-1)) + 1
+        order = np.lexsort((entry_keys[nonzero], band_codes))
+        self.keys = band_codes[order].astype(np.int64) * self.key_span + entry_keys[nonzero][order]
+        self.prefix_sums = _prefix_sum(values[order], dtype=np.longdouble)
+
+    @property
+    def nbytes(self):
+        return self.keys.nbytes + self.prefix_sums.nbytes
+
+    def window(self, start, end):
+        """Sum of the values of every experiment within rows [start, end)."""
+        entry_keys = np.arange(self.num_entries, dtype=np.int64) * self.num_points
+        bands = np.arange(self.num_bands, dtype=np.int64)[:, np.newaxis]
+        band_keys = bands * self.key_span + entry_keys
+        lower = np.searchsorted(self.keys, band_keys + start)
+        upper = np.searchsorted(self.keys, band_keys + end)
+        return np.sum(self.prefix_sums[upper] - self.prefix_sums[lower], axis=0).astype(np.float64)
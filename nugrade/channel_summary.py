@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+from .config import NUGRADE_AGENT_SUMMARY_TOKENS
+from .evaluations import evaluated_cross_section, evaluation_metric, evaluation_token
+from .render_cache import RenderCache, channel_render_key
+
+# Detail levels tried in turn until a summary fits its token budget, as
+# (log-energy bins per experiment, worst fitting points, energy gaps)
+SUMMARY_DETAIL_LEVELS = [(8, 20, 8), (4, 10, 5), (2, 5, 3), (1, 3, 2)]
+
+
+def estimate_tokens(text):
+    # Roughly four characters per token for English text and numbers
+    return (len(text) + 3) // 4
+
+
+def _fmt(value):
+    return "" if pd.isna(value) else f"{value:.3g}"
+
+
+def _rows(values):
+    return "\n".join(",".join(_fmt(value) if isinstance(value, (float, np.floating)) else str(value)
+                              for value in row) for row in values)
+
+
+def _summary_tables(data, evaluation):
+    """Per point values the summary is built from, in energy order."""
+    return pd.DataFrame({"energy": data["Energy"].to_numpy(),
+                         "data": data["Data"].to_numpy(),
+                         "ddata": data["dData"].to_numpy(),
+                         "evaluation": evaluated_cross_section(data, evaluation),
+                         "relative_error": evaluation_metric(data, evaluation, "relative_error"),
+                         "chi_squared": evaluation_metric(data, evaluation, "chi_squared"),
+                         "entry": data["EXFOR_Entry"].astype(str).to_numpy(),
+                         "author": data["Author"].astype(str).to_numpy(),
+                         "year": data["Year"].to_numpy()})
+
+
+def _render_summary(points, experiments, label, evaluation, num_bins, num_worst, num_gaps):
+    energies = points["energy"].to_numpy()
+    abs_relative_error = points["relative_error"].abs()
+    lines = [f"Summary of {label} against {evaluation}: {len(points)} points from {len(experiments)} experiments, "
+             f"{_fmt(energies[0])} to {_fmt(energies[-1])} eV.",
+             "rel_err_pct = (data - evaluation)/evaluation*100, chi2 = (data - evaluation)^2/assumed uncertainty.",
+             f"Overall mean |rel_err_pct| {_fmt(abs_relative_error.mean())}, median {_fmt(abs_relative_error.median())}, "
+             f"mean chi2 {_fmt(points['chi_squared'].mean())}, points without uncertainty "
+             f"{int(points['ddata'].isna().sum())}."]
+
+    lines += ["", "Experiments (entry,author,year,points,lower_eV,upper_eV,mean_abs_rel_err_pct,mean_chi2):",
+              _rows(experiments.itertuples(index=False))]
+
+    # Statistics of each experiment in bins of equal width in log energy
+    bin_edges = np.logspace(np.log10(max(energies[0], 1E-300)), np.log10(max(energies[-1], 1E-300)), num_bins + 1)
+    bins = np.clip(np.searchsorted(bin_edges, energies, side="right") - 1, 0, num_bins - 1)
+    binned = points.assign(bin=bins, abs_relative_error=abs_relative_error).groupby(
+        ["entry", "bin"], sort=False).agg(points=("energy", "size"), mean_rel_err=("relative_error", "mean"),
+                                          mean_abs_rel_err=("abs_relative_error", "mean"),
+                                          mean_chi2=("chi_squared", "mean")).reset_index()
+    binned["entry"] = pd.Categorical(binned["entry"], categories=experiments["entry"], ordered=True)
+    binned = binned.sort_values(["entry", "bin"])
+    if num_bins > 1:
+        lines += ["", f"Experiments in {num_bins} log-energy bins "
+                      "(entry,lower_eV,upper_eV,points,mean_rel_err_pct,mean_abs_rel_err_pct,mean_chi2):",
+                  _rows((row.entry, float(bin_edges[row.bin]), float(bin_edges[row.bin + 1]), row.points,
+                         row.mean_rel_err, row.mean_abs_rel_err, row.mean_chi2)
+                        for row in binned.itertuples(index=False))]
+
+    worst = points.iloc[np.argsort(-abs_relative_error.fillna(-1).to_numpy(), kind="stable")[:num_worst]]
+    lines += ["", f"{len(worst)} worst fitting points (energy_eV,data_b,ddata_b,evaluation_b,rel_err_pct,entry):",
+              _rows(worst[["energy", "data", "ddata", "evaluation", "relative_error", "entry"]].itertuples(index=False))]
+
+    # Widest stretches of energy between consecutive measurements
+    log_energies = np.log10(np.clip(energies, 1E-300, None))
+    gap_widths = np.diff(log_energies)
+    widest = np.sort(np.argsort(-gap_widths, kind="stable")[:num_gaps])
+    lines += ["", "Widest energy gaps without data (lower_eV,upper_eV,decades):",
+              _rows((float(energies[i]), float(energies[i+1]), float(gap_widths[i])) for i in widest)]
+    return "\n".join(lines)
+
+
+def summarize_channel(data, evaluation, label="", max_tokens=NUGRADE_AGENT_SUMMARY_TOKENS):
+    """Compact text summary of a channel's data against an evaluation, within about max_tokens.
+
+    Lists each experiment, its statistics in log-energy bins, the worst fitting
+    points and the widest energy gaps. Detail is reduced, and then the smallest
+    experiments are left out, until the summary fits the token budget.
+    """
+    if len(data) == 0:
+        return f"No data for {label}."
+    points = _summary_tables(data, evaluation)
+    experiments = points.assign(abs_relative_error=points["relative_error"].abs()).groupby(
+        "entry", sort=False).agg(author=("author", "first"), year=("year", "first"), points=("energy", "size"),
+                                 lower=("energy", "min"), upper=("energy", "max"),
+                                 mean_abs_rel_err=("abs_relative_error", "mean"),
+                                 mean_chi2=("chi_squared", "mean")).reset_index()
+    experiments = experiments.sort_values("points", ascending=False, kind="stable")
+    for num_bins, num_worst, num_gaps in SUMMARY_DETAIL_LEVELS:
+        summary = _render_summary(points, experiments, label, evaluation, num_bins, num_worst, num_gaps)
+        if estimate_tokens(summary) <= max_tokens:
+            return summary
+    num_experiments = len(experiments)
+    while num_experiments > 1:
+        num_experiments //= 2
+        kept = experiments.iloc[:num_experiments]
+        summary = _render_summary(points[points["entry"].isin(kept["entry"])], kept, label, evaluation,
+                                  *SUMMARY_DETAIL_LEVELS[-1])
+        summary += f"\nOnly the {num_experiments} largest of {len(experiments)} experiments are shown."
+        if estimate_tokens(summary) <= max_tokens:
+            return summary
+    return summary[:max_tokens * 4]
+
+
+_summary_cache = RenderCache(max_entries=256)
+
+
+def channel_summary(data, evaluation, label="", max_tokens=NUGRADE_AGENT_SUMMARY_TOKENS):
+    """summarize_channel, computed once per channel, evaluation and budget."""
+    def render():
+        return summarize_channel(data, evaluation, label, max_tokens)
+    sources, data_key = channel_render_key(data)
+    return _summary_cache.get_or_render(sources, (data_key, evaluation_token(evaluation), label, max_tokens), render)
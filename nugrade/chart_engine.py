@@ -0,0 +1,293 @@
+import functools
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from .config import NUGRADE_CHART_TABLE_CACHE_BYTES
+from .calc_energy_coverage import calc_energy_coverage_segments
+from .data_cache import get_data_cache
+from .data_store import DATA_FILE_COLUMNS
+from .evaluations import evaluation_metric, evaluates_channel, is_library
+from .grading_functions import GradingCancelled
+from .instrumentation import stage_timer, channel_context
+from .nuclide import Nuclide, Reaction, load_reaction_data
+from .weighting_functions import get_weight_cache
+
+METRIC_SUFFIXES = ("_chi_squared", "_relative_error")
+
+
+def _group_ids(*codes):
+    # Dense ids of the distinct combinations of integer codes, numbered in order of first appearance
+    keys = np.zeros(len(codes[0]), dtype=np.int64)
+    for code in codes:
+        code = np.asarray(code, dtype=np.int64) + 1
+        keys = keys * (int(code.max(initial=0)) + 1) + code
+    return pd.factorize(keys)[0]
+
+
+class ChartTable:
+    """Every graded channel of a chart consolidated into one table.
+
+    Rows are sorted by channel, then by energy within each channel, so any
+    per-channel energy window is a mask over the whole table. EXFOR entries,
+    authors and dataset numbers are categorical, and the precomputed metrics
+    are float32. Energies are kept as float64, as the coverage of narrow energy
+    bins depends on their full precision.
+    """
+    def __init__(self, channels, frames):
+        self.channels = channels
+        lengths = np.array([len(frame) for frame in frames], dtype=np.int64)
+        self.channel_offsets = np.concatenate(([0], np.cumsum(lengths)))
+        self.num_points = int(self.channel_offsets[-1])
+        self.channel_ids = np.repeat(np.arange(len(channels)), lengths)
+        self.row_positions = np.arange(self.num_points) - self.channel_offsets[self.channel_ids]
+
+        frames = [frame for frame in frames if len(frame) > 0]
+        if len(frames) == 0:
+            frames = [pd.DataFrame({"Energy": [], "dData": [], "EXFOR_Entry": [], "Author": [],
+                                    "Dataset_Number": []})]
+        # Experiments only count points with every measured column of their channel present
+        self.complete = np.concatenate([frame[[column for column in DATA_FILE_COLUMNS if column in frame.columns]]
+                                        .notna().all(axis=1).to_numpy() for frame in frames])
+        metric_columns = sorted(set(column for frame in frames for column in frame.columns
+                                    if column.endswith(METRIC_SUFFIXES)))
+        table = pd.concat([frame[[column for column in ["Energy", "dData", "EXFOR_Entry", "Author",
+                                                        "Dataset_Number"] + metric_columns
+                                  if column in frame.columns]] for frame in frames], ignore_index=True)
+        self.energies = table["Energy"].to_numpy(dtype=np.float64)
+        assert np.all((np.diff(self.energies) >= 0) | (np.diff(self.channel_ids) > 0)), \
+            "calc_energy_coverage failed, energies not ascending."
+        self.has_unc = table["dData"].notna().to_numpy()
+        self.label_dtypes = (table["EXFOR_Entry"].dtype, table["Author"].dtype)
+        self.entries = pd.Categorical(table["EXFOR_Entry"])
+        self.authors = pd.Categorical(table["Author"])
+        self.datasets = pd.Categorical(table["Dataset_Number"])
+        self.metrics = {column: table[column].to_numpy(dtype=np.float32) for column in metric_columns}
+
+        # Experiments of each channel as EXFOR entries, and as reported (entry, author) pairs
+        self.entry_ids = _group_ids(self.channel_ids, self.entries.codes)
+        self.num_entries = int(self.entry_ids.max(initial=-1)) + 1
+        self.entry_order = np.argsort(self.entry_ids, kind="stable")
+        self.pair_ids = _group_ids(self.channel_ids, self.entries.codes, self.authors.codes)
+
+        # Distinct dataset numbers per channel, counting a missing one as a dataset
+        dataset_ids = _group_ids(self.channel_ids, self.datasets.codes)
+        first_dataset_rows = np.unique(dataset_ids, return_index=True)[1]
+        self.num_measurements = np.bincount(self.channel_ids[first_dataset_rows], minlength=len(channels))
+
+    @property
+    def nbytes(self):
+        arrays = [self.channel_offsets, self.channel_ids, self.row_positions, self.complete, self.energies,
+                  self.has_unc, self.entries.codes, self.authors.codes, self.datasets.codes, self.entry_ids,
+                  self.entry_order, self.pair_ids, self.num_measurements] + list(self.metrics.values())
+        return sum(array.nbytes for array in arrays)
+
+    def metric_values(self, options, data_cache=None):
+        """The scored metric of every row against the options' evaluation."""
+        column = f"{options.evaluation}_{options.scored_metric}"
+        if column in self.metrics and not is_library(options.evaluation):
+            return self.metrics[column].astype(np.float64)
+        # Libraries are interpolated channel by channel onto the measured energies
+        if data_cache is None:
+            data_cache = get_data_cache()
+        values = np.full(self.num_points, np.nan)
+        for channel_id, (isotope, Z, A, symbol, mt, reaction_name) in enumerate(self.channels):
+            start, end = self.channel_offsets[channel_id:channel_id+2]
+            if end > start:
+                data = data_cache.get(options.projectile, Z, A, reaction_name, options.get_data_columns())
+                values[start:end] = evaluation_metric(data, options.evaluation, options.scored_metric)
+        return values
+
+    def grade(self, options, data_cache=None):
+        """Coverage, average metric and score of every channel, and the results of every
+        experiment, computed over the whole chart with grouped and segmented array operations."""
+        num_channels = len(self.channels)
+        window = (self.energies >= options.lower_energy) & (self.energies <= options.upper_energy)
+        rows = np.flatnonzero(window)
+        channel_offsets = np.searchsorted(self.channel_ids[rows], np.arange(num_channels + 1))
+        energy_coverage = calc_energy_coverage_segments(self.energies[rows], channel_offsets, options)
+        w_unc_rows = rows[self.has_unc[rows]]
+        energy_coverage_w_unc = calc_energy_coverage_segments(
+            self.energies[w_unc_rows], np.searchsorted(self.channel_ids[w_unc_rows], np.arange(num_channels + 1)),
+            options)
+
+        # Coverage, complete points and NaN-aware mean absolute weighted metric of every experiment
+        entry_rows = self.entry_order[window[self.entry_order]]
+        entry_offsets = np.searchsorted(self.entry_ids[entry_rows], np.arange(self.num_entries + 1))
+        entry_coverage = calc_energy_coverage_segments(self.energies[entry_rows], entry_offsets, options)
+        row_entries = self.entry_ids[rows]
+        # Spectra such as the constant flux return a scalar rather than a weight per energy
+        weights = np.broadcast_to(get_weight_cache().get_weights(options.weighting_function, self.energies),
+                                  self.energies.shape)
+        weighted_metric = np.abs(weights[rows] * self.metric_values(options, data_cache)[rows])
+        has_metric = ~np.isnan(weighted_metric)
+        metric_sums = np.bincount(row_entries[has_metric], weights=weighted_metric[has_metric],
+                                  minlength=self.num_entries)
+        metric_counts = np.bincount(row_entries[has_metric], minlength=self.num_entries)
+        # Points without a metric, e.g. outside an evaluation library's tabulated range, are not complete
+        num_complete = np.bincount(row_entries, weights=self.complete[rows] & has_metric,
+                                   minlength=self.num_entries)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            entry_metric_means = metric_sums / metric_counts
+
+        # Experiments without a single complete data point do not count
+        relevant = num_complete > 0
+        entry_coverage = np.where(relevant, entry_coverage, 0.0)
+        entry_metric = np.zeros(self.num_entries)
+        entry_metric[relevant] = entry_coverage[relevant] * entry_metric_means[relevant]
+
+        # Reported experiments, in order of their first point within the window
+        first_rows = np.sort(rows[np.unique(self.pair_ids[rows], return_index=True)[1]])
+        experiment_channels = self.channel_ids[first_rows]
+        experiment_metric = entry_metric[self.entry_ids[first_rows]]
+        experiment_coverage = entry_coverage[self.entry_ids[first_rows]]
+
+        # The error metric computed for each experiment, is weighted by
+        # that experiment's relative energy coverage
+        num_experiments = np.bincount(experiment_channels, minlength=num_channels)
+        coverage_sums = np.bincount(experiment_channels, weights=experiment_coverage, minlength=num_channels)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            coverage_fractions = experiment_coverage / coverage_sums[experiment_channels]
+            weighted_means = np.bincount(experiment_channels, weights=experiment_metric * coverage_fractions,
+                                         minlength=num_channels) / num_experiments
+        average_metric = np.where(coverage_sums > 0.0, weighted_means, 1.0)
+        if options.scored_metric == "chi_squared":
+            score = energy_coverage * (1/(1+average_metric))
+        else:
+            score = energy_coverage * (1/(1+average_metric/100))
+
+        experiments = pd.DataFrame({"EXFOR_Entry": self.entries[first_rows].astype(self.label_dtypes[0]),
+                                    "Author": self.authors[first_rows].astype(self.label_dtypes[1]),
+                                    f"avg_{options.evaluation}_{options.scored_metric}": experiment_metric,
+                                    "energy_coverage": experiment_coverage},
+                                   index=self.row_positions[first_rows])
+        return {"energy_coverage": energy_coverage,
+                "energy_coverage_w_unc": energy_coverage_w_unc,
+                "average_metric": average_metric,
+                "score": score,
+                "experiments": experiments,
+                "experiment_offsets": np.searchsorted(experiment_channels, np.arange(num_channels + 1))}
+
+
+class ChartTableCache:
+    """LRU cache of consolidated chart tables keyed by the channels they hold.
+
+    Tables are evicted least recently used first once their size exceeds
+    max_bytes. Cached tables are shared and must not be modified.
+    """
+    def __init__(self, max_bytes):
+        self.max_bytes = int(max_bytes)
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+
+    def put(self, key, table):
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key).nbytes
+            self._entries[key] = table
+            self.nbytes += table.nbytes
+            while self.nbytes > self.max_bytes and len(self._entries) > 0:
+                self.nbytes -= self._entries.popitem(last=False)[1].nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries),
+                    "nbytes": self.nbytes, "max_bytes": self.max_bytes}
+
+
+_shared_table_cache = ChartTableCache(NUGRADE_CHART_TABLE_CACHE_BYTES)
+
+
+def get_chart_table_cache():
+    """The consolidated chart table cache shared by every grading run in this process."""
+    return _shared_table_cache
+
+
+def build_chart_table(isotopes, options, data_cache=None, progress=None, cancel_event=None):
+    """Loads every required channel of isotopes, a list of (Z, A, symbol), into one ChartTable."""
+    if data_cache is None:
+        data_cache = get_data_cache()
+    columns = options.get_data_columns()
+    channels = []
+    frames = []
+    for z_val, a_val, symbol in isotopes:
+        if cancel_event is not None and cancel_event.is_set():
+            raise GradingCancelled("Grading cancelled before completion.")
+        isotope = str(a_val)+symbol
+        for mt, reaction_name in options.required_reaction_channels:
+            with channel_context(isotope, reaction_name):
+                with stage_timer("load") as timer:
+                    frames += [data_cache.get(options.projectile, z_val, a_val, reaction_name, columns)]
+                    timer.rows = len(frames[-1])
+            channels += [(isotope, int(z_val), int(a_val), symbol, mt, reaction_name)]
+        if progress is not None:
+            progress(isotope, len(channels) // len(options.required_reaction_channels), len(isotopes))
+    with stage_timer("consolidate", rows=sum(len(frame) for frame in frames)):
+        return ChartTable(channels, frames)
+
+
+def grade_chart(isotopes, options, data_cache=None, table_cache=None, progress=None, cancel_event=None):
+    """Grades isotopes, a list of (Z, A, symbol), in one vectorized pass over their
+    consolidated table, returning the graded Nuclide of each isotope.
+
+    Raw data and consolidated tables come from the shared caches unless others are given.
+    """
+    # As when grading nuclide by nuclide, raw data from the shared cache is released once graded
+    release_data = data_cache is None or data_cache is get_data_cache()
+    if data_cache is None:
+        data_cache = get_data_cache()
+    if table_cache is None:
+        table_cache = get_chart_table_cache()
+    table_key = (data_cache.data_path, options.projectile, tuple(isotopes),
+                 tuple(options.required_reaction_channels), tuple(options.get_data_columns()))
+    table = table_cache.get(table_key)
+    if table is None:
+        table = build_chart_table(isotopes, options, data_cache, progress, cancel_event)
+        table_cache.put(table_key, table)
+    elif progress is not None and len(isotopes) > 0:
+        progress(str(isotopes[-1][1])+isotopes[-1][2], len(isotopes), len(isotopes))
+    with stage_timer("chart", rows=table.num_points):
+        results = table.grade(options, data_cache)
+
+    # The same results structure as grading nuclide by nuclide, with the raw data released
+    graded = [Nuclide(int(z_val), int(a_val), symbol) for z_val, a_val, symbol in isotopes]
+    columns = options.get_data_columns()
+    experiment_offsets = results["experiment_offsets"]
+    for channel_id, (isotope, Z, A, symbol, mt, reaction_name) in enumerate(table.channels):
+        nuclide = graded[channel_id // len(options.required_reaction_channels)]
+        reaction = Reaction(mt, reaction_name)
+        num_datapoints = int(table.channel_offsets[channel_id+1] - table.channel_offsets[channel_id])
+        if num_datapoints > 0 and evaluates_channel(options.evaluation, options.projectile, Z, A, reaction_name):
+            reaction.energy_coverage = results["energy_coverage"][channel_id]
+            reaction.energy_coverage_w_unc = results["energy_coverage_w_unc"][channel_id]
+            reaction.average_metric = results["average_metric"][channel_id]
+            reaction.score = results["score"][channel_id]
+            reaction.experiment_results = results["experiments"].iloc[
+                experiment_offsets[channel_id]:experiment_offsets[channel_id+1]]
+            reaction.num_measurements = int(table.num_measurements[channel_id])
+            reaction.num_datapoints = num_datapoints
+            if release_data:
+                reaction.release_data(functools.partial(load_reaction_data, options.projectile, Z, A,
+                                                        reaction_name, options.get_report_columns()))
+            else:
+                reaction.data = data_cache.get(options.projectile, Z, A, reaction_name, columns)
+        nuclide.reactions[reaction_name] = reaction
+        nuclide.num_datasets += reaction.num_measurements
+    return graded
@@ -1 +1,20 @@
 NUGRADE_DATA_PATH = r"data/"
+NUGRADE_CATALOGUE_PATH = NUGRADE_DATA_PATH + "all_reactions.csv"  # Nuclides and reactions with data available
+NUGRADE_SPECTRA_PATH = NUGRADE_DATA_PATH + "spectra/"  # Tabulated flux spectra available as weighting functions
+NUGRADE_EVALUATIONS_PATH = NUGRADE_DATA_PATH + "evaluations/"  # Pointwise evaluated cross sections, one directory per library
+NUGRADE_STORE_DIRNAME = "columnar"  # Subdirectory of the data path holding the columnar channel store
+NUGRADE_SNAPSHOT_PATH = NUGRADE_DATA_PATH + "snapshots/"  # Graded charts saved to disk, reused until an input file changes
+NUGRADE_RESULT_CACHE_BYTES = 2 * 1024**3  # Memory budget for cached grade_many_isotopes results
+NUGRADE_DATA_CACHE_BYTES = 8 * 1024**3  # Memory budget for raw channel data shared across grading runs
+NUGRADE_STAGE_CACHE_BYTES = 4 * 1024**3  # Memory budget for intermediate grading stage results
+NUGRADE_WEIGHT_CACHE_BYTES = 512 * 1024**2  # Memory budget for flux spectrum weights at channel energies
+NUGRADE_EVALUATION_CACHE_BYTES = 1024**3  # Memory budget for evaluations interpolated onto channel energies
+NUGRADE_CHART_TABLE_CACHE_BYTES = 2 * 1024**3  # Memory budget for the consolidated tables of the chart grading engine
+NUGRADE_GRADING_WORKERS = 1  # Worker processes used by the app when grading the chart
+NUGRADE_GRADING_ENGINE = "nuclide"  # "nuclide" grades nuclide by nuclide, "chart" the whole chart in one vectorized pass
+NUGRADE_MAX_SESSIONS = 256  # Users whose options and graded chart the app keeps, least recently active dropped first
+NUGRADE_SESSION_IDLE_SECONDS = 24 * 3600  # Inactivity after which a user's session is dropped
+NUGRADE_PLOT_MAX_POINTS = 5000  # Points per reaction plot above which datasets are downsampled
+NUGRADE_AGENT_SUMMARY_TOKENS = 2000  # Approximate size of the channel summaries the AI agent's get_nuclear_data tool returns
+NUGRADE_INSTRUMENTATION = True  # Record stage timings in the app, served with cache statistics at /metrics
+NUGRADE_TIMING_LOG = False  # Also log every timed stage of the app as a JSON line to stderr
@@ -0,0 +1,116 @@
+import os
+import threading
+from collections import OrderedDict
+import pandas as pd
+from .config import NUGRADE_DATA_PATH, NUGRADE_DATA_CACHE_BYTES
+from .data_store import load_channel, read_isotope_catalogue
+
+
+class ChannelDataCache:
+    """Process-wide LRU cache of raw channel DataFrames keyed by (projectile, Z, A, reaction).
+
+    Memory is accounted in bytes and the least recently used channels are
+    evicted once max_bytes is exceeded, except for channels of pinned nuclides.
+    Cached frames are shared by every grading run and must not be modified.
+    """
+    def __init__(self, max_bytes, data_path=NUGRADE_DATA_PATH):
+        self.max_bytes = int(max_bytes)
+        self.data_path = data_path
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._pinned = set()
+        self._lock = threading.Lock()
+
+    def channel_path(self, projectile, Z, A, reaction_name):
+        return os.path.join(self.data_path, f"{projectile}_{Z}_{A}_{reaction_name}.csv")
+
+    def get(self, projectile, Z, A, reaction_name, columns=None):
+        """Returns the channel data, loading it from disk only if it is not cached.
+
+        The returned frame holds at least the requested columns (all columns if None).
+        """
+        key = (projectile, int(Z), int(A), reaction_name)
+        cached_columns = set()
+        with self._lock:
+            if key in self._entries:
+                data, loaded_columns, nbytes = self._entries[key]
+                if loaded_columns is None or (columns is not None and set(columns) <= loaded_columns):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return data
+                cached_columns = loaded_columns
+            self.misses += 1
+
+        # Widen a cached entry to the union of its columns and the requested ones
+        loaded_columns = None if columns is None else cached_columns | set(columns)
+        try:
+            data = load_channel(self.channel_path(*key), None if columns is None else sorted(loaded_columns))
+        except FileNotFoundError:
+            data = pd.DataFrame()
+        nbytes = int(data.memory_usage(index=True, deep=True).sum())
+
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key)[2]
+            self._entries[key] = (data, loaded_columns, nbytes)
+            self.nbytes += nbytes
+            self._evict()
+        if columns is None or loaded_columns == set(columns):
+            return data
+        projection = data[[column for column in data.columns if column in columns]]
+        projection.attrs = dict(data.attrs)
+        return projection
+
+    def _evict(self):
+        for key in list(self._entries.keys()):
+            if self.nbytes <= self.max_bytes:
+                break
+            if key[:3] in self._pinned:
+                continue
+            self.nbytes -= self._entries.pop(key)[2]
+            self.evictions += 1
+
+    def pin_nuclide(self, projectile, Z, A):
+        """Keeps every channel of a nuclide in memory regardless of the byte budget."""
+        with self._lock:
+            self._pinned.add((projectile, int(Z), int(A)))
+
+    def unpin_nuclide(self, projectile, Z, A):
+        with self._lock:
+            self._pinned.discard((projectile, int(Z), int(A)))
+            self._evict()
+
+    def warm_up(self, options_list, catalogue_path=None):
+        """Preloads the channels required by each of options_list for every nuclide in the
+        catalogue, stopping once the byte budget is full. Returns the number of channels read."""
+        num_loaded = 0
+        for Z, A, symbol in read_isotope_catalogue(catalogue_path):
+            for options in options_list:
+                for mt, reaction_name in options.required_reaction_channels:
+                    if self.nbytes >= self.max_bytes:
+                        return num_loaded
+                    self.get(options.projectile, Z, A, reaction_name, options.get_data_columns())
+                    num_loaded += 1
+        return num_loaded
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "entries": len(self._entries), "pinned_nuclides": len(self._pinned),
+                    "nbytes": self.nbytes, "max_bytes": self.max_bytes}
+
+
+_shared_data_cache = ChannelDataCache(NUGRADE_DATA_CACHE_BYTES)
+
+
+def get_data_cache():
+    """The raw data cache shared by every grading run in this process."""
+    return _shared_data_cache
@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+import json
+import os
+import re
+from .config import NUGRADE_DATA_PATH, NUGRADE_CATALOGUE_PATH, NUGRADE_STORE_DIRNAME
+
+# Columns read from every channel file, regardless of the evaluation
+DATA_FILE_COLUMNS = {'Energy': np.float64, 'dEnergy': np.float64, 'Data': np.float64, 'dData': np.float64,
+                     'EXFOR_Entry': str, 'Year': np.int16, 'Author': str, 'Dataset_Number': str}
+
+CHANNEL_FILE_PATTERN = re.compile(r"^([a-zA-Z]+)_(\d+)_(\d+)_(.+)\.csv$")
+MANIFEST_NAME = "manifest.json"
+
+
+def read_isotope_catalogue(catalogue_path=None):
+    """(Z, A, symbol) of every gradable nuclide listed in the reaction catalogue."""
+    if catalogue_path is None:
+        catalogue_path = NUGRADE_CATALOGUE_PATH
+    all_reactions = pd.read_csv(catalogue_path)
+    all_isotopes = all_reactions[["Z", "A", "Symbol"]].drop_duplicates()
+    isotopes = []
+    for z_val, a_val, symbol in all_isotopes.itertuples(index=False):
+        if symbol == "Heavy Water" or symbol == "n" or a_val == 0:
+            continue
+        isotopes += [(z_val, a_val, symbol)]
+    return isotopes
+
+
+def channel_store_path(dataset_path):
+    """Columnar store directory corresponding to a {projectile}_{Z}_{A}_{reaction}.csv path."""
+    data_dir, data_file = os.path.split(dataset_path)
+    stem = os.path.splitext(data_file)[0]
+    return os.path.join(data_dir, NUGRADE_STORE_DIRNAME, stem)
+
+
+def is_channel_store(store_path):
+    return os.path.isfile(os.path.join(store_path, MANIFEST_NAME))
+
+
+def channel_file_size(dataset_path):
+    """Bytes on disk of a channel, preferring its columnar store; 0 if it has no data."""
+    store_path = channel_store_path(dataset_path)
+    if is_channel_store(store_path):
+        return sum(entry.stat().st_size for entry in os.scandir(store_path) if entry.is_file())
+    if os.path.isfile(dataset_path):
+        return os.path.getsize(dataset_path)
+    return 0
+
+
+def read_channel_csv(dataset_path, columns=None):
+    if columns is None:
+        return pd.read_csv(dataset_path, dtype=DATA_FILE_COLUMNS)
+    wanted = set(columns)
+    return pd.read_csv(dataset_path, dtype=DATA_FILE_COLUMNS, usecols=lambda c: c in wanted)
+
+
+def write_channel_store(channel_data, store_path, source=""):
+    """Writes one .npy file per column plus a manifest describing them.
+
+    Missing values of string columns are recorded in a separate null mask file,
+    so they are read back as missing rather than as text.
+    """
+    os.makedirs(store_path, exist_ok=True)
+    manifest = {"source": source, "num_rows": len(channel_data), "columns": []}
+    for i, column in enumerate(channel_data.columns):
+        values = channel_data[column]
+        column_file = f"col_{i:03d}.npy"
+        column_entry = {"name": column, "file": column_file}
+        if values.dtype.kind in "biuf":
+            array = values.to_numpy()
+        else:
+            # Fixed width unicode keeps string columns memory mappable
+            is_null = values.isna().to_numpy()
+            array = values.astype(str).where(~is_null, "").to_numpy(dtype=str)
+            if np.any(is_null):
+                column_entry["null_file"] = f"col_{i:03d}_null.npy"
+                np.save(os.path.join(store_path, column_entry["null_file"]), is_null, allow_pickle=False)
+        np.save(os.path.join(store_path, column_file), array, allow_pickle=False)
+        manifest["columns"] += [column_entry]
+    with open(os.path.join(store_path, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=1)
+
+
+def read_channel_store(store_path, columns=None):
+    """Loads a channel from its columnar store, only touching the requested columns."""
+    with open(os.path.join(store_path, MANIFEST_NAME), "r") as f:
+        manifest = json.load(f)
+    column_data = {}
+    for entry in manifest["columns"]:
+        if columns is not None and entry["name"] not in columns:
+            continue
+        array = np.load(os.path.join(store_path, entry["file"]), mmap_mode='r', allow_pickle=False)
+        if "null_file" in entry:
+            array = array.astype(object)
+            array[np.load(os.path.join(store_path, entry["null_file"]), allow_pickle=False)] = np.nan
+        column_data[entry["name"]] = np.asarray(array)
+    return pd.DataFrame(column_data)
+
+
+def load_channel(dataset_path, columns=None):
+    """Loads a channel from its columnar store if one has been built, otherwise from the CSV."""
+    store_path = channel_store_path(dataset_path)
+    if is_channel_store(store_path):
+        channel_data = read_channel_store(store_path, columns)
+    else:
+        channel_data = read_channel_csv(dataset_path, columns)
+    # Remember which channel the data is, e.g. to look up evaluated cross sections for it
+    match = CHANNEL_FILE_PATTERN.match(os.path.basename(dataset_path))
+    if match is not None:
+        projectile, Z, A, reaction_name = match.groups()
+        channel_data.attrs["channel"] = (projectile, int(Z), int(A), reaction_name)
+    return channel_data
+
+
+def convert_csv_directory(data_path=NUGRADE_DATA_PATH, overwrite=False):
+    """One-shot conversion of every channel CSV in data_path into the columnar store."""
+    converted = []
+    for data_file in sorted(os.listdir(data_path)):
+        if CHANNEL_FILE_PATTERN.match(data_file) is None:
+            continue
+        dataset_path = os.path.join(data_path, data_file)
+        store_path = channel_store_path(dataset_path)
+        if is_channel_store(store_path) and not overwrite:
+            continue
+        write_channel_store(read_channel_csv(dataset_path), store_path, source=data_file)
+        converted += [data_file]
+    return converted
+
+
+if __name__ == "__main__":  # pragma: no cover
+    import sys
+    paths = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    data_path = paths[0] if len(paths) > 0 else NUGRADE_DATA_PATH
+    for converted_file in convert_csv_directory(data_path, overwrite="--overwrite" in sys.argv):
+        print(f"Converted {converted_file}")
@@ -0,0 +1,65 @@
+import numpy as np
+
+
+def lttb_indices(x, y, num_out):
+    """Largest-Triangle-Three-Buckets downsampling of a curve sorted in x.
+
+    Keeps the first and last points, then picks from each of num_out-2 buckets
+    the point forming the largest triangle with the previously kept point and
+    the average of the next bucket, which preserves peaks and dips.
+    """
+    num_points = len(x)
+    if num_out >= num_points:
+        return np.arange(num_points)
+    if num_out < 3:
+        return np.array([0, num_points - 1])[:num_out]
+
+    bucket_edges = np.linspace(1, num_points - 1, num_out - 1).astype(int)
+    selected = np.empty(num_out, dtype=np.intp)
+    selected[0] = 0
+    selected[-1] = num_points - 1
+    a = 0
+    for i in range(num_out - 2):
+        start = bucket_edges[i]
+        end = max(bucket_edges[i+1], start + 1)
+        if i + 2 < len(bucket_edges):
+            next_start, next_end = bucket_edges[i+1], max(bucket_edges[i+2], bucket_edges[i+1] + 1)
+        else:
+            next_start, next_end = num_points - 1, num_points
+        avg_x = np.mean(x[next_start:next_end])
+        avg_y = np.mean(y[next_start:next_end])
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i+1] = a
+    return selected
+
+
+def downsample_by_dataset(energies, values, dataset_codes, max_points):
+    """Row indices keeping at most max_points points in total.
+
+    Each dataset is downsampled separately with LTTB in log-energy/log-value
+    space. Every dataset keeps up to 3 points, fewer if there are too many
+    datasets for the budget, and the rest of the budget is shared in proportion
+    to their sizes. Returns the selected rows in their original order.
+    """
+    num_points = len(energies)
+    if max_points is None or num_points <= max_points:
+        return np.arange(num_points)
+    log_energies = np.log10(np.clip(energies, 1E-300, None))
+    log_values = np.nan_to_num(np.log10(np.clip(np.abs(values), 1E-300, None)))
+
+    # Rows without a dataset (code -1, as from pd.factorize) are downsampled as a dataset of their own
+    dataset_codes = np.where(dataset_codes < 0, np.max(dataset_codes) + 1, dataset_codes)
+    order = np.argsort(dataset_codes, kind="stable")
+    offsets = np.searchsorted(dataset_codes[order], np.arange(np.max(dataset_codes) + 2))
+    sizes = np.diff(offsets)
+    minimum = np.minimum(sizes, min(3, max_points // len(sizes)))
+    share = (max_points - np.sum(minimum)) * (sizes - minimum) / np.sum(sizes - minimum)
+    budgets = minimum + np.floor(share).astype(np.int64)
+    # Points left over from rounding down go to the datasets rounded down the most
+    budgets[np.argsort(np.floor(share) - share, kind="stable")[:max_points - np.sum(budgets)]] += 1
+    selected = []
+    for start, end, dataset_budget in zip(offsets[:-1], offsets[1:], budgets):
+        rows = order[start:end]
+        selected += [rows[lttb_indices(log_energies[rows], log_values[rows], dataset_budget)]]
+    return np.sort(np.concatenate(selected))
@@ -0,0 +1,216 @@
+import itertools
+import json
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from .config import NUGRADE_EVALUATION_CACHE_BYTES
+
+INTERPOLATION_SCHEMES = ("lin-lin", "log-log")
+LIBRARY_METADATA_NAME = "library.json"
+
+
+def interpolate_cross_section(tabulated_energies, tabulated_xs, energies, interpolation="lin-lin"):
+    """Interpolates a pointwise cross section onto energies (NaN outside the tabulated range).
+
+    Repeated tabulated energies mark discontinuities, where the value above is used.
+    """
+    energies = np.asarray(energies, dtype=np.float64)
+    num_tabulated = len(tabulated_energies)
+    upper = np.clip(np.searchsorted(tabulated_energies, energies, side="right"), 1, num_tabulated - 1)
+    lower = upper - 1
+    if interpolation == "lin-lin":
+        x, x0, x1 = energies, tabulated_energies[lower], tabulated_energies[upper]
+        y0, y1 = tabulated_xs[lower], tabulated_xs[upper]
+    elif interpolation == "log-log":
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x, x0, x1 = np.log(energies), np.log(tabulated_energies[lower]), np.log(tabulated_energies[upper])
+            y0, y1 = np.log(tabulated_xs[lower]), np.log(tabulated_xs[upper])
+    else:
+        raise Exception(f"Unknown interpolation scheme: {interpolation}")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fraction = np.where(x1 > x0, (x - x0) / (x1 - x0), 1.0)
+        values = y0 + fraction * (y1 - y0)
+    if interpolation == "log-log":
+        values = np.exp(values)
+    in_range = (energies >= tabulated_energies[0]) & (energies <= tabulated_energies[-1])
+    return np.where(in_range, values, np.nan)
+
+
+class EvaluationLibrary:
+    """Pointwise evaluated cross sections, stored once per channel as
+    {path}/{projectile}_{Z}_{A}_{reaction}.csv with columns Energy (eV) and XS (b)."""
+    def __init__(self, name, path, interpolation="lin-lin"):
+        if interpolation not in INTERPOLATION_SCHEMES:
+            raise Exception(f"Unknown interpolation scheme: {interpolation}")
+        self.name = name
+        self.path = path
+        self.interpolation = interpolation
+
+    def channel_path(self, projectile, Z, A, reaction_name):
+        return os.path.join(self.path, f"{projectile}_{Z}_{A}_{reaction_name}.csv")
+
+    def has_channel(self, projectile, Z, A, reaction_name):
+        return os.path.isfile(self.channel_path(projectile, Z, A, reaction_name))
+
+    def read_channel(self, projectile, Z, A, reaction_name):
+        """Tabulated energies and cross sections of a channel, sorted by energy."""
+        table = pd.read_csv(self.channel_path(projectile, Z, A, reaction_name), usecols=["Energy", "XS"])
+        table = table.sort_values("Energy", kind="stable")
+        return table["Energy"].to_numpy(dtype=np.float64), table["XS"].to_numpy(dtype=np.float64)
+
+    def evaluate(self, projectile, Z, A, reaction_name, energies):
+        """The library's cross section at energies; NaN everywhere if it has no such channel."""
+        try:
+            tabulated_energies, tabulated_xs = self.read_channel(projectile, Z, A, reaction_name)
+        except FileNotFoundError:
+            return np.full(len(energies), np.nan)
+        return interpolate_cross_section(tabulated_energies, tabulated_xs, energies, self.interpolation)
+
+
+# Libraries available as MetricOptions.evaluation besides the precomputed data columns,
+# with a generation number that changes whenever a name is registered again
+_libraries = {}
+_generations = itertools.count()
+
+
+def register_library(name, path, interpolation=None):
+    """Makes the library in directory path available as an evaluation under name. Unless given,
+    the interpolation scheme is read from the library's library.json, defaulting to lin-lin."""
+    metadata_path = os.path.join(path, LIBRARY_METADATA_NAME)
+    if interpolation is None and os.path.isfile(metadata_path):
+        with open(metadata_path) as metadata_file:
+            interpolation = json.load(metadata_file).get("interpolation")
+    if interpolation is None:
+        interpolation = "lin-lin"
+    _libraries[name] = (EvaluationLibrary(name, path, interpolation), next(_generations))
+
+
+def register_libraries_directory(directory):
+    """Registers every subdirectory of directory as a library named after it, returning the names."""
+    if not os.path.isdir(directory):
+        return []
+    names = []
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if not os.path.isdir(path):
+            continue
+        register_library(name, path)
+        names += [name]
+    return names
+
+
+def registered_libraries():
+    """{name: EvaluationLibrary} of every registered library, e.g. to register them again in worker processes."""
+    return {name: library for name, (library, generation) in _libraries.items()}
+
+
+def get_library(name):
+    if name not in _libraries:
+        raise KeyError(f"Unknown evaluation: {name}")
+    return _libraries[name][0]
+
+
+def evaluation_token(evaluation):
+    """Identifies the library currently registered under an evaluation's name, for cache keys.
+    Evaluations only available as precomputed data columns have no generation."""
+    if evaluation not in _libraries:
+        return evaluation, None
+    return evaluation, _libraries[evaluation][1]
+
+
+class EvaluatedCache:
+    """A library's cross section at each channel's EXFOR energies, kept until the byte budget is exceeded.
+
+    Channel data is identified by its channel and length, as in
+    render_cache.channel_render_key, so only the interpolated values are held
+    and the raw data stays under the channel data cache's budget.
+    """
+    def __init__(self, max_bytes):
+        self.max_bytes = int(max_bytes)
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, evaluation, data):
+        library, generation = _libraries[evaluation]
+        if "channel" not in data.attrs:
+            raise KeyError("Channel data without its (projectile, Z, A, reaction) cannot be evaluated.")
+        key = (evaluation, generation, data.attrs["channel"], len(data))
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+        evaluated = library.evaluate(*data.attrs["channel"], data["Energy"].to_numpy())
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key).nbytes
+            self._entries[key] = evaluated
+            self.nbytes += evaluated.nbytes
+            while self.nbytes > self.max_bytes and len(self._entries) > 0:
+                self.nbytes -= self._entries.popitem(last=False)[1].nbytes
+        return evaluated
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries),
+                    "nbytes": self.nbytes, "max_bytes": self.max_bytes}
+
+
+_shared_evaluated_cache = EvaluatedCache(NUGRADE_EVALUATION_CACHE_BYTES)
+
+
+def get_evaluated_cache():
+    """The interpolated evaluation cache shared by every grading run in this process."""
+    return _shared_evaluated_cache
+
+
+def evaluated_cross_section(data, evaluation):
+    """An evaluation's cross section at every point of a channel, from its data column if
+    present, otherwise interpolated from the registered library."""
+    if evaluation in data.columns:
+        return data[evaluation].to_numpy()
+    return get_evaluated_cache().get(evaluation, data)
+
+
+def evaluation_metric(data, evaluation, metric):
+    """relative_error (%) or chi_squared of every point of a channel against an evaluation.
+
+    Precomputed {evaluation}_{metric} columns are used when present.
+    """
+    column = f"{evaluation}_{metric}"
+    if column in data.columns:
+        return data[column].to_numpy()
+    evaluated = evaluated_cross_section(data, evaluation)
+    measured = data["Data"].to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if metric == "relative_error":
+            # Undefined where the evaluation is zero, as in the precomputed columns
+            return np.where(evaluated != 0, (measured - evaluated) / evaluated * 100, np.nan)
+        elif metric == "chi_squared":
+            return (measured - evaluated)**2 / data["dData_assumed"].to_numpy()
+    raise Exception(f"Unknown metric: {metric}")
+
+
+def is_library(evaluation):
+    return evaluation in _libraries
+
+
+def evaluates_channel(evaluation, projectile, Z, A, reaction_name):
+    """Whether evaluation has a cross section for the channel. Libraries lacking a channel
+    leave it ungraded, evaluations given as precomputed data columns are assumed to cover it."""
+    return evaluation not in _libraries or get_library(evaluation).has_channel(projectile, Z, A, reaction_name)
+
+
+def has_evaluation(data, evaluation):
+    return f"{evaluation}_relative_error" in data.columns or evaluation in _libraries
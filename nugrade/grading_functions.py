@@ -1,13 +1,21 @@
 from .nuclide import Nuclide
-from bokeh.models import ColumnDataSource, LabelSet, CategoricalColorMapper, Div
-from bokeh.plotting import figure, show
-from bokeh.embed import components
-from bokeh.palettes import inferno
-from bokeh.layouts import column
+from .data_store import read_isotope_catalogue, channel_file_size
+from .data_cache import get_data_cache
+from .render_cache import RenderCache
+from .result_cache import options_key
+from .instrumentation import enable_instrumentation, get_timings, stage_timer
+from .evaluations import register_library, registered_libraries
+from .weighting_functions import register_spectrum, registered_spectra
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import json
+import logging
+import multiprocessing
 import numpy as np
 import pandas as pd
 import re 
 
+logger = logging.getLogger(__name__)
+
 def nuclide_symbol_format(input_nuclide):
     input_str = str(input_nuclide).replace(" ","")
     if "-" in input_str:
@@ -26,24 +34,195 @@ def grade_isotope(Z, A, symbol, options):
     return nuc
 
 
-def grade_many_isotopes(options):
-    all_reactions = pd.read_csv("data/all_reactions.csv")
-    all_isotopes = all_reactions[["Z","A","Symbol"]].drop_duplicates()
+class GradingCancelled(Exception):
+    """Raised when a grading run is cancelled before it completes."""
+
+
+# Set in worker processes by _init_worker, so workers stop between nuclides once a run is cancelled
+_worker_cancel_event = None
+
+
+def _init_worker(cancel_event, spectra, libraries):
+    # Spectra and evaluation libraries registered in the parent are registered again,
+    # as worker processes do not inherit them unless they are forked
+    global _worker_cancel_event
+    _worker_cancel_event = cancel_event
+    for name, spectrum in spectra.items():
+        register_spectrum(name, spectrum)
+    for name, library in libraries.items():
+        register_library(name, library.path, library.interpolation)
+
+
+def _grade_chunk(chunk, options, timing_log=None):
+    # Runs in a worker process, grading a list of (index, Z, A, symbol). Unless timing_log
+    # is None, stage timings of this chunk are recorded and returned to merge in the parent
+    timings = None
+    if timing_log is not None:
+        timings = enable_instrumentation(log=timing_log)
+        timings.clear()
+    graded = []
+    for index, z_val, a_val, symbol in chunk:
+        if _worker_cancel_event is not None and _worker_cancel_event.is_set():
+            raise GradingCancelled("Grading cancelled before completion.")
+        logger.info("Evaluating %s...", str(a_val)+symbol)
+        graded += [(index, grade_isotope(z_val, a_val, symbol, options))]
+    return graded, [] if timings is None else timings.records()
+
+
+def _plan_chunks(isotopes, options, workers):
+    """Groups nuclides into chunks of similar data size, largest first.
+
+    Nuclides with a lot of data end up alone in their chunk, while light nuclides
+    are batched together so that no worker idles on a handful of huge channels.
+    """
+    data_cache = get_data_cache()
+    sizes = []
+    for z_val, a_val, symbol in isotopes:
+        sizes += [sum(channel_file_size(data_cache.channel_path(options.projectile, z_val, a_val, reaction_name))
+                      for mt, reaction_name in options.required_reaction_channels)]
+    target_size = max(sum(sizes) / (workers * 4), 1)
+    chunks = []
+    chunk = []
+    chunk_size = 0
+    for index in np.argsort(sizes, kind="stable")[::-1]:
+        z_val, a_val, symbol = isotopes[index]
+        chunk += [(int(index), z_val, a_val, symbol)]
+        chunk_size += sizes[index]
+        if chunk_size >= target_size:
+            chunks += [chunk]
+            chunk = []
+            chunk_size = 0
+    if len(chunk) > 0:
+        chunks += [chunk]
+    return chunks
+
+
+def _grade_in_parallel(isotopes, options, workers, progress=None, cancel_event=None, mp_context=None):
+    graded = [None] * len(isotopes)
+    num_graded = 0
+    timings = get_timings()
+    timing_log = None if timings is None else timings.log
+    if mp_context is None:
+        mp_context = multiprocessing.get_context()
+    # cancel_event is polled here and passed on to the workers, which check it between nuclides
+    worker_cancel_event = mp_context.Event()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context, initializer=_init_worker,
+                             initargs=(worker_cancel_event, registered_spectra(), registered_libraries())) as executor:
+        pending = set(executor.submit(_grade_chunk, chunk, options, timing_log)
+                      for chunk in _plan_chunks(isotopes, options, workers))
+        while len(pending) > 0:
+            done, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+            if cancel_event is not None and cancel_event.is_set():
+                worker_cancel_event.set()
+                for future in pending:
+                    future.cancel()
+                raise GradingCancelled("Grading cancelled before completion.")
+            for future in done:
+                chunk_graded, chunk_timings = future.result()
+                if timings is not None:
+                    timings.merge(chunk_timings)
+                for index, this_metric in chunk_graded:
+                    graded[index] = this_metric
+                    num_graded += 1
+                    if progress is not None:
+                        progress(str(this_metric.A)+this_metric.symbol, num_graded, len(isotopes))
+    return graded
+
+
+GRADING_ENGINES = ("nuclide", "chart")
+
+
+def grade_many_isotopes(options, cache=None, catalogue_path=None, workers=1, progress=None, cancel_event=None,
+                        nuclides=None, engine="nuclide"):
+    """Grades every nuclide in the catalogue, returning {isotope: Nuclide}.
+
+    If nuclides is given (e.g. ["7Li", "Be-9"]) only those are graded, bypassing the cache.
+    progress(isotope, num_graded, num_isotopes) is called after each nuclide, and
+    setting cancel_event stops the run between nuclides with GradingCancelled.
+    The "chart" engine grades every nuclide at once in a single process, with
+    vectorized operations over one consolidated table of all channels.
+    """
+    if engine not in GRADING_ENGINES:
+        raise ValueError(f"Unknown grading engine: {engine} (use {' or '.join(GRADING_ENGINES)})")
+    # Serve previously graded results for identical options
+    if nuclides is not None:
+        cache = None
+    if cache is not None:
+        metrics = cache.get(options, catalogue_path, engine)
+        if metrics is not None:
+            return metrics
+    isotopes = read_isotope_catalogue(catalogue_path)
+    if nuclides is not None:
+        nuclides = set(nuclide_symbol_format(nuclide) for nuclide in nuclides)
+        isotopes = [(z_val, a_val, symbol) for z_val, a_val, symbol in isotopes if str(a_val)+symbol in nuclides]
+    if engine == "chart":
+        from .chart_engine import grade_chart
+        graded = grade_chart(isotopes, options, progress=progress, cancel_event=cancel_event)
+    elif workers > 1:
+        graded = _grade_in_parallel(isotopes, options, workers, progress, cancel_event)
+    else:
+        graded = []
+        for z_val, a_val, symbol in isotopes:
+            if cancel_event is not None and cancel_event.is_set():
+                raise GradingCancelled("Grading cancelled before completion.")
+            logger.info("Evaluating %s...", str(a_val)+symbol)
+            graded += [grade_isotope(z_val, a_val, symbol, options)]
+            if progress is not None:
+                progress(str(a_val)+symbol, len(graded), len(isotopes))
     metrics = {}
-    for index, row in all_isotopes.iterrows():
-        z_val = row["Z"]
-        a_val = row["A"]
-        symbol = row["Symbol"]
-        if symbol == "Heavy Water" or symbol == "n" or a_val == 0:
-            continue
+    for (z_val, a_val, symbol), this_metric in zip(isotopes, graded):
         isotope = str(a_val)+symbol
-        print("Evaluating {0}...".format(isotope))
-        this_metric = grade_isotope(z_val, a_val, symbol, options)
         if len(this_metric.reactions.keys()) > 0:
             metrics[isotope] = this_metric
+    if cache is not None:
+        cache.put(options, metrics, catalogue_path, engine)
     return metrics
 
 
+def reaction_results_table(metrics, options):
+    """One row per graded (nuclide, reaction) with its coverage, average metric and score."""
+    rows = []
+    for isotope, nuclide in metrics.items():
+        for reaction in nuclide.reactions.values():
+            rows += [{"projectile": options.projectile,
+                      "nuclide": isotope,
+                      "Z": nuclide.Z,
+                      "A": nuclide.A,
+                      "evaluation": options.evaluation,
+                      "scored_metric": options.scored_metric,
+                      **reaction_results(reaction)}]
+    return pd.DataFrame(rows)
+
+
+def reaction_results(reaction):
+    """The grading results of a single reaction as a dict."""
+    has_data = reaction.num_datapoints > 0
+    return {"reaction": reaction.name,
+            "mt": reaction.mt,
+            "energy_coverage": float(reaction.energy_coverage),
+            "energy_coverage_w_unc": float(reaction.energy_coverage_w_unc),
+            "average_metric": float(reaction.average_metric),
+            "score": float(reaction.score),
+            "num_measurements": int(reaction.num_measurements) if has_data else 0,
+            "num_datapoints": int(reaction.num_datapoints)}
+
+
+def experiment_results_table(metrics):
+    """The per-experiment results of every graded reaction, labelled by nuclide and reaction."""
+    tables = []
+    for isotope, nuclide in metrics.items():
+        for reaction in nuclide.reactions.values():
+            if reaction.num_datapoints == 0:
+                continue
+            table = reaction.experiment_results.reset_index(drop=True)
+            table.insert(0, "reaction", reaction.name)
+            table.insert(0, "nuclide", isotope)
+            tables += [table]
+    if len(tables) == 0:
+        return pd.DataFrame(columns=["nuclide", "reaction", "EXFOR_Entry", "Author"])
+    return pd.concat(tables, ignore_index=True)
+
+
 def _get_rgb(score, q5, q95):
     if np.isnan(score):
         marker = (30.0, 0.0, 30.0, 1.0)
@@ -55,7 +234,10 @@ def _get_rgb(score, q5, q95):
     return marker, text
 
 
-def plot_grades(metrics, options, show_plot=False):
+def _build_grades_figure(metrics, options):
+    # Bokeh is only imported once the chart is plotted, as it is slow to import
+    from bokeh.models import ColumnDataSource, LabelSet
+    from bokeh.plotting import figure
     n_vals = []
     z_vals = []
     score_values = []
@@ -135,10 +317,33 @@ def plot_grades(metrics, options, show_plot=False):
     p.add_layout(labels)
     p.xaxis[0].axis_label = 'Number of Neutrons (N)'
     p.yaxis[0].axis_label = 'Number of Protons (Z)'
+    return p
+
 
-    script, div = components(p)
+def plot_grades(metrics, options, show_plot=False):
+    from bokeh.plotting import show
+    from bokeh.embed import components
+    with stage_timer("plot_chart", rows=len(metrics)):
+        p = _build_grades_figure(metrics, options)
+        script, div = components(p)
     if show_plot:
         show(p)
     return script, div
 
 
+_chart_cache = RenderCache()
+
+
+def plot_grades_json(metrics, options, target_id="nuclide-chart"):
+    """Chart of nuclides as a serialized Bokeh json_item, for embedding with Bokeh.embed.embed_item.
+
+    Rendering is memoized against the identity of the graded metrics and the options,
+    so repeated page loads of the same chart only serve the cached payload.
+    """
+    def render():
+        from bokeh.embed import json_item
+        with stage_timer("plot_chart", rows=len(metrics)):
+            return json.dumps(json_item(_build_grades_figure(metrics, options), target_id))
+    return _chart_cache.get_or_render((metrics,), (options_key(options), target_id), render)
+
+
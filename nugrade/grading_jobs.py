@@ -0,0 +1,154 @@
+import copy
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from .grading_functions import grade_many_isotopes, GradingCancelled
+
+
+# Job ids are unique across managers, so a manager's jobs never shadow those of its fallback
+_job_ids = itertools.count(1)
+
+
+class GradingJob:
+    """A grade_many_isotopes run in a background thread, with its progress."""
+    def __init__(self, job_id, options):
+        self.id = job_id
+        self.options = options
+        self.status = "queued"
+        self.num_graded = 0
+        self.num_isotopes = 0
+        self.current_isotope = ""
+        self.metrics = None
+        self.error = ""
+        self.submitted_at = time.time()
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+
+    def progress(self, isotope, num_graded, num_isotopes):
+        self.current_isotope = isotope
+        self.num_graded = num_graded
+        self.num_isotopes = num_isotopes
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def to_dict(self):
+        return {"id": self.id,
+                "status": self.status,
+                "num_graded": self.num_graded,
+                "num_isotopes": self.num_isotopes,
+                "current_isotope": self.current_isotope,
+                "error": self.error,
+                "submitted_at": self.submitted_at,
+                "finished_at": self.finished_at}
+
+
+class GradingJobManager:
+    """Runs grading jobs in the background and keeps the last completed chart.
+
+    Submitting a job cooperatively cancels any job it supersedes; cancellation
+    takes effect between nuclides. Until it has a completed chart of its own, the
+    manager serves the latest chart and jobs of its fallback manager, if any.
+    """
+    def __init__(self, cache=None, workers=1, catalogue_path=None, max_jobs=32, fallback=None, engine="nuclide"):
+        self.cache = cache
+        self.workers = workers
+        self.engine = engine
+        self.catalogue_path = catalogue_path
+        self.max_jobs = max_jobs
+        self.fallback = fallback
+        self._latest_metrics = None
+        self._latest_options = None
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, options, supersede=True):
+        """Starts grading a copy of options in the background, returning the job id."""
+        with self._lock:
+            job = GradingJob(str(next(_job_ids)), copy.deepcopy(options))
+            if supersede:
+                for other_job in self._jobs.values():
+                    if other_job.status in ("queued", "running"):
+                        other_job.cancel()
+            self._jobs[job.id] = job
+            self._evict()
+        threading.Thread(target=self._run, args=(job,), daemon=True).start()
+        return job.id
+
+    def _evict(self):
+        # Forget the oldest finished jobs beyond max_jobs, never one that is still grading
+        for job_id in list(self._jobs.keys()):
+            if len(self._jobs) <= self.max_jobs:
+                break
+            if self._jobs[job_id].status not in ("queued", "running"):
+                del self._jobs[job_id]
+
+    def _run(self, job):
+        job.status = "running"
+        metrics = None
+        try:
+            metrics = grade_many_isotopes(job.options, cache=self.cache, catalogue_path=self.catalogue_path,
+                                          workers=self.workers, progress=job.progress,
+                                          cancel_event=job.cancel_event, engine=self.engine)
+            status = "done"
+        except GradingCancelled:
+            status = "cancelled"
+        except Exception as e:
+            status = "failed"
+            job.error = str(e)
+        with self._lock:
+            # A job cancelled after its last nuclide still finishes as cancelled, and
+            # must not replace newer results
+            if status == "done" and job.cancel_event.is_set():
+                status = "cancelled"
+            if status == "done":
+                job.metrics = metrics
+                self._latest_metrics = metrics
+                self._latest_options = job.options
+            job.finished_at = time.time()
+            job.status = status
+            self._evict()
+
+    def record(self, metrics, options):
+        """Sets the last completed chart, e.g. from grading done outside a job."""
+        with self._lock:
+            self._latest_metrics = metrics
+            self._latest_options = copy.deepcopy(options)
+
+    def latest(self):
+        """The last completed chart and the options it was graded with, (None, None) if there is none yet."""
+        with self._lock:
+            if self._latest_metrics is not None or self.fallback is None:
+                return self._latest_metrics, self._latest_options
+        return self.fallback.latest()
+
+    @property
+    def latest_metrics(self):
+        return self.latest()[0]
+
+    @property
+    def latest_options(self):
+        return self.latest()[1]
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None and self.fallback is not None:
+            return self.fallback.get(job_id)
+        return job
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is not None:
+            job.cancel()
+
+    def wait(self, job_id, timeout=None):
+        """Blocks until a job finishes, returning its final status."""
+        job = self.get(job_id)
+        deadline = None if timeout is None else time.time() + timeout
+        while job.status in ("queued", "running"):
+            if deadline is not None and time.time() > deadline:
+                break
+            time.sleep(0.05)
+        return job.status
@@ -0,0 +1,234 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from .config import NUGRADE_STAGE_CACHE_BYTES
+from .calc_energy_coverage import calc_energy_coverage_prefix
+from .channel_index import ChannelIndex
+from .evaluations import evaluation_metric, evaluation_token
+from .instrumentation import stage_timer
+from .weighting_functions import get_weight_cache, spectrum_token
+
+
+class GradingStage:
+    """One step of grading a reaction channel.
+
+    A stage's result is reused as long as the MetricOptions fields it depends on,
+    and the results of its upstream stages, are unchanged. A dependency may also
+    be a function of the options returning a hashable value.
+    """
+    def __init__(self, name, depends_on, upstream, compute):
+        self.name = name
+        self.depends_on = depends_on
+        self.upstream = upstream
+        self.compute = compute
+
+
+def _build_index(data, options, results):
+    # Built once per channel and shared by every energy window
+    return {"index": ChannelIndex(data)}
+
+
+def _filter_window(data, options, results):
+    # Restrict the channel to the scored energy range, a contiguous range of the energy sorted rows
+    index = results["index"]["index"]
+    start, end = index.window(options.lower_energy, options.upper_energy)
+    entry_starts, entry_ends = index.entry_segments(start, end)
+    first_rows = index.first_experiment_rows(start, end)
+    return {"start": start,
+            "end": end,
+            "num_points_w_unc": index.num_w_unc(start, end),
+            "entry_starts": entry_starts,
+            "entry_ends": entry_ends,
+            "experiments": data.iloc[first_rows][["EXFOR_Entry", "Author"]],
+            "experiment_codes": index.entry_codes[first_rows]}
+
+
+def _calc_gaps(data, options, results):
+    layouts = results["index"]["index"].coverage_layouts(options.energy_width, options.energy_coverage_scale)
+    return {"layouts": layouts}
+
+
+def _calc_coverage(data, options, results):
+    index = results["index"]["index"]
+    window = results["window"]
+    layouts = results["gaps"]["layouts"]
+    start, end = window["start"], window["end"]
+    w_unc_start, w_unc_end = np.searchsorted(index.w_unc_rows, [start, end])
+    segments = [([start], [end]), ([w_unc_start], [w_unc_end]), (window["entry_starts"], window["entry_ends"])]
+    coverages = [calc_energy_coverage_prefix(energies, gap_prefix_sums, starts, ends, options)
+                 for (energies, gap_prefix_sums), (starts, ends) in zip(layouts, segments)]
+    return {"energy_coverage": coverages[0][0],
+            "energy_coverage_w_unc": coverages[1][0],
+            "entry_coverage": coverages[2]}
+
+
+def _weighting_spectrum(options):
+    # Re-registering a spectrum under the same name invalidates results weighted by the old one
+    return spectrum_token(options.weighting_function)
+
+
+def _evaluation_library(options):
+    # Re-registering a library under the same name invalidates metrics computed against the old one
+    return evaluation_token(options.evaluation)
+
+
+def _calc_metric_sums(data, options, results):
+    # Absolute weighted metric of every point, summed cumulatively per experiment
+    index = results["index"]["index"]
+    metric_values = evaluation_metric(data, options.evaluation, options.scored_metric)
+    weights = get_weight_cache().get_weights(options.weighting_function, index.energies)
+    metric_sums, metric_counts, complete_counts = index.metric_prefix_sums(np.abs(weights * metric_values))
+    return {"metric_values": metric_values, "metric_sums": metric_sums, "metric_counts": metric_counts,
+            "complete_counts": complete_counts}
+
+
+def _calc_metric(data, options, results):
+    # NaN-aware mean of the absolute weighted metric of every experiment (NaN if it has none),
+    # from prefix sums split by magnitude as weights may span many orders of magnitude
+    window = results["window"]
+    metric_sums = results["metric_sums"]
+    starts, ends = window["entry_starts"], window["entry_ends"]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        entry_metric_means = metric_sums["metric_sums"].window(window["start"], window["end"]) / \
+                             (metric_sums["metric_counts"][ends] - metric_sums["metric_counts"][starts])
+    # Points without a metric, e.g. outside an evaluation library's tabulated range, are not complete
+    complete_counts = metric_sums["complete_counts"]
+    return {"entry_metric_means": entry_metric_means,
+            "num_complete": complete_counts[ends] - complete_counts[starts]}
+
+
+def _calc_score(data, options, results):
+    window = results["window"]
+    coverage = results["coverage"]
+    eval_metric_str = f"{options.evaluation}_{options.scored_metric}"
+
+    # Experiments without a single complete data point do not count
+    relevant = results["metric"]["num_complete"] > 0
+    entry_coverage = np.where(relevant, coverage["entry_coverage"], 0.0)
+    entry_metric = np.zeros(len(entry_coverage))
+    entry_metric[relevant] = entry_coverage[relevant] * results["metric"]["entry_metric_means"][relevant]
+    experiment_wise_metrics_weighted_means = entry_metric[window["experiment_codes"]]
+    experiment_energy_coverage_values = entry_coverage[window["experiment_codes"]]
+
+    # The error metric computed for each experiment, is weighted by
+    # that experiment's relative energy coverage
+    experiment_energy_coverage_sum = np.sum(experiment_energy_coverage_values)
+    if experiment_energy_coverage_sum > 0.0:
+        experiment_energy_coverage_fractions = experiment_energy_coverage_values/experiment_energy_coverage_sum
+        total_metric_average = np.mean(experiment_wise_metrics_weighted_means * experiment_energy_coverage_fractions)
+    else:
+        total_metric_average = 1.0
+
+    # Store results by experiment
+    experiment_results = window["experiments"].copy()
+    experiment_results["avg_"+eval_metric_str] = experiment_wise_metrics_weighted_means
+    experiment_results["energy_coverage"] = experiment_energy_coverage_values
+    if options.scored_metric == "chi_squared":
+        score = coverage["energy_coverage"] * (1/(1+total_metric_average))
+    else:
+        score = coverage["energy_coverage"] * (1/(1+total_metric_average/100))
+    return {"experiment_results": experiment_results,
+            "average_metric": total_metric_average,
+            "score": score}
+
+
+GRADING_STAGES = [
+    GradingStage("index", (), (), _build_index),
+    GradingStage("window", ("lower_energy", "upper_energy"), ("index",), _filter_window),
+    GradingStage("gaps", ("energy_width", "energy_coverage_scale"), ("index",), _calc_gaps),
+    GradingStage("coverage", (), ("window", "gaps"), _calc_coverage),
+    GradingStage("metric_sums", (_evaluation_library, "scored_metric", _weighting_spectrum), ("index",),
+                 _calc_metric_sums),
+    GradingStage("metric", (), ("window", "metric_sums"), _calc_metric),
+    GradingStage("score", (), ("coverage", "metric_sums", "metric"), _calc_score),
+]
+
+
+def _estimate_nbytes(stage_result):
+    nbytes = 0
+    for value in stage_result.values():
+        if isinstance(value, (pd.DataFrame, pd.Series)):
+            nbytes += int(np.sum(value.memory_usage(index=True)))
+        elif isinstance(value, list):
+            nbytes += sum(array.nbytes for layout in value for array in layout)
+        elif hasattr(value, "nbytes"):
+            nbytes += value.nbytes
+    return nbytes
+
+
+class StageCache:
+    """LRU cache of grading stage results keyed by channel, stage and option values.
+
+    Entries are evicted least recently used first once their estimated size
+    exceeds max_bytes. Cached stage results are shared and must not be modified.
+    """
+    def __init__(self, max_bytes):
+        self.max_bytes = int(max_bytes)
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key][0]
+
+    def put(self, key, stage_result):
+        nbytes = _estimate_nbytes(stage_result)
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key)[1]
+            self._entries[key] = (stage_result, nbytes)
+            self.nbytes += nbytes
+            while self.nbytes > self.max_bytes and len(self._entries) > 0:
+                self.nbytes -= self._entries.popitem(last=False)[1][1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries),
+                    "nbytes": self.nbytes, "max_bytes": self.max_bytes}
+
+
+def run_grading_stages(data, options, stage_cache=None, channel_key=None):
+    """Runs every grading stage on a channel's data, reusing cached stage results.
+
+    Results are only cached when both a stage cache and a key identifying the
+    channel are given. Returns the result of each stage by name.
+    """
+    results = {}
+    stage_keys = {}
+    for stage in GRADING_STAGES:
+        stage_key = tuple(field(options) if callable(field) else getattr(options, field)
+                          for field in stage.depends_on) + \
+                    tuple(stage_keys[upstream] for upstream in stage.upstream)
+        stage_keys[stage.name] = stage_key
+        stage_result = None
+        if stage_cache is not None and channel_key is not None:
+            stage_result = stage_cache.get((channel_key, stage.name, stage_key))
+        if stage_result is None:
+            with stage_timer(stage.name, rows=len(data)):
+                stage_result = stage.compute(data, options, results)
+            if stage_cache is not None and channel_key is not None:
+                stage_cache.put((channel_key, stage.name, stage_key), stage_result)
+        results[stage.name] = stage_result
+    return results
+
+
+_shared_stage_cache = StageCache(NUGRADE_STAGE_CACHE_BYTES)
+
+
+def get_stage_cache():
+    """The grading stage cache shared by every grading run in this process."""
+    return _shared_stage_cache
@@ -0,0 +1,191 @@
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+
+
+timing_logger = logging.getLogger("nugrade.timing")
+
+
+class StageTimings:
+    """Wall time, calls and rows processed by each stage, per (nuclide, reaction).
+
+    Stages are e.g. load, the grading stages (window, coverage, metric, ...) and
+    plot. With log set, every timed stage is also written as a JSON object to
+    the nugrade.timing logger at INFO level.
+    """
+    def __init__(self, log=False):
+        self.log = log
+        self._totals = defaultdict(lambda: [0, 0.0, 0])
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds, rows=0, nuclide="", reaction="", calls=1):
+        with self._lock:
+            totals = self._totals[(stage, nuclide, reaction)]
+            totals[0] += calls
+            totals[1] += seconds
+            totals[2] += rows
+        if self.log:
+            timing_logger.info(json.dumps({"stage": stage, "nuclide": nuclide, "reaction": reaction,
+                                           "seconds": seconds, "rows": rows}))
+
+    def records(self):
+        """Every (stage, nuclide, reaction) total as a list of dicts, e.g. to merge into another process."""
+        with self._lock:
+            return [{"stage": stage, "nuclide": nuclide, "reaction": reaction,
+                     "calls": calls, "seconds": seconds, "rows": rows}
+                    for (stage, nuclide, reaction), (calls, seconds, rows) in self._totals.items()]
+
+    def merge(self, records):
+        """Adds records from another StageTimings, e.g. of a worker process, without logging them again."""
+        with self._lock:
+            for record in records:
+                totals = self._totals[(record["stage"], record["nuclide"], record["reaction"])]
+                totals[0] += record["calls"]
+                totals[1] += record["seconds"]
+                totals[2] += record["rows"]
+
+    def stage_totals(self):
+        """{stage: {"calls", "seconds", "rows"}} summed over every nuclide and reaction."""
+        stages = {}
+        for record in self.records():
+            totals = stages.setdefault(record["stage"], {"calls": 0, "seconds": 0.0, "rows": 0})
+            for name in totals:
+                totals[name] += record[name]
+        return stages
+
+    def slowest_channels(self, num_channels=10):
+        """The (nuclide, reaction, seconds) spending the most time over all stages, slowest first."""
+        channel_seconds = defaultdict(float)
+        for record in self.records():
+            if record["nuclide"] or record["reaction"]:
+                channel_seconds[(record["nuclide"], record["reaction"])] += record["seconds"]
+        slowest = sorted(channel_seconds.items(), key=lambda item: item[1], reverse=True)[:num_channels]
+        return [(nuclide, reaction, seconds) for (nuclide, reaction), seconds in slowest]
+
+    def clear(self):
+        with self._lock:
+            self._totals.clear()
+
+
+class _StageTimer:
+    __slots__ = ("timings", "stage", "rows", "nuclide", "reaction", "start")
+
+    def __init__(self, timings, stage, rows, nuclide, reaction):
+        self.timings = timings
+        self.stage = stage
+        self.rows = rows
+        self.nuclide = nuclide
+        self.reaction = reaction
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.timings.record(self.stage, time.perf_counter() - self.start, self.rows, self.nuclide, self.reaction)
+
+
+class _ChannelContext:
+    __slots__ = ("labels", "previous")
+
+    def __init__(self, nuclide, reaction):
+        self.labels = (nuclide, reaction)
+
+    def __enter__(self):
+        self.previous = getattr(_channel, "labels", ("", ""))
+        _channel.labels = self.labels
+        return self
+
+    def __exit__(self, *exc_info):
+        _channel.labels = self.previous
+
+
+class _NullTimer:
+    # Stands in for timers and channel contexts while instrumentation is disabled
+    __slots__ = ("rows",)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+_channel = threading.local()
+_timings = None
+
+
+def enable_instrumentation(log=False):
+    """Starts recording stage timings in this process, returning the StageTimings recorded into."""
+    global _timings
+    if _timings is None:
+        _timings = StageTimings(log)
+    _timings.log = log
+    return _timings
+
+
+def disable_instrumentation():
+    global _timings
+    _timings = None
+
+
+def get_timings():
+    """The StageTimings being recorded into, or None while instrumentation is disabled."""
+    return _timings
+
+
+def stage_timer(stage, rows=0):
+    """Context manager timing a stage of the current channel.
+
+    Rows may also be set on the returned timer once known. While instrumentation
+    is disabled a shared do-nothing timer is returned, so hooks cost next to nothing.
+    """
+    if _timings is None:
+        return _NULL_TIMER
+    nuclide, reaction = getattr(_channel, "labels", ("", ""))
+    return _StageTimer(_timings, stage, rows, nuclide, reaction)
+
+
+def channel_context(nuclide, reaction):
+    """Context manager labelling the stages timed in this thread with a nuclide and reaction."""
+    if _timings is None:
+        return _NULL_TIMER
+    return _ChannelContext(nuclide, reaction)
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_metrics(timings=None, cache_stats=None):
+    """Stage timings and cache statistics in the Prometheus text exposition format.
+
+    cache_stats maps a cache name to its stats() dict.
+    """
+    lines = []
+    if timings is not None:
+        stages = timings.stage_totals()
+        for name, help_text in (("seconds", "Wall time spent in each stage."),
+                                ("calls", "Number of times each stage ran."),
+                                ("rows", "Data rows processed by each stage.")):
+            lines += [f"# HELP nugrade_stage_{name}_total {help_text}",
+                      f"# TYPE nugrade_stage_{name}_total counter"]
+            lines += [f'nugrade_stage_{name}_total{{stage="{_escape_label(stage)}"}} {totals[name]}'
+                      for stage, totals in sorted(stages.items())]
+        lines += ["# HELP nugrade_channel_seconds_total Wall time spent on each nuclide and reaction over all stages.",
+                  "# TYPE nugrade_channel_seconds_total counter"]
+        lines += [f'nugrade_channel_seconds_total{{nuclide="{_escape_label(nuclide)}",'
+                  f'reaction="{_escape_label(reaction)}"}} {seconds}'
+                  for nuclide, reaction, seconds in timings.slowest_channels(num_channels=None)]
+    for name, metric_type in (("hits", "counter"), ("misses", "counter"), ("evictions", "counter"),
+                              ("entries", "gauge"), ("nbytes", "gauge")):
+        samples = [(cache, stats[name]) for cache, stats in sorted((cache_stats or {}).items()) if name in stats]
+        if len(samples) == 0:
+            continue
+        metric_name = f"nugrade_cache_{name}" + ("_total" if metric_type == "counter" else "")
+        lines += [f"# TYPE {metric_name} {metric_type}"]
+        lines += [f'{metric_name}{{cache="{_escape_label(cache)}"}} {value}' for cache, value in samples]
+    return "\n".join(lines) + "\n"
@@ -1,4 +1,14 @@
 import numpy as np
+from .data_store import DATA_FILE_COLUMNS
+from .evaluations import is_library
+
+# Evaluations with precomputed columns in the channel data files
+KNOWN_EVALUATIONS = ["endf8", "endf7-1"]
+
+# MT numbers of the reaction channels that can be graded
+REACTION_MTS = {'N,TOT': 1, 'N,EL': 2, 'N,INL': 3, 'N,G': 102,
+                'P,EL': 2, 'P,INL': 3, 'P,G': 102}
+
 #TODO: Delete "Scored channel"
 class MetricOptions:
     def __init__(self):
@@ -23,7 +33,43 @@ class MetricOptions:
         opt_dict['scored_metric'] = self.scored_metric
         opt_dict['weighting_function'] = self.weighting_function
         return opt_dict
+
+    def set_from_dict(self, opt_dict):
+        """Sets the options present in a dict like to_dict's (plus 'projectile').
+
+        Reaction channels may be given as (mt, name) pairs or by name alone.
+        """
+        for key, value in opt_dict.items():
+            if key == 'required_reaction_channels':
+                value = [(REACTION_MTS[channel], channel) if isinstance(channel, str) else (int(channel[0]), channel[1])
+                         for channel in value]
+            elif key in ('lower_energy', 'upper_energy', 'energy_width'):
+                value = float(value)
+            elif key not in self.to_dict().keys() and key != 'projectile':
+                raise KeyError(f"Unknown grading option: {key}")
+            setattr(self, key, value)
     
+    def get_data_columns(self):
+        """Columns of the channel data files needed to grade against the evaluation."""
+        columns = list(DATA_FILE_COLUMNS.keys())
+        if is_library(self.evaluation):
+            # Metrics against registered libraries are computed from the data and its assumed uncertainty
+            return columns + ["dData_assumed"]
+        return columns + [self.evaluation, f"{self.evaluation}_{self.scored_metric}"]
+
+    def get_report_columns(self):
+        """Columns of the channel data files needed for reports and plots against any evaluation."""
+        columns = list(DATA_FILE_COLUMNS.keys())
+        evaluations = list(KNOWN_EVALUATIONS)
+        if is_library(self.evaluation):
+            # Metrics against registered libraries are computed from the data and its assumed uncertainty
+            columns += ["dData_assumed"]
+        elif self.evaluation not in KNOWN_EVALUATIONS:
+            evaluations += [self.evaluation]
+        for evaluation in evaluations:
+            columns += [evaluation, evaluation + "_chi_squared", evaluation + "_relative_error"]
+        return columns
+
     def get_metric_text(self):
         metric_text_dict = {"chi_squared": "Chi Squared",
                           "relative_error": "Absolute Relative Error (%)"}
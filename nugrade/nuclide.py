@@ -1,117 +1,91 @@
+import functools
 import numpy as np
 import pandas as pd
 import os
 import re
-from .config import NUGRADE_DATA_PATH
-from .calc_energy_coverage import calc_energy_coverage
-from bokeh.models import ColumnDataSource, CategoricalColorMapper, Whisker
-from bokeh.plotting import figure, show
-from bokeh.embed import components
-from bokeh.palettes import inferno
-from nugrade.weighting_functions import maxwell_boltzmann_room_temp, maxwell_boltzmann_320C, watt, constant_flux
+import json
+from .config import NUGRADE_DATA_PATH, NUGRADE_PLOT_MAX_POINTS
+from .data_store import load_channel
+from .data_cache import get_data_cache
+from .grading_stages import run_grading_stages, get_stage_cache
+from .downsampling import downsample_by_dataset
+from .render_cache import RenderCache, channel_render_key
+from .evaluations import evaluation_metric, evaluates_channel, evaluation_token
+from .instrumentation import stage_timer, channel_context
+from urllib.parse import quote
 
 
 
+def load_reaction_data(projectile, Z, A, reaction_name, columns=None):
+    """A channel's raw data from the shared data cache, for reactions only holding their results."""
+    return get_data_cache().get(projectile, Z, A, reaction_name, columns)
+
+
 class Reaction:
+    """Grading results of one reaction channel.
+
+    Once released, the raw data is not held by the reaction but read back
+    through data_loader whenever a report, plot or the AI agent needs it, so a
+    graded chart only keeps a few scalars and the per-experiment results.
+    """
+    __slots__ = ("mt", "name", "energy_coverage", "energy_coverage_w_unc", "average_metric", "score",
+                 "num_measurements", "num_datapoints", "experiment_results", "data_loader", "_data")
+
     def __init__(self, mt,  reaction_name):
         self.energy_coverage = np.float32(0.0)
         self.energy_coverage_w_unc = np.float32(0.0)
         self.average_metric = np.float32(0.0)
         self.score = 0.0
         self.num_measurements = np.int32(1)
-        self.num_datapoints = np.int32(1)
+        self.num_datapoints = np.int32(0)
+        self.experiment_results = None
         self.mt = mt
         self.data = pd.DataFrame()
         self.name = reaction_name
 
-    def load_data(self, dataset_path):
-        data_file_columns = {'Energy': np.float64, 'dEnergy': np.float64, 'Data': np.float64, 'dData': np.float64,
-                             'EXFOR_Entry': str, 'Year': np.int16, 'Author': str, 'Dataset_Number': str}
+    @property
+    def data(self):
+        if self.data_loader is not None:
+            return self.data_loader()
+        return self._data
+
+    @data.setter
+    def data(self, data):
+        self._data = data
+        self.data_loader = None
+
+    def release_data(self, data_loader):
+        """Drops the raw data, which data_loader() returns whenever it is needed again."""
+        self._data = None
+        self.data_loader = data_loader
+
+    def load_data(self, dataset_path, columns=None):
+        # Reads the columnar store for this channel when one exists, falling back on the CSV
         try:
-            self.data = pd.read_csv(dataset_path, dtype=data_file_columns)
+            self.data = load_channel(dataset_path, columns)
         except FileNotFoundError:
             self.data = pd.DataFrame()
         return self.data
 
-    def calc_metrics(self, options):
-        # Calculate overall energy coverage for this reaction channel
-        channel_data = self.data[self.data['Energy'].between(options.lower_energy, options.upper_energy)]
-        channel_data_w_unc = channel_data[channel_data["dData"].notna()]
-        print(len(channel_data))
-        print(len(channel_data_w_unc))
-        self.energy_coverage = calc_energy_coverage(channel_data, options)
-        self.energy_coverage_w_unc = calc_energy_coverage(channel_data_w_unc, options)
-
-        # Get unique identifiers for all experiments
-        all_experiments = channel_data[["EXFOR_Entry", "Author"]].drop_duplicates()
-        relevant_experiments = []
-
-        # Assign the weighting function if using a flux spectrum
-        if options.weighting_function == "maxwell-boltzmann-room-temp":
-            weighting_function = maxwell_boltzmann_room_temp
-        elif options.weighting_function == "maxwell-boltzmann-320C":
-            weighting_function = maxwell_boltzmann_320C
-        elif options.weighting_function == "watt":
-            weighting_function = watt
-        else:
-            weighting_function = constant_flux
-        
-        #normalizing_constant = weighting_function(0, normalize=True)
-
-        experiment_wise_metrics_weighted_means = []
-        experiment_energy_coverage_values = []
-        eval_metric_str = f"{options.evaluation}_{options.scored_metric}"
-
-        # Compute everything per experiment
-        for index, row in all_experiments.iterrows():
-
-            # Grab the data for just this experiment
-            experiment_data = channel_data[channel_data["EXFOR_Entry"] == row["EXFOR_Entry"]]
-            if len(experiment_data.dropna()) == 0:
-                experiment_wise_metrics_weighted_means += [0.0]
-                experiment_energy_coverage_values += [0.0]
-                continue
-            #else:
-            #    relevant_experiments += [row]
+    def calc_metrics(self, options, stage_cache=None, channel_key=None):
+        # Window filtering, energy coverage, per experiment metrics and the score are
+        # separate stages, so only those invalidated by changed options are recomputed
+        stage_results = run_grading_stages(self.data, options, stage_cache, channel_key)
 
-            # Calculate the error metric, energy coverage for this experiment
-            if (len(experiment_data.dropna()) == 0) and "Chi" in options.scored_metric["chi_squared"]:
-                experiment_wise_metrics_weighted_means += [0.0]
-            else:
-                experiment_wise_metric = weighting_function(experiment_data['Energy']) * experiment_data[eval_metric_str]
-                experiment_wise_metric_mean = np.nanmean(np.abs(experiment_wise_metric))
-            experiment_energy_coverage = calc_energy_coverage(experiment_data, options)
-
-            experiment_wise_metrics_weighted_means += [experiment_energy_coverage*experiment_wise_metric_mean]
-            experiment_energy_coverage_values += [experiment_energy_coverage]
-        
-        # The error metric computed for each experiment, is weighted by 
-        # that experiment's relative energy coverage
-        experiment_energy_coverage_sum = np.sum(experiment_energy_coverage_values)
-        if experiment_energy_coverage_sum > 0.0:
-            experiment_energy_coverage_fractions = np.array(experiment_energy_coverage_values)/\
-                                                    experiment_energy_coverage_sum
-            total_metric_average = np.mean(np.array(experiment_wise_metrics_weighted_means) * \
-                                            experiment_energy_coverage_fractions)
-        else:
-            total_metric_average = 1.0
-
-        self.metric_data = channel_data[eval_metric_str]
-
-        # Store results by experiment 
-        self.experiment_results = all_experiments
-        self.experiment_results["avg_"+eval_metric_str] = experiment_wise_metrics_weighted_means
-        self.experiment_results["energy_coverage"] = experiment_energy_coverage_values
+        self.energy_coverage = stage_results["coverage"]["energy_coverage"]
+        self.energy_coverage_w_unc = stage_results["coverage"]["energy_coverage_w_unc"]
+
+        # Store results by experiment
+        self.experiment_results = stage_results["score"]["experiment_results"]
         self.num_measurements = len(pd.unique(self.data["Dataset_Number"]))
         self.num_datapoints = len(self.data["Dataset_Number"])
-        self.average_metric = total_metric_average
-        if options.scored_metric == "chi_squared":
-            self.score = self.energy_coverage * (1/(1+total_metric_average))
-        else:
-            self.score = self.energy_coverage * (1/(1+total_metric_average/100))
+        self.average_metric = stage_results["score"]["average_metric"]
+        self.score = stage_results["score"]["score"]
 
 
 class Nuclide:
+    __slots__ = ("Z", "A", "N", "symbol", "reactions", "num_datasets")
+
     def __init__(self, Z, A, symbol):
         self.Z = int(Z)
         self.A = int(A)
@@ -131,44 +105,45 @@ class Nuclide:
                 sample_point["Author"].item()))
     # (EXFOR.loc[EXFOR['EXFOR_Entry'] == i].sample())
 
-    def gen_report(self, options, for_web=False):
-        report_s = ""
-        if for_web:
-            report_s += "<p>"
-        report_s += options.gen_html_description(do_html=False)
-        report_s += "Nuclide: {0}{1}\n".format(self.A, self.symbol)
-        report_s += "Number of datasets: {0}\n".format(self.num_datasets)
-        report_s += "Reaction reports:\n"
-        if for_web:
-            report_s += "</p>"
-            report_s = report_s.replace('\n', '<br>')
-            report_s = report_s.replace(' ', '&nbsp;')
+    def gen_report(self, options, for_web=False, lazy_plots=False):
+        # On the web each text block becomes a paragraph followed by the reaction's
+        # plots, or with lazy_plots a placeholder the page fetches them into
+        nuclide_name = f"{self.A}{self.symbol}"
+        report_lines = [options.gen_html_description(do_html=False),
+                        "Nuclide: {0}\n".format(nuclide_name),
+                        "Number of datasets: {0}\n".format(self.num_datasets),
+                        "Reaction reports:\n"]
+        report_parts = [_format_report_text("".join(report_lines), for_web)]
         metric_name = options.get_metric_text()
-        for channel_name in self.reactions.keys():
-            reaction = self.reactions[channel_name]
-            reaction_s = ""
-            if for_web:
-                reaction_s += "<p>"
-            reaction_s += f"  ({reaction.name}) [MT = {reaction.mt}]\n"
-            reaction_s += f"    Energy Completeness: {round(reaction.energy_coverage,3)}%\n"
-            reaction_s += f"    Energy Completeness with Uncertainty: {round(reaction.energy_coverage_w_unc,3)}%\n"
-            reaction_s += f"    Average {metric_name}: {round(reaction.average_metric, 3)}\n"
-            reaction_s += f"    Overall score: {round(reaction.score,3)}\n"
-            if for_web:
-                reaction_s += "</p>"
-                if len(reaction.data) > 0:
-                    plot = plot_precision_data(reaction, options.evaluation, show_plot=False)
-                else:
-                    reaction_s += "No data to plot.\n"
-                reaction_s = reaction_s.replace('\n', '<br>')
-                reaction_s = reaction_s.replace(' ', '&nbsp;')
-                reaction_s += plot[0]
-                reaction_s += plot[1]
-            report_s += reaction_s
-        return report_s
-
-
-    def get_metrics(self, options):
+        for reaction in self.reactions.values():
+            reaction_lines = [f"  ({reaction.name}) [MT = {reaction.mt}]\n",
+                              f"    Energy Completeness: {round(reaction.energy_coverage,3)}%\n",
+                              f"    Energy Completeness with Uncertainty: {round(reaction.energy_coverage_w_unc,3)}%\n",
+                              f"    Average {metric_name}: {round(reaction.average_metric, 3)}\n",
+                              f"    Overall score: {round(reaction.score,3)}\n"]
+            report_parts += [_format_report_text("".join(reaction_lines), for_web)]
+            if not for_web:
+                continue
+            if reaction.num_datapoints == 0:
+                report_parts += ["No&nbsp;data&nbsp;to&nbsp;plot.<br>"]
+            elif lazy_plots:
+                plot_url = f"/reaction_plot/{nuclide_name}/{quote(reaction.name)}/{options.evaluation}"
+                report_parts += [f'<div class="reaction-plot" data-plot-url="{plot_url}" style="min-height:250px;"></div>']
+            else:
+                detail_url = f"/reaction_points/{nuclide_name}/{quote(reaction.name)}?evaluation={options.evaluation}"
+                report_parts += list(plot_precision_data(reaction, options.evaluation, detail_url=detail_url))
+        return "".join(report_parts)
+
+
+    def get_metrics(self, options, data_cache=None, stage_cache=None):
+        # Raw channel data and grading stage results come from the shared
+        # in-memory caches unless others are given
+        # Raw data from the shared cache is released once graded and read back from it when needed
+        release_data = data_cache is None or data_cache is get_data_cache()
+        if data_cache is None:
+            data_cache = get_data_cache()
+        if stage_cache is None:
+            stage_cache = get_stage_cache()
         self.reactions = {}
         self.num_datasets = np.int16(0)
         # Reset the reaction data and iterate over the reactions being graded
@@ -176,144 +151,173 @@ class Nuclide:
             mt = reaction_codes[0]
             reaction_name = reaction_codes[1]
             self.reactions[reaction_name] = Reaction(mt, reaction_name)
-            data_file = f"{options.projectile}_{self.Z}_{self.A}_{reaction_name}.csv"
-            data_path = os.path.join(NUGRADE_DATA_PATH, data_file)
-            channel_data = self.reactions[reaction_name].load_data(data_path)
-            
-            # Calculate the error metrics and count measurements for each
-            if len(channel_data) > 0:
-                self.reactions[reaction_name].data = channel_data
-                self.reactions[reaction_name].calc_metrics(options)
+            with channel_context(f"{self.A}{self.symbol}", reaction_name):
+                with stage_timer("load") as timer:
+                    channel_data = data_cache.get(options.projectile, self.Z, self.A, reaction_name,
+                                                  options.get_data_columns())
+                    timer.rows = len(channel_data)
+
+                # Calculate the error metrics and count measurements for each,
+                # channels the evaluation has no cross section for are left ungraded
+                if len(channel_data) > 0 and evaluates_channel(options.evaluation, options.projectile,
+                                                               self.Z, self.A, reaction_name):
+                    self.reactions[reaction_name].data = channel_data
+                    channel_key = (options.projectile, self.Z, self.A, reaction_name, len(channel_data))
+                    self.reactions[reaction_name].calc_metrics(options, stage_cache, channel_key)
+                    if release_data:
+                        self.reactions[reaction_name].release_data(functools.partial(
+                            load_reaction_data, options.projectile, self.Z, self.A, reaction_name,
+                            options.get_report_columns()))
             self.num_datasets += self.reactions[reaction_name].num_measurements
 
 
 
-def plot_precision_data(reaction, evaluation_code, show_plot=False):
-    evaluation_error_column = evaluation_code + '_relative_error'
-    evaluation_chi_column = evaluation_code + '_chi_squared'
-    reaction_data = reaction.data.rename(columns={evaluation_error_column: "Relative_Error",
-                                                  evaluation_chi_column: "Chi_Squared"})
-    x_lower_bound = np.min((1,np.min(reaction_data['Energy'])))*0.95
-    x_upper_bound = np.max((1000,np.max(reaction_data['Energy'])))*1.05
-
-    data_y_lower_bound = np.max((1E-40, np.min(reaction_data["Data"])*0.1))
-    data_y_upper_bound = np.max((np.abs(reaction_data["Data"]))) * 1.05
-
-    error_y_bound = np.max((np.abs(reaction_data["Relative_Error"]))) * 1.05
-    chi_y_lower_bound = np.min((0.1, np.min(reaction_data["Chi_Squared"])))
-    chi_y_upper_bound = np.max((1, np.max(reaction_data["Chi_Squared"])))* 1.05
-
-    reaction_data["Labeled_XS"] = (
-    reaction_data["Data"].map("{:.3e}".format)
-    + " ± "
-    + reaction_data["dData"].map("{:.3e}".format)
-)
-    reaction_data["XS_lower"] = reaction_data["Data"] - reaction_data["dData"]
-    reaction_data["XS_upper"] = reaction_data["Data"] + reaction_data["dData"]
+PRECISION_PLOT_COLUMNS = ["Energy", "Data", "dData", "XS_lower", "XS_upper", "Relative_Error", "Chi_Squared",
+                          "Dataset_Number", "Year", "Author"]
+
+ZOOM_DETAIL_CALLBACK = """
+if (source.detail_timer) {
+    clearTimeout(source.detail_timer);
+}
+source.detail_timer = setTimeout(function() {
+    var separator = detail_url.includes("?") ? "&" : "?";
+    fetch(detail_url + separator + "lower=" + x_range.start + "&upper=" + x_range.end)
+        .then(function(response) { return response.json(); })
+        .then(function(columns) { source.data = columns; });
+}, 250);
+"""
+
+
+def _format_report_text(text, for_web):
+    if not for_web:
+        return text
+    return "<p>" + text.replace('\n', '<br>').replace(' ', '&nbsp;') + "</p>"
+
+
+def precision_plot_columns(reaction, evaluation_code, lower_energy=None, upper_energy=None,
+                           max_points=NUGRADE_PLOT_MAX_POINTS):
+    return _precision_columns(reaction.data, evaluation_code, lower_energy, upper_energy, max_points)
+
+
+def _precision_columns(data, evaluation_code, lower_energy=None, upper_energy=None,
+                       max_points=NUGRADE_PLOT_MAX_POINTS):
+    # Only the plotted columns are taken from the channel data, restricted to the
+    # energy window and downsampled per dataset when over the point budget
+    energies = data['Energy'].to_numpy()
+    rows = np.arange(len(data))
+    if lower_energy is not None or upper_energy is not None:
+        lower_energy = -np.inf if lower_energy is None else lower_energy
+        upper_energy = np.inf if upper_energy is None else upper_energy
+        rows = np.flatnonzero((energies >= lower_energy) & (energies <= upper_energy))
+    dataset_codes = pd.factorize(data['Dataset_Number'].to_numpy()[rows])[0]
+    rows = rows[downsample_by_dataset(energies[rows], data['Data'].to_numpy()[rows], dataset_codes, max_points)]
+
+    xs = data['Data'].to_numpy()[rows]
+    xs_unc = data['dData'].to_numpy()[rows]
+    return {"Energy": energies[rows],
+            "Data": xs,
+            "dData": xs_unc,
+            "XS_lower": xs - xs_unc,
+            "XS_upper": xs + xs_unc,
+            "Relative_Error": evaluation_metric(data, evaluation_code, "relative_error")[rows],
+            "Chi_Squared": evaluation_metric(data, evaluation_code, "chi_squared")[rows],
+            "Dataset_Number": data['Dataset_Number'].to_numpy()[rows],
+            "Year": data['Year'].to_numpy()[rows],
+            "Author": data['Author'].to_numpy()[rows]}
+
+
+def _build_precision_figures(data, evaluation_code, max_points, detail_url):
+    # Bokeh is only imported once a plot is needed, as it is slow to import
+    from bokeh.models import ColumnDataSource, CategoricalColorMapper, Whisker, HoverTool, Range1d, CustomJS
+    from bokeh.plotting import figure
+    from bokeh.palettes import inferno
+    relative_error = evaluation_metric(data, evaluation_code, "relative_error")
+    chi_squared = evaluation_metric(data, evaluation_code, "chi_squared")
+    energies = data['Energy']
+    x_lower_bound = np.min((1,np.min(energies)))*0.95
+    x_upper_bound = np.max((1000,np.max(energies)))*1.05
+
+    error_y_bound = np.nanmax((np.abs(relative_error))) * 1.05
+    chi_y_lower_bound = np.nanmin((0.1, np.nanmin(chi_squared)))
+    chi_y_upper_bound = np.nanmax((1, np.nanmax(chi_squared)))* 1.05
+
+    # The three plots share one downsampled source and one energy range, so zooming
+    # any of them zooms all and fetches full resolution for the zoomed window
+    source = ColumnDataSource(_precision_columns(data, evaluation_code, max_points=max_points))
+    x_range = Range1d(x_lower_bound, x_upper_bound)
+    if detail_url is not None:
+        x_range.js_on_change('end', CustomJS(args=dict(source=source, x_range=x_range, detail_url=detail_url),
+                                             code=ZOOM_DETAIL_CALLBACK))
+    datasets = data['Dataset_Number'].unique()
+    color_map = CategoricalColorMapper(factors=list(datasets), palette=inferno(len(datasets)))
+    color = {'field': 'Dataset_Number', 'transform': color_map}
+    tooltip_formatters = {"@Energy": "printf", "@Data": "printf", "@dData": "printf"}
+
+    def precision_figure(y_column, y_label, y_tooltip, **figure_kwargs):
+        tooltip_format = [("Energy (eV)", "@Energy{%0.4e}"), ("XS (b)", "@Data{%0.3e} ± @dData{%0.3e}")]
+        if y_tooltip is not None:
+            tooltip_format += [y_tooltip]
+        tooltip_format += [
+            ("Dataset ID", "@Dataset_Number"),
+            ("Year", "@Year"),
+            ("Author", "@Author")
+        ]
+        p = figure(width=600, height=250, x_range=x_range,
+                   tools="pan,wheel_zoom,box_zoom,reset", output_backend="webgl",
+                   x_axis_type="log", sizing_mode="scale_both", **figure_kwargs)
+        renderer = p.scatter('Energy', y_column, size=3, source=source, color=color)
+        p.add_tools(HoverTool(renderers=[renderer], tooltips=tooltip_format, formatters=tooltip_formatters))
+        p.xaxis[0].axis_label = 'Energy (eV)'
+        p.yaxis[0].axis_label = y_label
+        p.border_fill_color = "#f1f1f1"
+        return p
 
     # Value Plot
-    source = ColumnDataSource(reaction_data)
-    tooltip_format = [
-        ("Energy (eV)", "@Energy"),
-        ("XS (b)", "@Labeled_XS"),
-        ("Dataset ID", "@Dataset_Number"),
-        ("Year", "@Year"),
-        ("Author", "@Author")
-    ]
-
-    p = figure(width=600, height=250, #y_range=(-data_y_lower_bound, data_y_upper_bound),
-               x_range=(x_lower_bound, x_upper_bound),
-               y_axis_type="log",
-               tools="pan,wheel_zoom,box_zoom,reset,hover",
-               x_axis_type="log", sizing_mode="scale_both", tooltips=tooltip_format)
-    palette = inferno(len(reaction.data['Dataset_Number'].unique()))
-    print(palette)
-    color_map = CategoricalColorMapper(factors=reaction.data['Dataset_Number'].unique(),
-                                       palette=palette)
-
-    
-    error_bars = Whisker(
-    source=source,
-    base="Energy",
-    upper="XS_upper",
-    lower="XS_lower"
-    )
+    p1 = precision_figure("Data", 'EXFOR Cross Section (b)', None, y_axis_type="log")
+    error_bars = Whisker(source=source, base="Energy", upper="XS_upper", lower="XS_lower")
     error_bars.upper_head.size = 4
     error_bars.lower_head.size = 4
-
-
-
-    p.scatter('Energy', "Data", size=3,
-              source=source,
-              color={'field': 'Dataset_Number', 'transform': color_map})
-    p.xaxis[0].axis_label = 'Energy (eV)'
-    p.yaxis[0].axis_label = 'EXFOR Cross Section (b)'
-    p.border_fill_color = "#f1f1f1"
-    p.add_layout(error_bars)
-    script1, div1 = components(p)
-    if show_plot:
-        show(p)
-
+    p1.add_layout(error_bars)
 
     # Relative Uncertainty Plot
-    source2 = ColumnDataSource(reaction_data)
-    tooltip_format = [
-        ("Energy (eV)", "@Energy"),
-        ("XS (b)", "@Labeled_XS"),
-        ("Relative Error (%)", "@Relative_Error"),
-        ("Dataset ID", "@Dataset_Number"),
-        ("Year", "@Year"),
-        ("Author", "@Author")
-    ]
-
-    p = figure(width=600, height=250, y_range=(-error_y_bound, error_y_bound),
-               x_range=(x_lower_bound, x_upper_bound),
-               tools="pan,wheel_zoom,box_zoom,reset,hover",
-               x_axis_type="log", sizing_mode="scale_both", tooltips=tooltip_format)
-    palette = inferno(len(reaction.data['Dataset_Number'].unique()))
-    print(palette)
-    color_map = CategoricalColorMapper(factors=reaction.data['Dataset_Number'].unique(),
-                                       palette=palette)
-
-
-    p.scatter('Energy', "Relative_Error", size=3,
-              source=source2,
-              color={'field': 'Dataset_Number', 'transform': color_map})
-    p.xaxis[0].axis_label = 'Energy (eV)'
-    p.yaxis[0].axis_label = 'Relative Error (%)'
-    p.border_fill_color = "#f1f1f1"
-    script2, div2 = components(p)
-    if show_plot:
-        show(p)
-
+    p2 = precision_figure("Relative_Error", 'Relative Error (%)', ("Relative Error (%)", "@Relative_Error"),
+                          y_range=(-error_y_bound, error_y_bound))
 
     # Chi Squared Plot
-    tooltip_format = [
-        ("Energy (eV)", "@Energy"),
-        ("XS (b)", "@Labeled_XS"),
-        ("Chi Squared", "@Chi_Squared"),
-        ("Dataset ID", "@Dataset_Number"),
-        ("Year", "@Year"),
-        ("Author", "@Author")
-    ]
-
-    p = figure(width=600, height=250, y_range=(chi_y_lower_bound, chi_y_upper_bound),
-               x_range=(x_lower_bound, x_upper_bound),
-               y_axis_type="log",
-               tools="pan,wheel_zoom,box_zoom,reset,hover",
-               x_axis_type="log", sizing_mode="scale_both", tooltips=tooltip_format)
-    color_map2 = CategoricalColorMapper(factors=reaction.data['Dataset_Number'].unique(),
-                                        palette=palette)
-    source3 = ColumnDataSource(reaction_data)
-    p.scatter('Energy', "Chi_Squared", size=3,
-              source=source3,
-              color={'field': 'Dataset_Number', 'transform': color_map2})
-    p.xaxis[0].axis_label = 'Energy (eV)'
-    p.yaxis[0].axis_label = 'Chi Squared'
-    p.border_fill_color = "#f1f1f1"
-    script3, div3 = components(p)
-
-    if show_plot:
-        show(p)
-    return script1 + script2 + script3, div1 + div2 + div3
-
+    p3 = precision_figure("Chi_Squared", 'Chi Squared', ("Chi Squared", "@Chi_Squared"),
+                          y_range=(chi_y_lower_bound, chi_y_upper_bound), y_axis_type="log")
+    return p1, p2, p3
+
+
+def plot_precision_data(reaction, evaluation_code, show_plot=False, max_points=NUGRADE_PLOT_MAX_POINTS,
+                        detail_url=None):
+    from bokeh.layouts import column
+    from bokeh.plotting import show
+    from bokeh.embed import components
+    # Released reactions read their data back on every access, so it is read once
+    data = reaction.data
+    with stage_timer("plot", rows=len(data)):
+        figures = _build_precision_figures(data, evaluation_code, max_points, detail_url)
+        if show_plot:
+            show(column(*figures))
+        script, divs = components(figures)
+    return script, "".join(divs)
+
+
+_precision_plot_cache = RenderCache(max_entries=64)
+
+
+def plot_precision_json(reaction, evaluation_code, max_points=NUGRADE_PLOT_MAX_POINTS, detail_url=None):
+    # Plots are rendered once per channel and evaluation, and embedded
+    # client side into whichever element requested them
+    data = reaction.data
+
+    def render():
+        from bokeh.layouts import column
+        from bokeh.embed import json_item
+        with stage_timer("plot", rows=len(data)):
+            figures = _build_precision_figures(data, evaluation_code, max_points, detail_url)
+            return json.dumps(json_item(column(*figures)))
+    sources, data_key = channel_render_key(data)
+    return _precision_plot_cache.get_or_render(
+        sources, (data_key, evaluation_token(evaluation_code), max_points, detail_url), render)
@@ -0,0 +1,56 @@
+import threading
+from collections import OrderedDict
+
+
+class RenderCache:
+    """Small LRU cache of rendered plot payloads.
+
+    Entries are keyed on the identity of the objects a plot was rendered from
+    (e.g. a graded metrics dict) plus a hashable key describing how it was
+    rendered. The source objects are held by reference so their identity
+    cannot be reused while the entry is cached.
+    """
+    def __init__(self, max_entries=16):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_render(self, sources, key, render):
+        """Returns the cached payload for (sources, key), calling render() on a miss."""
+        cache_key = (tuple(id(source) for source in sources), key)
+        with self._lock:
+            if cache_key in self._entries:
+                cached_sources, payload = self._entries[cache_key]
+                if all(a is b for a, b in zip(cached_sources, sources)):
+                    self._entries.move_to_end(cache_key)
+                    self.hits += 1
+                    return payload
+            self.misses += 1
+        payload = render()
+        with self._lock:
+            self._entries[cache_key] = (tuple(sources), payload)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return payload
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+def channel_render_key(data):
+    """Sources and key identifying a channel's data for get_or_render.
+
+    Data loaded from a channel file is identified by its channel and length,
+    so cached payloads neither hold the raw frame alive nor miss when the data
+    is read back from disk. Other frames are identified by object.
+    """
+    if "channel" in data.attrs:
+        return (), (data.attrs["channel"], len(data))
+    return (data,), ()
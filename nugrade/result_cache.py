@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from .config import NUGRADE_CATALOGUE_PATH
+
+
+def options_key(options):
+    """Canonical hash of the grading options, including the projectile."""
+    opt_dict = options.to_dict()
+    opt_dict['projectile'] = options.projectile
+    for name, value in opt_dict.items():
+        # 5E6 and 5000000 describe the same energy bound
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            opt_dict[name] = float(value)
+    canonical = json.dumps(opt_dict, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def grading_key(options, catalogue_path=None, engine="nuclide"):
+    """Canonical hash of a grade_many_isotopes run: its options, catalogue and engine."""
+    if catalogue_path is None:
+        catalogue_path = NUGRADE_CATALOGUE_PATH
+    canonical = json.dumps([options_key(options), os.path.abspath(catalogue_path), engine])
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def estimate_metrics_nbytes(metrics):
+    """Approximate memory held by a {isotope: Nuclide} dict of graded results."""
+    nbytes = 0
+    for nuclide in metrics.values():
+        for reaction in nuclide.reactions.values():
+            # Released raw data is held by the shared data cache rather than the results
+            if reaction.data_loader is None:
+                nbytes += int(reaction.data.memory_usage(index=True, deep=True).sum())
+            if reaction.experiment_results is not None:
+                nbytes += int(reaction.experiment_results.memory_usage(index=True, deep=True).sum())
+    return nbytes
+
+
+class GradeCache:
+    """LRU cache of grade_many_isotopes results keyed on the grading options, catalogue and engine.
+
+    Entries are evicted least recently used first once the estimated size of
+    the cached results exceeds max_bytes. Cached results are shared between
+    callers and must be treated as read-only.
+    """
+    def __init__(self, max_bytes):
+        self.max_bytes = int(max_bytes)
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, options, catalogue_path=None, engine="nuclide"):
+        key = grading_key(options, catalogue_path, engine)
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key][0]
+
+    def put(self, options, metrics, catalogue_path=None, engine="nuclide"):
+        key = grading_key(options, catalogue_path, engine)
+        nbytes = estimate_metrics_nbytes(metrics)
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key)[1]
+            self._entries[key] = (metrics, nbytes)
+            self.nbytes += nbytes
+            while self.nbytes > self.max_bytes:
+                self.nbytes -= self._entries.popitem(last=False)[1][1]
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "entries": len(self._entries), "nbytes": self.nbytes, "max_bytes": self.max_bytes}
@@ -0,0 +1,67 @@
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+
+class UserSession:
+    """The grading options, jobs and AI agent conversation of one user of the web application.
+
+    Routes replace options with a modified copy rather than changing it in
+    place, so a request reading a session never sees half-applied options.
+    """
+    def __init__(self, options, jobs):
+        self.options = options
+        self.jobs = jobs
+        self.conversation_history = []
+        self.last_seen = time.time()
+
+
+class SessionStore:
+    """Thread-safe store of user sessions keyed by a random session id.
+
+    Sessions are created by calling create() on first use, and dropped once idle
+    for longer than idle_seconds or, least recently used first, when there are
+    more than max_sessions.
+    """
+    def __init__(self, create, max_sessions=256, idle_seconds=24*3600):
+        self.create = create
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_create(self, session_id=None):
+        """Returns (session_id, session), starting a new session if session_id is unknown or expired."""
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            if session_id in self._sessions:
+                self._sessions.move_to_end(session_id)
+                user_session = self._sessions[session_id]
+                user_session.last_seen = now
+                return session_id, user_session
+        # Sessions are created outside the lock, as that may involve grading
+        user_session = self.create()
+        user_session.last_seen = now
+        with self._lock:
+            session_id = secrets.token_urlsafe(16)
+            self._sessions[session_id] = user_session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return session_id, user_session
+
+    def _expire(self, now):
+        while len(self._sessions) > 0:
+            session_id, user_session = next(iter(self._sessions.items()))
+            if now - user_session.last_seen <= self.idle_seconds:
+                break
+            del self._sessions[session_id]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._sessions), "max_sessions": self.max_sessions}
@@ -0,0 +1,166 @@
+import functools
+import hashlib
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+from .config import NUGRADE_SNAPSHOT_PATH, NUGRADE_CATALOGUE_PATH
+from .data_cache import get_data_cache
+from .data_store import read_isotope_catalogue, channel_store_path, write_channel_store, read_channel_store
+from .data_store import MANIFEST_NAME
+from .evaluations import is_library, get_library
+from .grading_functions import experiment_results_table
+from .nuclide import Nuclide, Reaction, load_reaction_data
+from .result_cache import grading_key
+from .weighting_functions import get_spectrum
+
+# Bumped whenever grading changes in a way that makes earlier snapshots wrong
+SNAPSHOT_VERSION = 2
+SNAPSHOT_MANIFEST_NAME = "snapshot.json"
+
+# Energies at which a weighting spectrum is sampled to fingerprint its shape
+SPECTRUM_PROBE_ENERGIES = np.logspace(-5, 8, 131)
+
+
+def _file_state(path):
+    # Size and modification time stand in for the contents, a missing file is recorded as such
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def data_fingerprint(options, catalogue_path=None, data_cache=None):
+    """Hash of the state of every input file grading with options reads.
+
+    Covers the catalogue, each channel's CSV and columnar store, the evaluation
+    library's channel files and the shape of the weighting spectrum, so that
+    changing any of them changes the fingerprint.
+    """
+    if catalogue_path is None:
+        catalogue_path = NUGRADE_CATALOGUE_PATH
+    if data_cache is None:
+        data_cache = get_data_cache()
+    library = get_library(options.evaluation) if is_library(options.evaluation) else None
+    state = {"version": SNAPSHOT_VERSION,
+             "catalogue": _file_state(catalogue_path),
+             "channels": [],
+             "interpolation": None if library is None else library.interpolation}
+    for z_val, a_val, symbol in read_isotope_catalogue(catalogue_path):
+        for mt, reaction_name in options.required_reaction_channels:
+            dataset_path = data_cache.channel_path(options.projectile, z_val, a_val, reaction_name)
+            channel_state = [_file_state(dataset_path),
+                             _file_state(os.path.join(channel_store_path(dataset_path), MANIFEST_NAME))]
+            if library is not None:
+                channel_state += [_file_state(library.channel_path(options.projectile, z_val, a_val, reaction_name))]
+            state["channels"] += [channel_state]
+    spectrum_values = np.asarray(get_spectrum(options.weighting_function)(SPECTRUM_PROBE_ENERGIES), dtype=np.float64)
+    digest = hashlib.sha256(json.dumps(state).encode("utf-8"))
+    digest.update(spectrum_values.tobytes())
+    return digest.hexdigest()
+
+
+def snapshot_directory(options, snapshot_path=NUGRADE_SNAPSHOT_PATH, catalogue_path=None, engine="nuclide"):
+    # One snapshot per set of options, catalogue and engine, replaced whenever they are graded again
+    return os.path.join(snapshot_path, grading_key(options, catalogue_path, engine)[:32])
+
+
+def _reaction_table(metrics):
+    rows = []
+    for isotope, nuclide in metrics.items():
+        for reaction in nuclide.reactions.values():
+            rows += [{"nuclide": isotope,
+                      "Z": nuclide.Z,
+                      "A": nuclide.A,
+                      "symbol": nuclide.symbol,
+                      "reaction": reaction.name,
+                      "mt": reaction.mt,
+                      "energy_coverage": float(reaction.energy_coverage),
+                      "energy_coverage_w_unc": float(reaction.energy_coverage_w_unc),
+                      "average_metric": float(reaction.average_metric),
+                      "score": float(reaction.score),
+                      "num_measurements": int(reaction.num_measurements),
+                      "num_datapoints": int(reaction.num_datapoints)}]
+    return pd.DataFrame(rows, columns=["nuclide", "Z", "A", "symbol", "reaction", "mt", "energy_coverage",
+                                       "energy_coverage_w_unc", "average_metric", "score",
+                                       "num_measurements", "num_datapoints"])
+
+
+def save_snapshot(metrics, options, catalogue_path=None, snapshot_path=NUGRADE_SNAPSHOT_PATH, fingerprint=None,
+                  engine="nuclide"):
+    """Writes the per-reaction and per-experiment results of a graded chart to disk.
+
+    fingerprint should be taken before grading, so files changed while grading
+    leave a snapshot that is never loaded. Returns the snapshot directory.
+    """
+    if fingerprint is None:
+        fingerprint = data_fingerprint(options, catalogue_path)
+    directory = snapshot_directory(options, snapshot_path, catalogue_path, engine)
+    manifest_path = os.path.join(directory, SNAPSHOT_MANIFEST_NAME)
+    # The manifest is removed first and written last, so a partly written snapshot is never loaded
+    if os.path.isfile(manifest_path):
+        os.remove(manifest_path)
+    write_channel_store(_reaction_table(metrics), os.path.join(directory, "reactions"))
+    write_channel_store(experiment_results_table(metrics), os.path.join(directory, "experiments"))
+    manifest = {"version": SNAPSHOT_VERSION,
+                "grading_key": grading_key(options, catalogue_path, engine),
+                "fingerprint": fingerprint,
+                "projectile": options.projectile,
+                "data_columns": list(options.get_report_columns()),
+                "created": time.time()}
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=1)
+    return directory
+
+
+def _restore_metrics(reactions, experiments, projectile, data_columns):
+    # Rebuilds {isotope: Nuclide} whose reactions read their raw data on first use
+    experiment_groups = {}
+    no_experiments = experiments.iloc[:0].drop(columns=["nuclide", "reaction"])
+    if len(experiments) > 0:
+        for (isotope, reaction_name), group in experiments.groupby(["nuclide", "reaction"], sort=False):
+            experiment_groups[(isotope, reaction_name)] = \
+                group.drop(columns=["nuclide", "reaction"]).reset_index(drop=True)
+    metrics = {}
+    for row in reactions.itertuples(index=False):
+        if row.nuclide not in metrics:
+            metrics[row.nuclide] = Nuclide(int(row.Z), int(row.A), row.symbol)
+        nuclide = metrics[row.nuclide]
+        reaction = Reaction(int(row.mt), row.reaction)
+        reaction.energy_coverage = row.energy_coverage
+        reaction.energy_coverage_w_unc = row.energy_coverage_w_unc
+        reaction.average_metric = row.average_metric
+        reaction.score = row.score
+        reaction.num_measurements = int(row.num_measurements)
+        reaction.num_datapoints = int(row.num_datapoints)
+        if row.num_datapoints > 0:
+            reaction.experiment_results = experiment_groups.get((row.nuclide, row.reaction), no_experiments)
+            reaction.release_data(functools.partial(load_reaction_data, projectile, nuclide.Z, nuclide.A,
+                                                    row.reaction, data_columns))
+        nuclide.reactions[row.reaction] = reaction
+        nuclide.num_datasets += reaction.num_measurements
+    return metrics
+
+
+def load_snapshot(options, catalogue_path=None, snapshot_path=NUGRADE_SNAPSHOT_PATH, engine="nuclide"):
+    """The chart graded with options from its snapshot, None if there is no valid one.
+
+    A snapshot is only valid if none of the input files have changed since it
+    was taken. Reactions read their raw data from disk once a report or plot needs it.
+    """
+    directory = snapshot_directory(options, snapshot_path, catalogue_path, engine)
+    try:
+        with open(os.path.join(directory, SNAPSHOT_MANIFEST_NAME), "r") as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if manifest.get("version") != SNAPSHOT_VERSION or \
+            manifest.get("grading_key") != grading_key(options, catalogue_path, engine):
+        return None
+    if manifest.get("fingerprint") != data_fingerprint(options, catalogue_path):
+        return None
+    reactions = read_channel_store(os.path.join(directory, "reactions"))
+    experiments = read_channel_store(os.path.join(directory, "experiments"))
+    return _restore_metrics(reactions, experiments, manifest["projectile"], manifest["data_columns"])
@@ -0,0 +1,83 @@
+import copy
+import itertools
+import pandas as pd
+from .config import NUGRADE_STAGE_CACHE_BYTES
+from .data_cache import get_data_cache
+from .data_store import read_isotope_catalogue
+from .evaluations import evaluates_channel
+from .grading_functions import nuclide_symbol_format, reaction_results
+from .grading_stages import StageCache
+from .instrumentation import channel_context, stage_timer
+from .nuclide import Reaction
+
+
+def expand_grid(base_options, grid):
+    """Yields ({field: value}, MetricOptions) for every combination of the grid's values.
+
+    grid maps MetricOptions fields to the values to sweep, e.g.
+    {"energy_width": [0.01, 0.1], "evaluation": ["endf8", "endf7-1"]}. Fields
+    not in the grid keep their value from base_options.
+    """
+    fields = list(grid.keys())
+    for values in itertools.product(*grid.values()):
+        options = copy.deepcopy(base_options)
+        for field, value in zip(fields, values):
+            if not hasattr(options, field):
+                raise KeyError(f"Unknown grading option: {field}")
+            setattr(options, field, value)
+        yield dict(zip(fields, values)), options
+
+
+def sweep_grades(base_options, grid, catalogue_path=None, nuclides=None, data_cache=None, progress=None):
+    """Grades every nuclide for every combination of option values in grid.
+
+    Each reaction channel is read once and graded for the whole grid in turn.
+    Stage results (energy window, experiment grouping, coverage and metric
+    means) are shared between combinations that only differ in options a
+    stage does not depend on. Returns one row per combination, nuclide and
+    reaction, indexed by the swept option values.
+    """
+    if data_cache is None:
+        data_cache = get_data_cache()
+    combinations = list(expand_grid(base_options, grid))
+    columns = sorted(set(column for values, options in combinations for column in options.get_data_columns()))
+    # The grid may vary the projectile, so channels are read for each projectile swept
+    channels = list(dict.fromkeys((options.projectile, mt, reaction_name) for values, options in combinations
+                                  for mt, reaction_name in options.required_reaction_channels))
+
+    isotopes = read_isotope_catalogue(catalogue_path)
+    if nuclides is not None:
+        nuclides = set(nuclide_symbol_format(nuclide) for nuclide in nuclides)
+        isotopes = [(z_val, a_val, symbol) for z_val, a_val, symbol in isotopes if str(a_val)+symbol in nuclides]
+
+    # Stage results are only reusable within a channel, so the cache is emptied between channels
+    stage_cache = StageCache(NUGRADE_STAGE_CACHE_BYTES)
+    rows = []
+    for num_graded, (z_val, a_val, symbol) in enumerate(isotopes, 1):
+        isotope = str(a_val)+symbol
+        for projectile, mt, reaction_name in channels:
+            with channel_context(isotope, reaction_name):
+                with stage_timer("load") as timer:
+                    channel_data = data_cache.get(projectile, z_val, a_val, reaction_name, columns)
+                    timer.rows = len(channel_data)
+                if len(channel_data) == 0:
+                    continue
+                channel_key = (projectile, z_val, a_val, reaction_name)
+                for values, options in combinations:
+                    if options.projectile != projectile or \
+                            (mt, reaction_name) not in options.required_reaction_channels:
+                        continue
+                    # Channels the evaluation has no cross section for are left ungraded, as when grading
+                    if not evaluates_channel(options.evaluation, projectile, z_val, a_val, reaction_name):
+                        continue
+                    reaction = Reaction(mt, reaction_name)
+                    reaction.data = channel_data
+                    reaction.calc_metrics(options, stage_cache, channel_key)
+                    rows += [{**values, "nuclide": isotope, "Z": z_val, "A": a_val, **reaction_results(reaction)}]
+            stage_cache.clear()
+        if progress is not None:
+            progress(isotope, num_graded, len(isotopes))
+    return pd.DataFrame(rows, columns=list(grid.keys()) + ["nuclide", "Z", "A", "reaction", "mt", "energy_coverage",
+                                                           "energy_coverage_w_unc", "average_metric", "score",
+                                                           "num_measurements", "num_datapoints"]
+                        ).set_index(list(grid.keys()))
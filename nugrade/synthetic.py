@@ -0,0 +1,111 @@
+import os
+import numpy as np
+import pandas as pd
+from .data_store import DATA_FILE_COLUMNS, write_channel_store, channel_store_path
+
+ELEMENT_SYMBOLS = ["H", "He", "Li", "Be", "B", "C", "N", "O", "F", "Ne", "Na", "Mg", "Al", "Si", "P", "S", "Cl", "Ar",
+                   "K", "Ca", "Sc", "Ti", "V", "Cr", "Mn", "Fe", "Co", "Ni", "Cu", "Zn", "Ga", "Ge", "As", "Se", "Br",
+                   "Kr", "Rb", "Sr", "Y", "Zr", "Nb", "Mo", "Tc", "Ru", "Rh", "Pd", "Ag", "Cd", "In", "Sn", "Sb", "Te",
+                   "I", "Xe", "Cs", "Ba", "La", "Ce", "Pr", "Nd", "Pm", "Sm", "Eu", "Gd", "Tb", "Dy", "Ho", "Er", "Tm",
+                   "Yb", "Lu", "Hf", "Ta", "W", "Re", "Os", "Ir", "Pt", "Au", "Hg", "Tl", "Pb", "Bi", "Po", "At", "Rn",
+                   "Fr", "Ra", "Ac", "Th", "Pa", "U", "Np", "Pu", "Am", "Cm", "Bk", "Cf", "Es", "Fm"]
+
+AUTHORS = ["C.T.Hibdon", "G.V.Gorlov", "J.A.Harvey", "J.W.Meadows", "C.A.Goulding", "R.B.Schwartz", "D.G.Foster",
+           "W.P.Abfalterer", "P.W.Lisowski", "A.D.Carlson", "F.Gunsing", "M.Mosconi", "K.Kino", "Y.Danon"]
+
+SYNTHETIC_EVALUATIONS = ["endf8", "endf7-1"]
+
+
+def synthetic_nuclides(num_nuclides):
+    """(Z, A, symbol) of num_nuclides plausible nuclides, lightest elements first."""
+    nuclides = []
+    for Z, symbol in enumerate(ELEMENT_SYMBOLS, 1):
+        for A in range(max(Z, 2*Z - 1), 2*Z + Z//2 + 8):
+            nuclides += [(Z, A, symbol)]
+    if num_nuclides > len(nuclides):
+        raise ValueError(f"At most {len(nuclides)} synthetic nuclides are available.")
+    return nuclides[:num_nuclides]
+
+
+def _evaluated_cross_section(energies, rng):
+    # A smooth 1/v plus constant background with a few resonances
+    resonance_energies = 10**rng.uniform(0, 5, size=rng.integers(1, 12))
+    resonance_widths = resonance_energies * 10**rng.uniform(-3, -1.5, size=len(resonance_energies))
+    xs = 2 + 10*rng.random() + 5/np.sqrt(energies)
+    for resonance_energy, width in zip(resonance_energies, resonance_widths):
+        xs += 50*rng.random() / (1 + ((energies - resonance_energy) / width)**2)
+    return xs
+
+
+def synthetic_channel(Z, A, mt, num_points, seed=0):
+    """A deterministic synthetic channel with the schema of the EXFOR channel files.
+
+    Points come from many experiments of very different sizes, each measuring a
+    log-spaced energy range with a systematic offset and statistical scatter
+    about a resonant evaluation. Some experiments report no uncertainty, in which
+    case dData is missing and an assumed uncertainty is used. Rows are sorted by energy.
+    """
+    rng = np.random.default_rng([seed, Z, A, mt])
+    experiment_shares = rng.lognormal(mean=0, sigma=1.5, size=max(1, num_points // 200))
+    experiment_sizes = 1 + rng.multinomial(num_points - len(experiment_shares),
+                                           experiment_shares / experiment_shares.sum())
+    columns = {name: [] for name in ["Energy", "Data", "dData", "EXFOR_Entry", "Year", "Author"]}
+    for experiment, size in enumerate(experiment_sizes):
+        lower, upper = np.sort(rng.uniform(-3, 7.5, size=2))
+        energies = np.sort(10**rng.uniform(lower, upper, size=size))
+        relative_uncertainty = 10**rng.uniform(-2.5, -0.5)
+        columns["Energy"] += [energies]
+        columns["dData"] += [np.full(size, np.nan if rng.random() < 0.1 else relative_uncertainty)]
+        columns["Data"] += [np.full(size, 1 + rng.normal(0, relative_uncertainty))]
+        columns["EXFOR_Entry"] += [np.full(size, f"{rng.integers(10000, 99999)}{experiment % 1000:03d}")]
+        columns["Year"] += [np.full(size, rng.integers(1950, 2024))]
+        columns["Author"] += [np.full(size, AUTHORS[rng.integers(len(AUTHORS))])]
+    columns = {name: np.concatenate(values) for name, values in columns.items()}
+    order = np.argsort(columns["Energy"], kind="stable")
+    channel_data = pd.DataFrame({name: values[order] for name, values in columns.items()})
+
+    energies = channel_data["Energy"].to_numpy()
+    evaluated = _evaluated_cross_section(energies, rng)
+    relative_scatter = np.nan_to_num(channel_data["dData"].to_numpy(), nan=0.05)
+    data = evaluated * channel_data["Data"].to_numpy() * (1 + rng.normal(0, 1, len(energies)) * relative_scatter)
+    channel_data["Data"] = data
+    channel_data["dData"] = channel_data["dData"] * data
+    channel_data["dEnergy"] = np.where(rng.random(len(energies)) < 0.9, np.nan, energies * 0.01)
+    channel_data["Dataset_Number"] = channel_data["EXFOR_Entry"]
+    channel_data["MT"] = mt
+    channel_data["dData_assumed"] = channel_data["dData"].fillna(channel_data["Data"] * 0.05)
+    for i, evaluation in enumerate(SYNTHETIC_EVALUATIONS):
+        # Older evaluations deviate smoothly from the newest one
+        evaluation_xs = evaluated * (1 + i * 0.03 * np.sin(np.log(energies) * rng.uniform(0.5, 2)))
+        channel_data[evaluation] = evaluation_xs
+        channel_data[evaluation + "_chi_squared"] = (data - evaluation_xs)**2 / channel_data["dData_assumed"]
+        channel_data[evaluation + "_relative_error"] = (data - evaluation_xs) / evaluation_xs * 100
+    column_order = list(DATA_FILE_COLUMNS.keys()) + ["MT", "dData_assumed"] + \
+                   [evaluation + suffix for evaluation in sorted(SYNTHETIC_EVALUATIONS)
+                    for suffix in ("", "_chi_squared", "_relative_error")]
+    return channel_data[column_order].astype(DATA_FILE_COLUMNS)
+
+
+def write_synthetic_dataset(data_path, num_nuclides, points_per_channel, channels=((1, 'N,TOT'), (102, 'N,G')),
+                            projectile="n", seed=0, columnar=False):
+    """Writes a catalogue and a channel file per (nuclide, channel) of synthetic data into data_path.
+
+    Channel sizes vary log-normally around points_per_channel. Returns the total
+    number of points written.
+    """
+    os.makedirs(data_path, exist_ok=True)
+    nuclides = synthetic_nuclides(num_nuclides)
+    catalogue = pd.DataFrame(nuclides, columns=["Z", "A", "Symbol"])
+    catalogue.to_csv(os.path.join(data_path, "all_reactions.csv"), index=False)
+    num_points = 0
+    for Z, A, symbol in nuclides:
+        for mt, reaction_name in channels:
+            size_rng = np.random.default_rng([seed, Z, A, mt, 1])
+            channel_points = max(1, int(points_per_channel * size_rng.lognormal(0, 0.75) / np.exp(0.75**2/2)))
+            channel_data = synthetic_channel(Z, A, mt, channel_points, seed)
+            dataset_path = os.path.join(data_path, f"{projectile}_{Z}_{A}_{reaction_name}.csv")
+            if columnar:
+                write_channel_store(channel_data, channel_store_path(dataset_path), source=os.path.basename(dataset_path))
+            channel_data.to_csv(dataset_path, index=False)
+            num_points += len(channel_data)
+    return num_points
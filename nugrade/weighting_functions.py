@@ -1,4 +1,12 @@
+import itertools
+import logging
+import os
+import threading
+from collections import OrderedDict
 import numpy as np
+from .config import NUGRADE_WEIGHT_CACHE_BYTES
+
+logger = logging.getLogger(__name__)
 
 def maxwell_boltzmann_room_temp(energy, normalize=False):
     mass = 1.674E-27 # Nucleon mass
@@ -25,4 +33,155 @@ def watt(energy, normalize=False):
     return a*np.exp(-b*energy/1E6)*np.sinh(np.sqrt(c*energy/1E6))
 
 def constant_flux(energy, normalize=False):
-    return 1.0
\ No newline at end of file
+    return 1.0
+
+
+class TabulatedSpectrum:
+    """A flux spectrum tabulated pointwise or in energy groups, interpolated in log-log space.
+
+    Pointwise spectra give the flux at each energy. Group spectra give the
+    group-integrated flux between consecutive group boundaries, which is
+    converted to a flux per unit energy at each group's geometric midpoint.
+    The weight is zero outside the tabulated energy range.
+    """
+    def __init__(self, energies, flux, groups=False):
+        energies = np.asarray(energies, dtype=np.float64)
+        flux = np.asarray(flux, dtype=np.float64)
+        if groups:
+            if len(energies) != len(flux) + 1:
+                raise ValueError("Group spectra need one more group boundary than group fluxes.")
+            self.lower_energy, self.upper_energy = energies[0], energies[-1]
+            flux = flux / np.diff(energies)
+            energies = np.sqrt(energies[:-1] * energies[1:])
+        else:
+            if len(energies) != len(flux):
+                raise ValueError("Pointwise spectra need one flux per energy.")
+            self.lower_energy, self.upper_energy = energies[0], energies[-1]
+        if np.any(np.diff(energies) <= 0) or energies[0] <= 0:
+            raise ValueError("Spectrum energies must be positive and ascending.")
+        self.log_energies = np.log(energies)
+        self.log_flux = np.log(np.clip(flux, 1E-300, None))
+
+    def __call__(self, energy, normalize=False):
+        energy = np.asarray(energy, dtype=np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            weights = np.exp(np.interp(np.log(energy), self.log_energies, self.log_flux))
+        return np.where((energy >= self.lower_energy) & (energy <= self.upper_energy), weights, 0.0)
+
+    @classmethod
+    def from_csv(cls, path):
+        """Reads a pointwise spectrum with columns Energy and Flux, or a group spectrum with
+        columns Lower_Energy, Upper_Energy and Flux (one row per group, energies in eV)."""
+        table = np.genfromtxt(path, delimiter=",", names=True)
+        if "Lower_Energy" in table.dtype.names:
+            boundaries = np.append(table["Lower_Energy"], table["Upper_Energy"][-1])
+            return cls(boundaries, table["Flux"], groups=True)
+        return cls(table["Energy"], table["Flux"])
+
+
+class WeightCache:
+    """Weights of each spectrum at each channel energy array, kept until the byte budget is exceeded.
+
+    Energy arrays are identified by object, so the cache holds a reference to
+    each one and the arrays must not be modified.
+    """
+    def __init__(self, max_bytes):
+        self.max_bytes = int(max_bytes)
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_weights(self, name, energies):
+        spectrum, generation = _lookup_spectrum(name)
+        key = (name, generation, id(energies))
+        with self._lock:
+            if key in self._entries and self._entries[key][0] is energies:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][1]
+            self.misses += 1
+        weights = np.asarray(spectrum(energies), dtype=np.float64)
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key)[1].nbytes
+            self._entries[key] = (energies, weights)
+            self.nbytes += weights.nbytes
+            while self.nbytes > self.max_bytes and len(self._entries) > 0:
+                self.nbytes -= self._entries.popitem(last=False)[1][1].nbytes
+        return weights
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries),
+                    "nbytes": self.nbytes, "max_bytes": self.max_bytes}
+
+
+# Spectra available as MetricOptions.weighting_function, with a generation
+# number that changes whenever a name is registered again
+_spectra = {}
+_generations = itertools.count()
+_unknown_spectra = set()
+
+
+def register_spectrum(name, spectrum):
+    """Makes a spectrum (a function of energy in eV, e.g. a TabulatedSpectrum) available
+    as a weighting function under name, replacing any spectrum of the same name."""
+    _spectra[name] = (spectrum, next(_generations))
+
+
+def _lookup_spectrum(name):
+    # Unknown names are graded with constant flux, as before the registry existed
+    if name not in _spectra:
+        if name not in _unknown_spectra:
+            _unknown_spectra.add(name)
+            logger.warning("Unknown weighting function %s, using constant flux", name)
+        return _spectra[None]
+    return _spectra[name]
+
+
+def get_spectrum(name):
+    return _lookup_spectrum(name)[0]
+
+
+def registered_spectra():
+    """{name: spectrum} of every registered spectrum, e.g. to register them again in worker processes."""
+    return {name: spectrum for name, (spectrum, generation) in _spectra.items()}
+
+
+def spectrum_token(name):
+    """Identifies the spectrum currently registered under name, for cache keys."""
+    return name, _lookup_spectrum(name)[1]
+
+
+register_spectrum(None, constant_flux)
+register_spectrum("maxwell-boltzmann-room-temp", maxwell_boltzmann_room_temp)
+register_spectrum("maxwell-boltzmann-320C", maxwell_boltzmann_320C)
+register_spectrum("watt", watt)
+
+_shared_weight_cache = WeightCache(NUGRADE_WEIGHT_CACHE_BYTES)
+
+
+def get_weight_cache():
+    """The spectrum weight cache shared by every grading run in this process."""
+    return _shared_weight_cache
+
+
+def register_spectra_directory(directory):
+    """Registers every tabulated spectrum CSV in directory under its file name (without
+    extension), returning the registered names. A missing directory registers none."""
+    if not os.path.isdir(directory):
+        return []
+    names = []
+    for file_name in sorted(os.listdir(directory)):
+        name, extension = os.path.splitext(file_name)
+        if extension.lower() == ".csv":
+            register_spectrum(name, TabulatedSpectrum.from_csv(os.path.join(directory, file_name)))
+            names += [name]
+    return names
@@ -1,67 +1,130 @@
 from flask import Flask
 from flask import request, session
-from flask import render_template
+from flask import render_template, jsonify, Response
 from nugrade import *
 import pandas as pd
 import os
-from anthropic import Anthropic
-from nugrade.ai_agent import NuclearDataAgent
-from markdown_it import MarkdownIt
+import copy
+import json
+import logging
+import threading
+from urllib.parse import quote
+from nugrade.config import NUGRADE_RESULT_CACHE_BYTES, NUGRADE_GRADING_WORKERS, NUGRADE_SPECTRA_PATH
+from nugrade.config import NUGRADE_EVALUATIONS_PATH, NUGRADE_INSTRUMENTATION, NUGRADE_TIMING_LOG
+from nugrade.config import NUGRADE_MAX_SESSIONS, NUGRADE_SESSION_IDLE_SECONDS, NUGRADE_GRADING_ENGINE
+from nugrade.data_cache import get_data_cache
+from nugrade.grading_stages import get_stage_cache
+from nugrade.grading_jobs import GradingJobManager
+from nugrade.sessions import UserSession, SessionStore
+from nugrade.nuclide import precision_plot_columns, plot_precision_json
+from nugrade.weighting_functions import register_spectra_directory
+from nugrade.evaluations import register_libraries_directory, has_evaluation, get_evaluated_cache
+from nugrade.weighting_functions import get_weight_cache
+from nugrade.instrumentation import enable_instrumentation, get_timings, channel_context, prometheus_metrics
+from nugrade.snapshot import data_fingerprint, load_snapshot, save_snapshot
 
 app = Flask(__name__)
-
-md = MarkdownIt(
-    "commonmark",
-    {
-        "html": False,
-        "linkify": True,
-        "typographer": True,
-    }
-)
+# The cookie only holds the session id, the session itself is kept in memory and
+# does not outlive the process, so a fresh key per process is enough
+app.secret_key = os.urandom(32)
 
 version = '0.0.1'
-options = MetricOptions()
-options.set_neutrons()
-metrics = grade_many_isotopes(options)
-plot_script, plot_component = plot_grades(metrics, options)
-options_text = options.gen_html_description()
-text_report = ""
+# Stage timings of every grading run and plot, so slow regrades can be traced to nuclides
+if NUGRADE_INSTRUMENTATION:
+    enable_instrumentation(log=NUGRADE_TIMING_LOG)
+    if NUGRADE_TIMING_LOG:
+        timing_handler = logging.StreamHandler()
+        timing_handler.setFormatter(logging.Formatter("%(message)s"))
+        logging.getLogger("nugrade.timing").addHandler(timing_handler)
+        logging.getLogger("nugrade.timing").setLevel(logging.INFO)
+# Tabulated spectra, e.g. from reactor models, offered alongside the analytic ones
+custom_spectra = register_spectra_directory(NUGRADE_SPECTRA_PATH)
+# Pointwise evaluations compared against on the fly, in addition to the precomputed ENDF columns
+evaluation_libraries = register_libraries_directory(NUGRADE_EVALUATIONS_PATH)
+# Every new user starts from the neutron chart, graded in the background so the
+# server binds right away. Raw data, stage results and graded charts are shared
+# read-only between users through the caches
+default_options = MetricOptions()
+default_options.set_neutrons()
+result_cache = GradeCache(NUGRADE_RESULT_CACHE_BYTES)
+startup_jobs = GradingJobManager(cache=result_cache, workers=NUGRADE_GRADING_WORKERS, engine=NUGRADE_GRADING_ENGINE)
 
 
-if os.path.isfile("keys/claude.txt"):
-    with open("keys/claude.txt","r") as f:
-        anthropic_api_key = f.read()
+def snapshot_startup_chart(job_id, fingerprint):
+    # Saves the startup chart once graded, so the next start serves it without grading
+    if startup_jobs.wait(job_id) != "done":
+        return
     try:
-        claude_agent = NuclearDataAgent(api_key=anthropic_api_key)
-        ai_available = True
-    except:
-        print("Access to Claude failed. Is your key correct, and "+\
-            " are you connected to the internet?")
-        ai_available = False
+        save_snapshot(startup_jobs.get(job_id).metrics, default_options, fingerprint=fingerprint,
+                      engine=NUGRADE_GRADING_ENGINE)
+    except OSError as e:
+        app.logger.warning("Could not save the startup chart snapshot: %s", e)
+
+
+# The chart saved by an earlier start is served right away, unless an input file changed since
+startup_metrics = load_snapshot(default_options, engine=NUGRADE_GRADING_ENGINE)
+if startup_metrics is not None:
+    startup_jobs.record(startup_metrics, default_options)
+    result_cache.put(default_options, startup_metrics, engine=NUGRADE_GRADING_ENGINE)
+    startup_job_id = None
 else:
-    print("No API key found in keys/claude.txt for Claude.")
-    ai_available = False
+    startup_fingerprint = data_fingerprint(default_options)
+    startup_job_id = startup_jobs.submit(default_options)
+    threading.Thread(target=snapshot_startup_chart, args=(startup_job_id, startup_fingerprint), daemon=True).start()
+text_report = ""
+
+
+def new_user_session():
+    grading_jobs = GradingJobManager(cache=result_cache, workers=NUGRADE_GRADING_WORKERS, fallback=startup_jobs,
+                                     engine=NUGRADE_GRADING_ENGINE)
+    return UserSession(copy.deepcopy(default_options), grading_jobs)
+
 
+user_sessions = SessionStore(new_user_session, max_sessions=NUGRADE_MAX_SESSIONS,
+                             idle_seconds=NUGRADE_SESSION_IDLE_SECONDS)
+
+# Preload the raw data for both projectiles so later regrades only cost CPU
+warm_up_options = [MetricOptions(), MetricOptions()]
+warm_up_options[0].set_neutrons()
+warm_up_options[1].set_protons()
+threading.Thread(target=get_data_cache().warm_up, args=(warm_up_options,), daemon=True).start()
+
+
+# The agent and the markdown renderer are only built once a chat needs them
+ai_available = os.path.isfile("keys/claude.txt")
 if ai_available:
-    ai_chat_history = "Get a report for a specific nuclide to generate an AI summary."
-    print("Connected to Claude.")
+    ai_chat_history = "Ask about a nuclide to get an AI summary of its data."
 else:
+    print("No API key found in keys/claude.txt for Claude.")
     print("AI overview will not be available.")
     ai_chat_history = "Claude API access failed. AI summary not available."
-
-if ai_available:
-    chat_history = []
-    response, chat_history = claude_agent.chat("How good is the 7Li (N,G) cross section for FHR design work?",conversation_history=chat_history,metrics=metrics, options=options)
-    print(response)
-    ai_chat_history = "<div class=\"user-message-bubble\"><p class=\"user-message\"> How good is the 7Li (N,G) cross section for FHR design work?</p></div>"
-    formatted_response = md.render(response)
-    #formatted_response = md.render("Here is some exmaple response text.")
-    ai_chat_history += f"<p class=\"agent-message\"> {formatted_response}|safe </p>"
+claude_agent = None
+agent_lock = threading.Lock()
+md = None
 
 
+def get_agent():
+    global claude_agent, md
+    with agent_lock:
+        if md is None:
+            from markdown_it import MarkdownIt
+            md = MarkdownIt(
+                "commonmark",
+                {
+                    "html": False,
+                    "linkify": True,
+                    "typographer": True,
+                }
+            )
+        if claude_agent is None:
+            from nugrade.ai_agent import NuclearDataAgent
+            with open("keys/claude.txt","r") as f:
+                anthropic_api_key = f.read()
+            claude_agent = NuclearDataAgent(api_key=anthropic_api_key)
+        return claude_agent
 
 
-def render_for_particle(particle, options, version, text_report, plot_script, plot_component, ai_chat_history, options_text):
+def render_for_particle(particle, options, version, text_report, ai_chat_history, options_text, job_id=None):
     if particle == "n":
         template_extender = "neutrons.html"
     elif particle == "p":
@@ -70,23 +133,41 @@ def render_for_particle(particle, options, version, text_report, plot_script, pl
                                options=options,
                                version=version,
                                text_report=text_report,
-                               plot_script=plot_script,
-                               plot_component=plot_component,
                                ai_chat_history=ai_chat_history,
-                               options_text=options_text)
+                               options_text=options_text,
+                               custom_spectra=custom_spectra,
+                               evaluation_libraries=evaluation_libraries,
+                               job_id=job_id)
+
+def graded_options_text(user_session):
+    # Describes the chart being shown, or the options being graded while there is none yet
+    graded_options = user_session.jobs.latest_options
+    if graded_options is None:
+        graded_options = user_session.options
+    return graded_options.gen_html_description()
+
+
+def current_session():
+    # The calling user's options and grading jobs, started from the default chart on their first request
+    session_id, user_session = user_sessions.get_or_create(session.get('id'))
+    session['id'] = session_id
+    return user_session
+
 
 @app.route('/')
 def index():
-    plot_script, plot_component = plot_grades(metrics, options)
-    options_text = options.gen_html_description()
+    user_session = current_session()
+    options = user_session.options
+    options_text = graded_options_text(user_session)
+    # Until the startup chart is graded, the page shows its progress
+    job_id = startup_job_id if user_session.jobs.latest_metrics is None else None
     return render_for_particle(options.projectile, options, version,
-                               text_report, plot_script, plot_component, ai_chat_history, options_text)
+                               text_report, ai_chat_history, options_text, job_id=job_id)
 
 
-def process_base_form():
+def process_base_form(options):
     options.lower_energy = float(request.form['lower_energy'])
     options.upper_energy = float(request.form['upper_energy'])
-    print(request.form.get('energy_coverage_scale', False))
     if request.form.get('energy_coverage_scale', False):
         options.energy_coverage_scale = "log"
     else:
@@ -102,6 +183,8 @@ def process_base_form():
         options.evaluation = "endf8"
     if evaluation_response == "2":
         options.evaluation = "endf7-1"
+    if evaluation_response in evaluation_libraries:
+        options.evaluation = evaluation_response
 
     try:
         scored_response = request.form['scored-metric']
@@ -127,10 +210,14 @@ def process_base_form():
         options.weighting_function = "maxwell-boltzmann-320C"
     if weighting_response == "4":
         options.weighting_function = "watt"
+    if weighting_response in custom_spectra:
+        options.weighting_function = weighting_response
 
 @app.route('/generate_neutrons', methods=['POST'])
 def generate_neutrons():
-    process_base_form()
+    user_session = current_session()
+    options = copy.deepcopy(user_session.options)
+    process_base_form(options)
     options.required_reaction_channels = []
     if request.form.get('n,tot', False):
         options.required_reaction_channels += [(1, 'N,TOT')]
@@ -141,15 +228,18 @@ def generate_neutrons():
     if request.form.get('n,g', False):
         options.required_reaction_channels += [(102, 'N,G')]
 
-    metrics = grade_many_isotopes(options)
-    plot_script, plot_component = plot_grades(metrics, options)
-    options_text = options.gen_html_description()
+    user_session.options = options
+    job_id = user_session.jobs.submit(options)
+    options_text = graded_options_text(user_session)
     return render_for_particle(options.projectile, options, version,
-                               text_report, plot_script, plot_component, ai_chat_history, options_text)
+                               text_report, ai_chat_history, options_text,
+                               job_id=job_id)
 
 
 @app.route('/generate_protons', methods=['POST'])
 def generate_protons():
+    user_session = current_session()
+    options = copy.deepcopy(user_session.options)
     options.required_reaction_channels = []
     if request.form.get('p,el', False):
         options.required_reaction_channels += [(2, 'P,EL')]
@@ -158,45 +248,166 @@ def generate_protons():
     if request.form.get('p,g', False):
         options.required_reaction_channels += [(102, 'P,G')]
 
-    metrics = grade_many_isotopes(options)
-    plot_script, plot_component = plot_grades(metrics, options)
-    options_text = options.gen_html_description()
+    user_session.options = options
+    job_id = user_session.jobs.submit(options)
+    options_text = graded_options_text(user_session)
     return render_for_particle(options.projectile, options, version,
-                               text_report, plot_script, plot_component, ai_chat_history, options_text)
+                               text_report, ai_chat_history, options_text,
+                               job_id=job_id)
 
 
 @app.route('/neutrons')
 def set_neutrons():
+    user_session = current_session()
+    options = copy.deepcopy(user_session.options)
     options.set_neutrons()
+    user_session.options = options
+    job_id = user_session.jobs.submit(options)
     text_report = ""
-    plot_script, plot_component = plot_grades(metrics, options)
-    options_text = options.gen_html_description()
+    options_text = graded_options_text(user_session)
     return render_for_particle(options.projectile, options, version,
-                               text_report, plot_script, plot_component, ai_chat_history, options_text)
+                               text_report, ai_chat_history, options_text,
+                               job_id=job_id)
 
 @app.route('/protons')
 def set_protons():
+    user_session = current_session()
+    options = copy.deepcopy(user_session.options)
     options.set_protons()
+    user_session.options = options
+    job_id = user_session.jobs.submit(options)
     text_report = ""
-    plot_script, plot_component = plot_grades(metrics, options)
-    options_text = options.gen_html_description()
+    options_text = graded_options_text(user_session)
     return render_for_particle(options.projectile, options, version,
-                               text_report, plot_script, plot_component, ai_chat_history, options_text)
+                               text_report, ai_chat_history, options_text,
+                               job_id=job_id)
 
 
 @app.route('/get_report', methods=['POST'])
 def get_report():
+    user_session = current_session()
+    options = user_session.options
     report_nuclide = nuclide_symbol_format(request.form['report_nuclide'])
-    if report_nuclide in metrics.keys():
+    metrics = user_session.jobs.latest_metrics
+    if metrics is None:
+        text_report = "The chart is still being graded."
+    elif report_nuclide in metrics.keys():
         nuclide_metric = metrics[report_nuclide]
-        text_report = nuclide_metric.gen_report(options, for_web=True)
+        text_report = nuclide_metric.gen_report(user_session.jobs.latest_options, for_web=True, lazy_plots=True)
     else:
         text_report = "Nuclide not found."
-    plot_script, plot_component = plot_grades(metrics, options)
-    options_text = options.gen_html_description()
+    options_text = graded_options_text(user_session)
     return render_for_particle(options.projectile, options, version,
-                               text_report, plot_script, plot_component, ai_chat_history, options_text)
+                               text_report, ai_chat_history, options_text)
+
+
+@app.route('/chart.json')
+def chart_json():
+    # The chart is rendered once per graded result and fetched separately by the page
+    metrics, graded_options = current_session().jobs.latest()
+    if metrics is None:
+        return jsonify({}), 503
+    chart_payload = plot_grades_json(metrics, graded_options)
+    return Response(chart_payload, mimetype="application/json")
+
+
+def get_plotted_reaction(nuclide, reaction_name, evaluation):
+    # The graded reaction of the user's latest chart, if it has data to plot for the evaluation
+    metrics = current_session().jobs.latest_metrics
+    nuclide = nuclide_symbol_format(nuclide)
+    if metrics is None or nuclide not in metrics.keys() or reaction_name not in metrics[nuclide].reactions.keys():
+        return None
+    reaction = metrics[nuclide].reactions[reaction_name]
+    if not has_evaluation(reaction.data, evaluation):
+        return None
+    return reaction
+
+
+@app.route('/reaction_plot/<nuclide>/<reaction_name>/<evaluation>')
+def reaction_plot(nuclide, reaction_name, evaluation):
+    # Report plots are fetched by the page per reaction and rendered once per channel data
+    reaction = get_plotted_reaction(nuclide, reaction_name, evaluation)
+    if reaction is None:
+        return jsonify({}), 404
+    detail_url = f"/reaction_points/{nuclide}/{quote(reaction_name)}?evaluation={evaluation}"
+    with channel_context(nuclide, reaction_name):
+        plot_json = plot_precision_json(reaction, evaluation, detail_url=detail_url)
+    return Response(plot_json, mimetype="application/json")
+
+
+@app.route('/reaction_points/<nuclide>/<reaction_name>')
+def reaction_points(nuclide, reaction_name):
+    # Full resolution data for the energy window a report plot was zoomed to,
+    # downsampled again only if the window still holds too many points
+    graded_options = current_session().jobs.latest_options or default_options
+    evaluation = request.args.get('evaluation', graded_options.evaluation)
+    reaction = get_plotted_reaction(nuclide, reaction_name, evaluation)
+    if reaction is None:
+        return jsonify({}), 404
+    columns = precision_plot_columns(reaction, evaluation,
+                                     lower_energy=request.args.get('lower', type=float),
+                                     upper_energy=request.args.get('upper', type=float))
+    # JSON has no NaN, so missing values are sent as null
+    return jsonify({name: pd.Series(values, dtype=object).where(pd.notna(values), None).tolist()
+                    for name, values in columns.items()})
+
+
+@app.route('/chat_stream', methods=['POST'])
+def chat_stream():
+    # The agent's reply is sent as server-sent events while it is generated, ending
+    # with the full reply rendered from markdown
+    if not ai_available:
+        return jsonify({"error": "AI overview not available."}), 503
+    try:
+        agent = get_agent()
+    except Exception:
+        return jsonify({"error": "Access to Claude failed. Is your key correct, and are you connected to the internet?"}), 503
+    user_session = current_session()
+    events = agent.stream_chat(request.form['message'], user_session.jobs.latest_metrics,
+                                      user_session.jobs.latest_options, user_session.conversation_history)
+
+    def generate():
+        reply = ""
+        for event in events:
+            if event["type"] == "text":
+                reply += event["text"]
+            yield f"data: {json.dumps(event)}\n\n"
+        yield f"data: {json.dumps({'type': 'done', 'html': md.render(reply)})}\n\n"
+    return Response(generate(), mimetype="text/event-stream")
+
+
+@app.route('/job_status/<job_id>')
+def job_status(job_id):
+    job = current_session().jobs.get(job_id)
+    if job is None:
+        return jsonify({"id": job_id, "status": "unknown"}), 404
+    return jsonify(job.to_dict())
+
+
+@app.route('/healthz')
+def healthz():
+    # Up as soon as the server binds, whether or not the startup chart is graded yet
+    return jsonify({"status": "ok", "chart_ready": startup_jobs.latest_metrics is not None})
+
+
+@app.route('/cache_stats')
+def cache_stats():
+    return jsonify(result_cache.stats())
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    # Prometheus scrape target of stage timings and cache statistics
+    cache_stats = {"result": result_cache.stats(),
+                   "data": get_data_cache().stats(),
+                   "stage": get_stage_cache().stats(),
+                   "weight": get_weight_cache().stats(),
+                   "evaluation": get_evaluated_cache().stats()}
+    if NUGRADE_GRADING_ENGINE == "chart":
+        from nugrade.chart_engine import get_chart_table_cache
+        cache_stats["chart_table"] = get_chart_table_cache().stats()
+    return Response(prometheus_metrics(get_timings(), cache_stats), mimetype="text/plain; version=0.0.4")
 
 
 if __name__ == '__main__':
-    app.run(port=4000,debug=False)
\ No newline at end of file
+    app.run(port=4000,debug=False,threaded=True)
\ No newline at end of file
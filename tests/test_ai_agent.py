@@ -0,0 +1,135 @@
+from nugrade import *
+from nugrade.ai_agent import NuclearDataAgent
+import asyncio
+import json
+import subprocess
+import sys
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def sse_events(content_blocks, stop_reason):
+    # The server-sent events of a streamed Messages API response
+    events = [("message_start", {"type": "message_start", "message": {
+        "id": "msg_stub", "type": "message", "role": "assistant", "model": "stub", "content": [],
+        "stop_reason": None, "stop_sequence": None, "usage": {"input_tokens": 10, "output_tokens": 1}}})]
+    for index, block in enumerate(content_blocks):
+        if block["type"] == "text":
+            events += [("content_block_start", {"type": "content_block_start", "index": index,
+                                                "content_block": {"type": "text", "text": ""}})]
+            events += [("content_block_delta", {"type": "content_block_delta", "index": index,
+                                                "delta": {"type": "text_delta", "text": text}})
+                       for text in block["text"]]
+        else:
+            events += [("content_block_start", {"type": "content_block_start", "index": index, "content_block": {
+                           "type": "tool_use", "id": block["id"], "name": block["name"], "input": {}}}),
+                       ("content_block_delta", {"type": "content_block_delta", "index": index, "delta": {
+                           "type": "input_json_delta", "partial_json": json.dumps(block["input"])}})]
+        events += [("content_block_stop", {"type": "content_block_stop", "index": index})]
+    events += [("message_delta", {"type": "message_delta", "delta": {"stop_reason": stop_reason, "stop_sequence": None},
+                                  "usage": {"output_tokens": 5}}),
+               ("message_stop", {"type": "message_stop"})]
+    return "".join(f"event: {name}\ndata: {json.dumps(data)}\n\n" for name, data in events)
+
+
+class StubMessagesHandler(BaseHTTPRequestHandler):
+    # Asks for two reports on the first turn, then answers in text once given the tool results
+    def do_POST(self):
+        request_body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.requests.append(request_body)
+        if len(self.server.requests) == self.server.fail_on:
+            body = json.dumps({"type": "error", "error": {"type": "invalid_request_error", "message": "stub"}})
+            self.send_response(400)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(body.encode("utf-8"))
+            return
+        if len(self.server.requests) == 1:
+            body = sse_events([{"type": "text", "text": ["Checking..."]},
+                               {"type": "tool_use", "id": "toolu_1", "name": "get_nugrade_report",
+                                "input": {"nuclide": "7Li", "reaction_name": "N,TOT"}},
+                               {"type": "tool_use", "id": "toolu_2", "name": "get_nugrade_report",
+                                "input": {"nuclide": "7Li", "reaction_name": "N,G"}}], "tool_use")
+        else:
+            body = sse_events([{"type": "text", "text": ["The 7Li ", "data ", "is good."]}], "end_turn")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        self.wfile.write(body.encode("utf-8"))
+
+    def log_message(self, *args):
+        pass
+
+
+class TestNuclearDataAgent(unittest.TestCase):
+    def test_lazy_import(self):
+        # Importing the package must not pull in the anthropic client or bokeh
+        imported = subprocess.run([sys.executable, "-c", "import sys, nugrade; "
+                                   "print('anthropic' in sys.modules, 'bokeh' in sys.modules, "
+                                   "nugrade.NuclearDataAgent.__name__)"],
+                                  capture_output=True, text=True, check=True).stdout.split()
+        self.assertEqual(imported, ["False", "False", "NuclearDataAgent"])
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubMessagesHandler)
+        self.server.requests = []
+        self.server.fail_on = None
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.agent = NuclearDataAgent(api_key="stub", base_url=f"http://127.0.0.1:{self.server.server_port}")
+        # Both tool calls must be running at once to get past the barrier
+        barrier = threading.Barrier(2, timeout=10)
+
+        def execute_tool(tool_name, tool_input, metrics=None, options=None):
+            barrier.wait()
+            return f"{tool_input['reaction_name']} report"
+        self.agent.execute_tool = execute_tool
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_chat_stream(self):
+        async def collect(conversation_history):
+            return [event async for event in self.agent.chat_stream("How good is 7Li?", {}, None,
+                                                                      conversation_history)]
+        conversation_history = []
+        events = asyncio.run(collect(conversation_history))
+
+        self.assertEqual("".join(event["text"] for event in events if event["type"] == "text"),
+                         "Checking...The 7Li data is good.")
+        self.assertEqual([event["input"]["reaction_name"] for event in events if event["type"] == "tool_use"],
+                         ["N,TOT", "N,G"])
+        self.assertEqual(len(self.server.requests), 2)
+        first_request = self.server.requests[0]
+        self.assertEqual(first_request["system"][0]["cache_control"], {"type": "ephemeral"})
+        self.assertEqual(first_request["tools"][-1]["cache_control"], {"type": "ephemeral"})
+        self.assertTrue(first_request["stream"])
+        # The results of both tool calls go back in one message
+        tool_results = self.server.requests[1]["messages"][-1]["content"]
+        self.assertEqual([(result["tool_use_id"], result["content"]) for result in tool_results],
+                         [("toolu_1", "N,TOT report"), ("toolu_2", "N,G report")])
+        self.assertEqual([message["role"] for message in conversation_history],
+                         ["user", "assistant", "user", "assistant"])
+
+    def test_failed_turn(self):
+        async def collect(conversation_history):
+            return [event async for event in self.agent.chat_stream("How good is 7Li?", {}, None,
+                                                                      conversation_history)]
+        # The request with the tool results fails, after the first turn's messages were recorded
+        self.server.fail_on = 2
+        conversation_history = [{"role": "user", "content": [{"type": "text", "text": "Hello"}]},
+                                {"role": "assistant", "content": [{"type": "text", "text": "Hi"}]}]
+        with self.assertRaises(Exception):
+            asyncio.run(collect(conversation_history))
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual([message["role"] for message in conversation_history], ["user", "assistant"])
+
+    def test_stream_chat(self):
+        events = list(self.agent.stream_chat("How good is 7Li?", {}, None))
+        self.assertEqual(events[-1], {"type": "text", "text": "is good."})
+
+        self.server.shutdown()
+        self.server.server_close()
+        events = list(self.agent.stream_chat("How good is 7Li?", {}, None))
+        self.assertEqual(events[-1]["type"], "error")
@@ -0,0 +1,52 @@
+from nugrade import *
+from nugrade.channel_summary import summarize_channel, channel_summary, estimate_tokens
+from nugrade.ai_agent import NuclearDataAgent
+from nugrade.data_store import load_channel
+import contextlib
+import io
+import os
+import unittest
+
+
+class TestChannelSummary(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.options = MetricOptions()
+        cls.options.set_neutrons()
+        with contextlib.redirect_stdout(io.StringIO()):
+            cls.nuclide = grade_isotope(3, 7, "Li", cls.options)
+        cls.data = cls.nuclide.reactions["N,TOT"].data
+
+    def test_summary_contents(self):
+        summary = summarize_channel(self.data, "endf8", "7Li (N,TOT)")
+        self.assertTrue(summary.startswith(f"Summary of 7Li (N,TOT) against endf8: {len(self.data)} points"))
+        for section in ("Experiments (", "log-energy bins", "worst fitting points", "Widest energy gaps"):
+            self.assertIn(section, summary)
+        # The worst fitting point against each evaluation is listed first
+        for evaluation in ("endf8", "endf7-1"):
+            worst_row = self.data[evaluation + "_relative_error"].abs().idxmax()
+            worst_line = summarize_channel(self.data, evaluation).split("worst fitting points")[1].splitlines()[1]
+            self.assertEqual(worst_line.split(",")[-1], str(self.data.loc[worst_row, "EXFOR_Entry"]))
+
+    def test_token_budget(self):
+        for max_tokens in (3000, 600, 200, 50):
+            summary = summarize_channel(self.data, "endf8", "7Li (N,TOT)", max_tokens=max_tokens)
+            self.assertLessEqual(estimate_tokens(summary), max_tokens)
+        self.assertIn("log-energy bins", summarize_channel(self.data, "endf8", max_tokens=3000))
+        self.assertNotIn("log-energy bins", summarize_channel(self.data, "endf8", max_tokens=600))
+
+    def test_cached_tool(self):
+        summary = channel_summary(self.data, "endf7-1", "7Li (N,TOT)")
+        self.assertIs(channel_summary(self.data, "endf7-1", "7Li (N,TOT)"), summary)
+        # Summaries are cached per channel, so data read back from disk reuses them
+        reloaded = load_channel(os.path.join("data", "n_3_7_N,TOT.csv"), self.options.get_report_columns())
+        self.assertIs(channel_summary(reloaded, "endf7-1", "7Li (N,TOT)"), summary)
+        agent = NuclearDataAgent.__new__(NuclearDataAgent)
+        options = MetricOptions()
+        options.set_neutrons()
+        options.evaluation = "endf7-1"
+        tool_result = agent.execute_tool("get_nuclear_data", {"nuclide": "Li-7", "reaction_name": "N,TOT"},
+                                         metrics={"7Li": self.nuclide}, options=options)
+        self.assertIs(tool_result, summary)
+        self.assertIn("not found", agent.execute_tool("get_nuclear_data", {"nuclide": "U235", "reaction_name": "N,G"},
+                                                      metrics={"7Li": self.nuclide}, options=options))
@@ -0,0 +1,69 @@
+from nugrade import *
+from nugrade.chart_engine import ChartTableCache, grade_chart
+from nugrade.data_cache import ChannelDataCache
+from nugrade.data_store import read_isotope_catalogue
+from nugrade.grading_functions import reaction_results_table, experiment_results_table
+from nugrade.synthetic import write_synthetic_dataset
+import os
+import tempfile
+import unittest
+import pandas as pd
+
+
+class TestChartEngine(unittest.TestCase):
+    def assert_same_results(self, metrics, chart_metrics, options):
+        self.assertEqual(list(chart_metrics.keys()), list(metrics.keys()))
+        # Precomputed metrics are held as float32 in the consolidated table
+        pd.testing.assert_frame_equal(reaction_results_table(chart_metrics, options),
+                                      reaction_results_table(metrics, options), rtol=1E-5)
+        pd.testing.assert_frame_equal(experiment_results_table(chart_metrics), experiment_results_table(metrics),
+                                      rtol=1E-5)
+        for isotope, nuclide in metrics.items():
+            self.assertEqual(chart_metrics[isotope].num_datasets, nuclide.num_datasets)
+
+    def test_matches_nuclide_engine(self):
+        with tempfile.TemporaryDirectory() as catalogue_dir:
+            catalogue_path = os.path.join(catalogue_dir, "all_reactions.csv")
+            pd.DataFrame({"Z": [3, 4], "A": [7, 9], "Symbol": ["Li", "Be"]}).to_csv(catalogue_path, index=False)
+            for lower_energy, scale, metric, weighting_function in ((1E-2, "log", "chi_squared", None),
+                                                                   (1E5, "linear", "relative_error", "watt"),
+                                                                   (1E-2, "log", "chi_squared",
+                                                                    "maxwell-boltzmann-room-temp")):
+                options = MetricOptions()
+                options.set_neutrons()
+                options.lower_energy = lower_energy
+                options.energy_coverage_scale = scale
+                options.scored_metric = metric
+                options.weighting_function = weighting_function
+                self.assert_same_results(grade_many_isotopes(options, catalogue_path=catalogue_path),
+                                         grade_many_isotopes(options, catalogue_path=catalogue_path,
+                                                             engine="chart"), options)
+
+        with self.assertRaises(ValueError):
+            grade_many_isotopes(options, engine="vectorized")
+
+    def test_synthetic_chart(self):
+        options = MetricOptions()
+        options.set_neutrons()
+        with tempfile.TemporaryDirectory() as data_path:
+            write_synthetic_dataset(data_path, 12, 300, seed=2)
+            isotopes = read_isotope_catalogue(os.path.join(data_path, "all_reactions.csv"))
+            data_cache = ChannelDataCache(1024**3, data_path=data_path)
+            table_cache = ChartTableCache(1024**3)
+            metrics = {}
+            for z_val, a_val, symbol in isotopes:
+                nuclide = Nuclide(z_val, a_val, symbol)
+                nuclide.get_metrics(options, data_cache=data_cache)
+                metrics[str(a_val)+symbol] = nuclide
+            chart_metrics = {str(nuclide.A)+nuclide.symbol: nuclide
+                             for nuclide in grade_chart(isotopes, options, data_cache, table_cache)}
+            self.assert_same_results(metrics, chart_metrics, options)
+
+            # Regrading with other options reuses the consolidated table
+            options.upper_energy = 1E5
+            grade_chart(isotopes, options, data_cache, table_cache)
+            self.assertEqual(table_cache.stats()["hits"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
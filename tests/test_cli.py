@@ -0,0 +1,63 @@
+from nugrade import *
+from nugrade.__main__ import main
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+import pandas as pd
+
+
+class TestGradeCommand(unittest.TestCase):
+    def test_grade_presets(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            preset_path = os.path.join(output_dir, "presets.json")
+            with open(preset_path, "w") as preset_file:
+                json.dump({"thermal": {"projectile": "n", "upper_energy": 1.0},
+                           "fast": {"projectile": "n", "lower_energy": 1E5, "scored_metric": "relative_error"}},
+                          preset_file)
+            catalogue_path = os.path.join(output_dir, "all_reactions.csv")
+            pd.DataFrame({"Z": [3, 4], "A": [7, 9], "Symbol": ["Li", "Be"]}).to_csv(catalogue_path, index=False)
+            output_path = os.path.join(output_dir, "reactions.jsonl")
+            experiments_path = os.path.join(output_dir, "experiments.csv")
+            with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+                main(["grade", "--preset", preset_path, "--nuclides", "Li-7", "--reactions", "N,TOT", "N,G",
+                      "--catalogue", catalogue_path, "--output", output_path, "--experiments-output", experiments_path,
+                      "--snapshot-dir", os.path.join(output_dir, "snapshots")])
+            reactions = pd.read_json(output_path, lines=True)
+            experiments = pd.read_csv(experiments_path)
+
+        self.assertEqual(list(reactions["preset"]), ["thermal", "thermal", "fast", "fast"])
+        self.assertEqual(list(reactions["reaction"]), ["N,TOT", "N,G"] * 2)
+        self.assertEqual(list(reactions["mt"]), [1, 102] * 2)
+
+        options = MetricOptions()
+        options.set_neutrons()
+        options.lower_energy = 1E5
+        options.scored_metric = "relative_error"
+        expected = grade_isotope(3, 7, "Li", options).reactions["N,TOT"]
+        fast_total = reactions[(reactions["preset"] == "fast") & (reactions["reaction"] == "N,TOT")].iloc[0]
+        self.assertAlmostEqual(fast_total["score"], expected.score)
+        self.assertEqual(len(experiments[experiments["preset"] == "fast"]), len(expected.experiment_results))
+
+    def test_projectile_flag_overrides_preset(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            preset_path = os.path.join(output_dir, "neutrons.json")
+            with open(preset_path, "w") as preset_file:
+                json.dump({"projectile": "n", "upper_energy": 1E6}, preset_file)
+            catalogue_path = os.path.join(output_dir, "all_reactions.csv")
+            pd.DataFrame({"Z": [3], "A": [7], "Symbol": ["Li"]}).to_csv(catalogue_path, index=False)
+            output_path = os.path.join(output_dir, "reactions.csv")
+            with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+                main(["grade", "--preset", preset_path, "--projectile", "p", "--catalogue", catalogue_path,
+                      "--output", output_path, "--no-snapshot"])
+            reactions = pd.read_csv(output_path)
+
+        # Proton defaults apply, with the preset's other options on top
+        self.assertEqual(list(reactions["projectile"]), ["p", "p"])
+        self.assertEqual(list(reactions["reaction"]), ["P,EL", "P,INL"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+from nugrade import *
+from nugrade.data_cache import ChannelDataCache, get_data_cache
+import os
+import tempfile
+import unittest
+import pandas as pd
+
+
+class TestDataCache(unittest.TestCase):
+    def test_cache_hits(self):
+        options = MetricOptions()
+        options.set_neutrons()
+        data_cache = ChannelDataCache(max_bytes=1024**3)
+        channel_data = data_cache.get("n", 3, 7, "N,TOT", options.get_data_columns())
+        self.assertEqual(len(channel_data), 8107)
+        self.assertIs(data_cache.get("n", 3, 7, "N,TOT", options.get_data_columns()), channel_data)
+        self.assertIs(data_cache.get("n", 3, 7, "N,TOT", ["Energy", "Data"]), channel_data)
+
+        # Missing channels are cached as empty frames
+        self.assertEqual(len(data_cache.get("n", 3, 7, "N,G")), 0)
+        stats = data_cache.stats()
+        self.assertEqual(stats["hits"], 2)
+        self.assertEqual(stats["misses"], 2)
+
+        # Grading through the cache does not reload the data
+        nuclide = Nuclide(3, 7, "Li")
+        options.required_reaction_channels = [(1, 'N,TOT')]
+        nuclide.get_metrics(options, data_cache=data_cache)
+        self.assertIs(nuclide.reactions['N,TOT'].data, channel_data)
+        self.assertEqual(data_cache.stats()["misses"], 2)
+
+    def test_released_data(self):
+        # Graded reactions read their data back from the shared cache instead of holding it
+        options = MetricOptions()
+        options.set_neutrons()
+        reaction = grade_isotope(3, 7, "Li", options).reactions['N,TOT']
+        self.assertIsNotNone(reaction.data_loader)
+        self.assertIs(reaction.data, get_data_cache().get("n", 3, 7, "N,TOT", options.get_data_columns()))
+        get_data_cache().clear()
+        self.assertEqual(len(reaction.data), 8107)
+        self.assertEqual(reaction.num_datapoints, 8107)
+
+    def test_column_union(self):
+        data_cache = ChannelDataCache(max_bytes=1024**3)
+        data_cache.get("n", 3, 7, "N,TOT", ["Energy", "Data"])
+        channel_data = data_cache.get("n", 3, 7, "N,TOT", ["Energy", "dData"])
+        self.assertEqual(list(channel_data.columns), ["Energy", "dData"])
+        self.assertEqual(channel_data.attrs["channel"], ("n", 3, 7, "N,TOT"))
+
+        # The cached entry now holds both requests' columns
+        union_data = data_cache.get("n", 3, 7, "N,TOT", ["Data", "dData"])
+        self.assertEqual(set(union_data.columns), {"Energy", "Data", "dData"})
+        self.assertIs(data_cache.get("n", 3, 7, "N,TOT", ["Energy"]), union_data)
+        stats = data_cache.stats()
+        self.assertEqual(stats["hits"], 2)
+        self.assertEqual(stats["misses"], 2)
+        self.assertEqual(stats["entries"], 1)
+
+    def test_byte_budget_and_pinning(self):
+        data_cache = ChannelDataCache(max_bytes=1024**3)
+        channel_data = data_cache.get("n", 3, 7, "N,TOT")
+        data_cache.max_bytes = data_cache.nbytes
+        data_cache.pin_nuclide("n", 3, 7)
+        data_cache.get("n", 4, 9, "N,TOT")
+        data_cache.get("n", 4, 9, "N,EL")
+        self.assertIs(data_cache.get("n", 3, 7, "N,TOT"), channel_data)
+
+        data_cache.unpin_nuclide("n", 3, 7)
+        self.assertLessEqual(data_cache.nbytes, data_cache.max_bytes)
+        data_cache.max_bytes = 0
+        data_cache.get("n", 4, 9, "N,G")
+        self.assertEqual(data_cache.stats()["entries"], 0)
+
+    def test_warm_up(self):
+        options = MetricOptions()
+        options.set_neutrons()
+        with tempfile.TemporaryDirectory() as catalogue_dir:
+            catalogue_path = os.path.join(catalogue_dir, "all_reactions.csv")
+            pd.DataFrame({"Z": [3, 0], "A": [7, 1], "Symbol": ["Li", "n"]}).to_csv(catalogue_path, index=False)
+            data_cache = ChannelDataCache(max_bytes=1024**3)
+            num_loaded = data_cache.warm_up([options], catalogue_path=catalogue_path)
+        self.assertEqual(num_loaded, 4)
+        self.assertEqual(data_cache.stats()["entries"], 4)
+        self.assertEqual(len(data_cache.get("n", 3, 7, "N,TOT", options.get_data_columns())), 8107)
+
+
+if __name__ == '__main__':
+    unittest.main()
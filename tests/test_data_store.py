@@ -0,0 +1,61 @@
+from nugrade import *
+from nugrade.data_store import convert_csv_directory, load_channel, read_channel_csv
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+
+
+class TestDataStore(unittest.TestCase):
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        shutil.copy(os.path.join("data", "n_3_7_N,TOT.csv"), self.data_dir)
+        self.dataset_path = os.path.join(self.data_dir, "n_3_7_N,TOT.csv")
+
+    def tearDown(self):
+        shutil.rmtree(self.data_dir)
+
+    def test_store_matches_csv(self):
+        converted = convert_csv_directory(self.data_dir)
+        self.assertEqual(converted, ["n_3_7_N,TOT.csv"])
+
+        csv_data = read_channel_csv(self.dataset_path)
+        store_data = load_channel(self.dataset_path)
+        pd.testing.assert_frame_equal(store_data, csv_data)
+
+    def test_store_column_projection(self):
+        convert_csv_directory(self.data_dir)
+        options = MetricOptions()
+        options.set_neutrons()
+        columns = options.get_data_columns()
+
+        store_data = load_channel(self.dataset_path, columns)
+        self.assertEqual(list(store_data.columns), [c for c in read_channel_csv(self.dataset_path).columns
+                                                    if c in columns])
+        pd.testing.assert_frame_equal(store_data, read_channel_csv(self.dataset_path, columns))
+
+        # Grading only reads the scored metric of the evaluation, reports read every evaluation
+        self.assertEqual(columns[-2:], ["endf8", "endf8_chi_squared"])
+        self.assertNotIn("endf7-1", columns)
+        self.assertNotIn("endf8_relative_error", columns)
+        report_columns = options.get_report_columns()
+        self.assertTrue(set(columns) <= set(report_columns))
+        self.assertIn("endf7-1_relative_error", report_columns)
+
+    def test_store_missing_strings(self):
+        csv_data = read_channel_csv(self.dataset_path)
+        csv_data.loc[[0, 5], "Author"] = np.nan
+        csv_data.loc[7, "Dataset_Number"] = np.nan
+        csv_data.to_csv(self.dataset_path, index=False)
+        convert_csv_directory(self.data_dir)
+
+        store_data = load_channel(self.dataset_path)
+        self.assertEqual(store_data["Author"].isna().sum(), 2)
+        self.assertFalse((store_data["Author"] == "nan").any())
+        pd.testing.assert_frame_equal(store_data, read_channel_csv(self.dataset_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+from nugrade import *
+from nugrade.downsampling import lttb_indices, downsample_by_dataset
+from nugrade.nuclide import precision_plot_columns
+import numpy as np
+import unittest
+
+
+class TestDownsampling(unittest.TestCase):
+    def test_lttb_keeps_peaks(self):
+        x = np.linspace(0, 10, 10001)
+        y = np.exp(-(x-3.3)**2/0.001)
+        selected = lttb_indices(x, y, 100)
+        self.assertEqual(len(selected), 100)
+        self.assertEqual(selected[0], 0)
+        self.assertEqual(selected[-1], 10000)
+        self.assertTrue(np.all(np.diff(selected) > 0))
+        self.assertGreater(np.max(y[selected]), 0.9)
+
+    def test_dataset_budget(self):
+        energies = np.concatenate((np.logspace(0, 6, 9000), np.logspace(2, 4, 1000)))
+        values = np.ones(10000)
+        dataset_codes = np.repeat([0, 1], [9000, 1000])
+        selected = downsample_by_dataset(energies, values, dataset_codes, 500)
+        self.assertEqual(len(selected), 500)
+        self.assertEqual(np.sum(selected >= 9000), 52)
+        self.assertTrue(np.all(np.diff(selected) > 0))
+        self.assertEqual(len(downsample_by_dataset(energies, values, dataset_codes, None)), 10000)
+
+    def test_many_datasets(self):
+        # The budget is a hard limit even with more datasets than points to spare
+        energies = np.logspace(0, 6, 4000)
+        values = np.ones(4000)
+        dataset_codes = np.arange(4000) % 400
+        for max_points in (1000, 500, 100, 7):
+            selected = downsample_by_dataset(energies, values, dataset_codes, max_points)
+            self.assertEqual(len(selected), max_points)
+            self.assertTrue(np.all(np.diff(selected) > 0))
+        self.assertEqual(len(np.unique(dataset_codes[downsample_by_dataset(energies, values, dataset_codes, 1000)])),
+                         400)
+
+    def test_missing_datasets(self):
+        # Rows without a dataset number are kept as a dataset of their own
+        energies = np.logspace(0, 6, 2000)
+        values = np.ones(2000)
+        dataset_codes = np.repeat([0, -1, 1], [1000, 500, 500])
+        selected = downsample_by_dataset(energies, values, dataset_codes, 100)
+        self.assertEqual(len(selected), 100)
+        self.assertEqual(np.sum(dataset_codes[selected] == -1), 26)
+
+        selected = downsample_by_dataset(energies, values, np.full(2000, -1), 100)
+        self.assertEqual(len(selected), 100)
+
+    def test_precision_plot_columns(self):
+        options = MetricOptions()
+        options.set_neutrons()
+        reaction = grade_isotope(3, 7, "Li", options).reactions["N,TOT"]
+        columns = precision_plot_columns(reaction, options.evaluation, max_points=1000)
+        self.assertLess(len(columns["Energy"]), 1100)
+        self.assertEqual(set(columns["Dataset_Number"]), set(reaction.data["Dataset_Number"]))
+
+        # Zoomed windows come back at full resolution
+        columns = precision_plot_columns(reaction, options.evaluation, 1E5, 2E5, max_points=2000)
+        window = reaction.data[reaction.data["Energy"].between(1E5, 2E5)]
+        self.assertEqual(len(columns["Energy"]), len(window))
+
+
+if __name__ == '__main__':
+    unittest.main()
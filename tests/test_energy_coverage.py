@@ -1,7 +1,7 @@
 from nugrade import *
 import unittest
 import pandas as pd
-from nugrade.calc_energy_coverage import calc_energy_coverage
+from nugrade.calc_energy_coverage import calc_energy_coverage, calc_energy_coverage_segments
 
 class TestEnergyCoverage(unittest.TestCase):
     def test_energy_coverage_linear(self):
@@ -29,6 +29,24 @@ class TestEnergyCoverage(unittest.TestCase):
         expected_coverage_2 = 37.5
         self.assertEqual(calculated_coverage_2, expected_coverage_2)
 
+    def test_energy_coverage_segments(self):
+        options = MetricOptions()
+        options.lower_energy = 0.0
+        options.upper_energy = 1.0
+        options.energy_width = 0.2
+        options.energy_coverage_scale = "linear"
+
+        segment_1 = [0.2, 0.25, 0.55, 0.7, 0.95]
+        segment_2 = [0.1, 0.5]
+        energies = segment_1 + segment_2
+        offsets = [0, 5, 5, 7]
+        calculated_coverages = calc_energy_coverage_segments(energies, offsets, options)
+        expected_coverages = [calc_energy_coverage(pd.DataFrame({"Energy": segment_1}), options),
+                              0.0,
+                              calc_energy_coverage(pd.DataFrame({"Energy": segment_2}), options)]
+        self.assertEqual(list(calculated_coverages), expected_coverages)
+        self.assertEqual(calculated_coverages[0], 75)
+
     def test_energy_coverage_sort(self):
         options = MetricOptions()
         options.lower_energy = 0.0
@@ -0,0 +1,96 @@
+from nugrade import *
+from nugrade.data_store import load_channel
+from nugrade.evaluations import interpolate_cross_section, register_library, evaluation_metric, EvaluatedCache
+import gc
+import os
+import tempfile
+import unittest
+import weakref
+import numpy as np
+import pandas as pd
+
+
+class TestEvaluations(unittest.TestCase):
+    def test_interpolation(self):
+        energies = np.array([1.0, 10.0, 10.0, 100.0])
+        xs = np.array([1.0, 10.0, 20.0, 2.0])
+        test_energies = np.array([0.5, 1.0, 5.5, 10.0, 31.6227766, 100.0, 200.0])
+        lin_lin = interpolate_cross_section(energies, xs, test_energies, "lin-lin")
+        self.assertTrue(np.allclose(lin_lin[1:6], [1.0, 5.5, 20.0, 20.0 - 18.0*21.6227766/90.0, 2.0]))
+        self.assertTrue(np.isnan(lin_lin[0]) and np.isnan(lin_lin[6]))
+        log_log = interpolate_cross_section(energies, xs, test_energies, "log-log")
+        self.assertTrue(np.allclose(log_log[[2, 4]], [5.5, np.sqrt(40.0)]))
+
+    def test_library_matches_precomputed(self):
+        options = MetricOptions()
+        options.set_neutrons()
+        options.required_reaction_channels = [(1, 'N,TOT')]
+        data = load_channel(os.path.join("data", "n_3_7_N,TOT.csv"))
+        with tempfile.TemporaryDirectory() as library_dir:
+            library = data[["Energy", "endf8"]].drop_duplicates("Energy").rename(columns={"endf8": "XS"})
+            library.to_csv(os.path.join(library_dir, "n_3_7_N,TOT.csv"), index=False)
+            register_library("endf8-pointwise", library_dir)
+            for metric in ("chi_squared", "relative_error"):
+                self.assertTrue(np.allclose(evaluation_metric(data, "endf8-pointwise", metric),
+                                            data[f"endf8_{metric}"], rtol=1E-9, equal_nan=True))
+                options.scored_metric = metric
+                options.evaluation = "endf8"
+                expected = grade_isotope(3, 7, "Li", options).reactions["N,TOT"]
+                options.evaluation = "endf8-pointwise"
+                reaction = grade_isotope(3, 7, "Li", options).reactions["N,TOT"]
+                self.assertAlmostEqual(reaction.score, expected.score, places=9)
+                self.assertAlmostEqual(reaction.average_metric, expected.average_metric, places=9)
+
+    def test_evaluated_cache(self):
+        data = load_channel(os.path.join("data", "n_3_7_N,TOT.csv"), ["Energy", "endf8"])
+        with tempfile.TemporaryDirectory() as library_dir:
+            library = data[["Energy", "endf8"]].drop_duplicates("Energy").rename(columns={"endf8": "XS"})
+            library.to_csv(os.path.join(library_dir, "n_3_7_N,TOT.csv"), index=False)
+            register_library("endf8-cached", library_dir)
+            evaluated_cache = EvaluatedCache(2**20)
+            evaluated = evaluated_cache.get("endf8-cached", data)
+
+            # Cached per channel without holding the raw data, so data read back from disk hits
+            data_ref = weakref.ref(data)
+            del data
+            gc.collect()
+            self.assertIsNone(data_ref())
+            reloaded = load_channel(os.path.join("data", "n_3_7_N,TOT.csv"), ["Energy"])
+            self.assertIs(evaluated_cache.get("endf8-cached", reloaded), evaluated)
+            self.assertEqual(evaluated_cache.stats()["nbytes"], evaluated.nbytes)
+
+    def test_partial_library(self):
+        options = MetricOptions()
+        options.set_neutrons()
+        options.evaluation = "endf8-fast"
+        data = load_channel(os.path.join("data", "n_3_7_N,TOT.csv"))
+        with tempfile.TemporaryDirectory() as library_dir:
+            catalogue_path = os.path.join(library_dir, "all_reactions.csv")
+            pd.DataFrame({"Z": [3], "A": [7], "Symbol": ["Li"]}).to_csv(catalogue_path, index=False)
+            library = data[["Energy", "endf8"]].drop_duplicates("Energy").rename(columns={"endf8": "XS"})
+            library[library["Energy"] > 1E6].to_csv(os.path.join(library_dir, "n_3_7_N,TOT.csv"), index=False)
+            register_library("endf8-fast", library_dir)
+            for engine in ("nuclide", "chart"):
+                nuclide = grade_many_isotopes(options, catalogue_path=catalogue_path, engine=engine)["7Li"]
+
+                # Only experiments with points above 1 MeV are scored
+                total = nuclide.reactions["N,TOT"]
+                self.assertTrue(np.isfinite(total.average_metric) and np.isfinite(total.score))
+                experiments = total.experiment_results
+                entries_above = set(data.loc[data["Energy"] > 1E6, "EXFOR_Entry"])
+                self.assertTrue(np.all(experiments.loc[~experiments["EXFOR_Entry"].isin(entries_above),
+                                                       "energy_coverage"] == 0.0))
+                self.assertTrue(np.all(np.isfinite(experiments["avg_endf8-fast_chi_squared"])))
+
+            # Channels a library lacks are left ungraded
+            options.evaluation = "endf8-empty"
+            with tempfile.TemporaryDirectory() as empty_dir:
+                register_library("endf8-empty", empty_dir)
+                for engine in ("nuclide", "chart"):
+                    total = grade_many_isotopes(options, catalogue_path=catalogue_path,
+                                                engine=engine)["7Li"].reactions["N,TOT"]
+                    self.assertEqual((total.num_datapoints, total.average_metric, total.score), (0, 0.0, 0.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
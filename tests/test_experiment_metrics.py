@@ -0,0 +1,127 @@
+from nugrade import *
+from nugrade.calc_energy_coverage import calc_energy_coverage
+from nugrade.grading_stages import run_grading_stages, StageCache
+from nugrade.synthetic import synthetic_channel
+from nugrade.channel_index import ChannelIndex
+from nugrade.weighting_functions import watt, maxwell_boltzmann_room_temp
+import unittest
+import numpy as np
+import pandas as pd
+
+
+class TestExperimentMetrics(unittest.TestCase):
+    def test_grouped_metrics_match_per_experiment(self):
+        options = MetricOptions()
+        options.set_neutrons()
+        options.required_reaction_channels = [(1, 'N,TOT')]
+        options.scored_metric = "relative_error"
+        options.weighting_function = "watt"
+        test_nuclide_metrics = grade_isotope(3, 7, "7Li", options)
+        data = test_nuclide_metrics.reactions['N,TOT'].data
+        channel_data = data[data['Energy'].between(options.lower_energy, options.upper_energy)]
+
+        stage_results = run_grading_stages(data, options)
+        experiment_results = stage_results["score"]["experiment_results"]
+        self.assertEqual(len(experiment_results), channel_data["EXFOR_Entry"].nunique())
+        self.assertEqual(stage_results["coverage"]["energy_coverage"], calc_energy_coverage(channel_data, options))
+        self.assertEqual(stage_results["coverage"]["energy_coverage_w_unc"],
+                         calc_energy_coverage(channel_data[channel_data["dData"].notna()], options))
+
+        # Reference values computed one experiment at a time
+        for entry, author, metric, coverage in experiment_results.itertuples(index=False):
+            experiment_data = channel_data[channel_data["EXFOR_Entry"] == entry]
+            if len(experiment_data.dropna()) == 0:
+                self.assertEqual(coverage, 0.0)
+                self.assertEqual(metric, 0.0)
+                continue
+            expected_coverage = calc_energy_coverage(experiment_data, options)
+            expected_metric = expected_coverage * np.nanmean(np.abs(
+                watt(experiment_data['Energy']) * experiment_data["endf8_relative_error"]))
+            self.assertEqual(coverage, expected_coverage)
+            self.assertTrue(np.isclose(metric, expected_metric, rtol=1e-12))
+
+    def test_weights_spanning_orders_of_magnitude(self):
+        # Thermal weights dwarf those in the window, which must not swamp the window's experiment means
+        options = MetricOptions()
+        options.set_neutrons()
+        options.weighting_function = "maxwell-boltzmann-room-temp"
+        options.lower_energy = 1.0
+        options.upper_energy = 1E5
+        data = synthetic_channel(1, 2, 102, 2000, seed=0)
+        stage_results = run_grading_stages(data, options)
+
+        entry_codes, entries = pd.factorize(data["EXFOR_Entry"])
+        in_window = data['Energy'].between(options.lower_energy, options.upper_energy).to_numpy()
+        weighted_metric = np.abs(maxwell_boltzmann_room_temp(data['Energy'].to_numpy()) *
+                                 data["endf8_chi_squared"].to_numpy())
+        for code in range(len(entries)):
+            experiment_metric = weighted_metric[in_window & (entry_codes == code)]
+            experiment_metric = experiment_metric[~np.isnan(experiment_metric)]
+            expected = np.mean(experiment_metric) if len(experiment_metric) > 0 else np.nan
+            self.assertTrue(np.isclose(stage_results["metric"]["entry_metric_means"][code], expected,
+                                       rtol=1e-12, atol=0.0, equal_nan=True))
+
+    def test_metric_sums_spanning_decades(self):
+        # Windowed sums from prefix sums match a direct scan with values from 1E-200 to 1E200
+        rng = np.random.default_rng(4)
+        data = pd.DataFrame({"Energy": np.sort(rng.uniform(0, 1000, 3000)),
+                             "EXFOR_Entry": rng.choice(["A", "B", "C", "D"], 3000),
+                             "Author": "X", "dData": 1.0})
+        index = ChannelIndex(data)
+        values = 10**rng.uniform(-200, 200, 3000) * (rng.random(3000) < 0.95)
+        values[rng.random(3000) < 0.1] = np.nan
+        metric_sums = index.metric_prefix_sums(values)[0]
+        entry_codes = index.entry_codes
+        for start, end in [(0, 3000), (100, 101), (1500, 2900), (2999, 3000), (400, 400)]:
+            expected = [np.nansum(values[start:end][entry_codes[start:end] == code]) for code in range(4)]
+            self.assertTrue(np.allclose(metric_sums.window(start, end), expected, rtol=1e-13, atol=0.0))
+
+    def test_energy_windows(self):
+        options = MetricOptions()
+        options.set_neutrons()
+        data = grade_isotope(3, 7, "Li", options).reactions['N,TOT'].data
+        for lower_energy, upper_energy in [(1E3, 1E5), (2E5, 2E5+1), (1E7, 1E8)]:
+            options.lower_energy = lower_energy
+            options.upper_energy = upper_energy
+            channel_data = data[data['Energy'].between(lower_energy, upper_energy)]
+            stage_results = run_grading_stages(data, options)
+            window = stage_results["window"]
+            pd.testing.assert_frame_equal(data.iloc[window["start"]:window["end"]], channel_data)
+            self.assertEqual(stage_results["coverage"]["energy_coverage"], calc_energy_coverage(channel_data, options))
+            self.assertEqual(list(stage_results["score"]["experiment_results"]["EXFOR_Entry"]),
+                             list(channel_data["EXFOR_Entry"].unique()))
+
+    def test_stage_reuse(self):
+        options = MetricOptions()
+        options.set_neutrons()
+        options.required_reaction_channels = [(1, 'N,TOT')]
+        stage_cache = StageCache(max_bytes=1024**3)
+        nuclide = Nuclide(3, 7, "Li")
+        nuclide.get_metrics(options, stage_cache=stage_cache)
+        self.assertEqual(stage_cache.stats()["misses"], 7)
+
+        # Changing the weighting function only recomputes the metric and score
+        options.weighting_function = "watt"
+        nuclide.get_metrics(options, stage_cache=stage_cache)
+        self.assertEqual(stage_cache.stats()["hits"], 4)
+        self.assertEqual(stage_cache.stats()["misses"], 10)
+        reference = run_grading_stages(nuclide.reactions['N,TOT'].data, options)
+        self.assertEqual(nuclide.reactions['N,TOT'].score, reference["score"]["score"])
+
+        # Changing the energy width only recomputes the coverage and score
+        options.energy_width = 0.1
+        nuclide.get_metrics(options, stage_cache=stage_cache)
+        self.assertEqual(stage_cache.stats()["hits"], 8)
+        self.assertEqual(stage_cache.stats()["misses"], 13)
+
+        # Changing the energy window reuses the channel index and its prefix sums
+        options.lower_energy = 1E5
+        nuclide.get_metrics(options, stage_cache=stage_cache)
+        self.assertEqual(stage_cache.stats()["hits"], 11)
+        self.assertEqual(stage_cache.stats()["misses"], 17)
+        reference = run_grading_stages(nuclide.reactions['N,TOT'].data, options)
+        self.assertEqual(nuclide.reactions['N,TOT'].score, reference["score"]["score"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+from nugrade import *
+from nugrade.grading_functions import GradingCancelled
+from nugrade.grading_jobs import GradingJobManager
+import os
+import tempfile
+import threading
+import time
+import unittest
+import pandas as pd
+
+
+class TestGradingJobs(unittest.TestCase):
+    def setUp(self):
+        self.catalogue_dir = tempfile.TemporaryDirectory()
+        self.catalogue_path = os.path.join(self.catalogue_dir.name, "all_reactions.csv")
+        pd.DataFrame({"Z": [3, 4], "A": [7, 9], "Symbol": ["Li", "Be"]}).to_csv(self.catalogue_path, index=False)
+
+    def tearDown(self):
+        self.catalogue_dir.cleanup()
+
+    def test_job_progress(self):
+        options = MetricOptions()
+        options.set_neutrons()
+        grading_jobs = GradingJobManager(catalogue_path=self.catalogue_path)
+        job_id = grading_jobs.submit(options)
+        self.assertEqual(grading_jobs.wait(job_id, timeout=60), "done")
+
+        job_status = grading_jobs.get(job_id).to_dict()
+        self.assertEqual(job_status["num_graded"], 2)
+        self.assertEqual(job_status["num_isotopes"], 2)
+        self.assertEqual(job_status["current_isotope"], "9Be")
+        self.assertEqual(list(grading_jobs.latest_metrics.keys()), ["7Li", "9Be"])
+        self.assertEqual(grading_jobs.latest_options.to_dict(), options.to_dict())
+
+    def test_cancellation(self):
+        options = MetricOptions()
+        options.set_neutrons()
+        cancel_event = threading.Event()
+        graded = []
+
+        def cancel_after_first(isotope, num_graded, num_isotopes):
+            graded.append(isotope)
+            cancel_event.set()
+
+        with self.assertRaises(GradingCancelled):
+            grade_many_isotopes(options, catalogue_path=self.catalogue_path,
+                                progress=cancel_after_first, cancel_event=cancel_event)
+        self.assertEqual(graded, ["7Li"])
+
+    def test_cancel_after_grading(self):
+        options = MetricOptions()
+        options.set_neutrons()
+        graded = threading.Event()
+        release = threading.Event()
+
+        class BlockingCache:
+            def get(self, options, catalogue_path=None, engine="nuclide"):
+                return None
+
+            def put(self, options, metrics, catalogue_path=None, engine="nuclide"):
+                graded.set()
+                release.wait(60)
+
+        grading_jobs = GradingJobManager(cache=BlockingCache(), catalogue_path=self.catalogue_path)
+        job_id = grading_jobs.submit(options)
+        self.assertTrue(graded.wait(60))
+        grading_jobs.cancel(job_id)
+        release.set()
+        self.assertEqual(grading_jobs.wait(job_id, timeout=60), "cancelled")
+        self.assertIsNone(grading_jobs.get(job_id).metrics)
+        self.assertEqual(grading_jobs.latest(), (None, None))
+
+    def test_eviction(self):
+        options = MetricOptions()
+        options.set_neutrons()
+        release = threading.Event()
+
+        class BlockingCache:
+            def get(self, options, catalogue_path=None, engine="nuclide"):
+                release.wait(60)
+                return {}
+
+            def put(self, options, metrics, catalogue_path=None, engine="nuclide"):
+                pass
+
+        grading_jobs = GradingJobManager(cache=BlockingCache(), catalogue_path=self.catalogue_path, max_jobs=1)
+        first_job_id = grading_jobs.submit(options, supersede=False)
+        second_job_id = grading_jobs.submit(options, supersede=False)
+        # Running jobs are kept beyond max_jobs
+        jobs = [grading_jobs.get(first_job_id), grading_jobs.get(second_job_id)]
+        self.assertNotIn(None, jobs)
+        release.set()
+        while any(job.finished_at is None for job in jobs):
+            time.sleep(0.05)
+        self.assertEqual([job.status for job in jobs], ["done", "done"])
+        self.assertEqual(sum(grading_jobs.get(job.id) is not None for job in jobs), 1)
+
+    def test_fallback(self):
+        options = MetricOptions()
+        options.set_neutrons()
+        startup_jobs = GradingJobManager(catalogue_path=self.catalogue_path)
+        grading_jobs = GradingJobManager(catalogue_path=self.catalogue_path, fallback=startup_jobs)
+        self.assertEqual(grading_jobs.latest(), (None, None))
+
+        startup_job_id = startup_jobs.submit(options)
+        self.assertIs(grading_jobs.get(startup_job_id), startup_jobs.get(startup_job_id))
+        self.assertEqual(grading_jobs.wait(startup_job_id, timeout=60), "done")
+        self.assertIs(grading_jobs.latest_metrics, startup_jobs.latest_metrics)
+
+        options.upper_energy = 1.0
+        job_id = grading_jobs.submit(options)
+        self.assertNotEqual(job_id, startup_job_id)
+        self.assertEqual(grading_jobs.wait(job_id, timeout=60), "done")
+        self.assertEqual(grading_jobs.latest_options.upper_energy, 1.0)
+        self.assertNotEqual(startup_jobs.latest_options.upper_energy, 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
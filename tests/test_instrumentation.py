@@ -0,0 +1,64 @@
+from nugrade import *
+from nugrade.__main__ import main
+from nugrade.grading_stages import StageCache
+from nugrade.instrumentation import (enable_instrumentation, disable_instrumentation, get_timings, stage_timer,
+                                     channel_context, prometheus_metrics)
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+import pandas as pd
+
+
+class TestInstrumentation(unittest.TestCase):
+    def tearDown(self):
+        disable_instrumentation()
+
+    def test_disabled(self):
+        self.assertIsNone(get_timings())
+        with channel_context("7Li", "N,TOT"):
+            with stage_timer("load") as timer:
+                timer.rows = 10
+        self.assertIsNone(get_timings())
+
+    def test_stage_timings(self):
+        options = MetricOptions()
+        options.set_neutrons()
+        timings = enable_instrumentation()
+        nuclide = Nuclide(3, 7, "Li")
+        nuclide.get_metrics(options, stage_cache=StageCache(1024**3))
+        records = {(record["stage"], record["reaction"]): record for record in timings.records()
+                   if record["nuclide"] == "7Li"}
+        num_rows = len(nuclide.reactions["N,TOT"].data)
+        for stage in ("load", "index", "window", "gaps", "coverage", "metric_sums", "metric", "score"):
+            self.assertEqual(records[(stage, "N,TOT")]["calls"], 1)
+            self.assertEqual(records[(stage, "N,TOT")]["rows"], num_rows)
+        self.assertEqual(records[("load", "N,G")]["rows"], 0)
+        self.assertEqual(timings.slowest_channels(1)[0][:2], ("7Li", "N,TOT"))
+
+        # Worker timings merge into the totals, and everything is exposed for Prometheus
+        timings.merge([{"stage": "load", "nuclide": "7Li", "reaction": "N,TOT", "calls": 2, "seconds": 0.5, "rows": 4}])
+        self.assertEqual(timings.stage_totals()["load"]["calls"], len(options.required_reaction_channels) + 2)
+        text = prometheus_metrics(timings, {"data": {"hits": 3, "misses": 1, "nbytes": 100}})
+        self.assertIn('nugrade_stage_calls_total{stage="coverage"} 1', text)
+        self.assertIn('nugrade_channel_seconds_total{nuclide="7Li",reaction="N,TOT"}', text)
+        self.assertIn('nugrade_cache_hits_total{cache="data"} 3', text)
+
+    def test_timing_log(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            catalogue_path = os.path.join(output_dir, "all_reactions.csv")
+            pd.DataFrame({"Z": [3], "A": [7], "Symbol": ["Li"]}).to_csv(catalogue_path, index=False)
+            log_path = os.path.join(output_dir, "timings.jsonl")
+            with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+                main(["grade", "--projectile", "n", "--reactions", "N,TOT", "--catalogue", catalogue_path,
+                      "--output", os.path.join(output_dir, "reactions.csv"), "--timing-log", log_path,
+                      "--no-snapshot"])
+            with open(log_path) as log_file:
+                logged = [json.loads(line) for line in log_file]
+
+        self.assertIn({"stage": "load", "nuclide": "7Li", "reaction": "N,TOT"},
+                      [{name: record[name] for name in ("stage", "nuclide", "reaction")} for record in logged])
+        self.assertTrue(all(record["seconds"] >= 0 for record in logged))
+        self.assertIsNone(get_timings())
@@ -0,0 +1,60 @@
+from nugrade import *
+from nugrade.data_store import load_channel
+from nugrade.evaluations import register_library
+from nugrade.grading_functions import GradingCancelled, _grade_in_parallel
+from nugrade.weighting_functions import TabulatedSpectrum, register_spectrum
+import multiprocessing
+import os
+import tempfile
+import threading
+import unittest
+import pandas as pd
+
+
+class TestParallelGrading(unittest.TestCase):
+    def test_parallel_matches_serial(self):
+        options = MetricOptions()
+        options.set_neutrons()
+        with tempfile.TemporaryDirectory() as catalogue_dir:
+            catalogue_path = os.path.join(catalogue_dir, "all_reactions.csv")
+            pd.DataFrame({"Z": [3, 4, 3], "A": [7, 9, 6], "Symbol": ["Li", "Be", "Li"]}).to_csv(catalogue_path,
+                                                                                            index=False)
+            serial_metrics = grade_many_isotopes(options, catalogue_path=catalogue_path)
+            parallel_metrics = grade_many_isotopes(options, catalogue_path=catalogue_path, workers=2)
+
+        self.assertEqual(list(parallel_metrics.keys()), ["7Li", "9Be", "6Li"])
+        self.assertEqual(list(parallel_metrics.keys()), list(serial_metrics.keys()))
+        for isotope, serial_nuclide in serial_metrics.items():
+            parallel_nuclide = parallel_metrics[isotope]
+            self.assertEqual(parallel_nuclide.num_datasets, serial_nuclide.num_datasets)
+            for reaction_name, serial_reaction in serial_nuclide.reactions.items():
+                self.assertEqual(parallel_nuclide.reactions[reaction_name].score, serial_reaction.score)
+
+    def test_spawned_workers(self):
+        # Spectra and libraries registered in this process reach workers that are not forked from it
+        options = MetricOptions()
+        options.set_neutrons()
+        options.weighting_function = "flat-spawn"
+        options.evaluation = "endf8-spawn"
+        register_spectrum("flat-spawn", TabulatedSpectrum([1E-5, 2E7], [2.0, 2.0]))
+        data = load_channel(os.path.join("data", "n_3_7_N,TOT.csv"))
+        with tempfile.TemporaryDirectory() as library_dir:
+            library = data[["Energy", "endf8"]].drop_duplicates("Energy").rename(columns={"endf8": "XS"})
+            library.to_csv(os.path.join(library_dir, "n_3_7_N,TOT.csv"), index=False)
+            register_library("endf8-spawn", library_dir)
+            isotopes = [(3, 7, "Li"), (4, 9, "Be")]
+            graded = _grade_in_parallel(isotopes, options, 2, mp_context=multiprocessing.get_context("spawn"))
+            expected = grade_isotope(3, 7, "Li", options)
+        self.assertEqual(graded[0].reactions["N,TOT"].score, expected.reactions["N,TOT"].score)
+
+    def test_cancel(self):
+        options = MetricOptions()
+        options.set_neutrons()
+        cancel_event = threading.Event()
+        cancel_event.set()
+        with self.assertRaises(GradingCancelled):
+            _grade_in_parallel([(3, 7, "Li"), (4, 9, "Be")], options, 2, cancel_event=cancel_event)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+from nugrade import *
+from nugrade.data_store import load_channel
+from nugrade.nuclide import Reaction, plot_precision_json
+import gc
+import json
+import os
+import unittest
+import weakref
+
+
+class TestRenderCache(unittest.TestCase):
+    def test_chart_memoized(self):
+        options = MetricOptions()
+        options.set_neutrons()
+        metrics = {"7Li": grade_isotope(3, 7, "Li", options)}
+
+        chart_payload = plot_grades_json(metrics, options)
+        self.assertEqual(json.loads(chart_payload)["target_id"], "nuclide-chart")
+        self.assertIs(plot_grades_json(metrics, options), chart_payload)
+
+        # New graded results or options render a new chart
+        regraded_metrics = dict(metrics)
+        self.assertIsNot(plot_grades_json(regraded_metrics, options), chart_payload)
+        options.scored_metric = "relative_error"
+        self.assertIsNot(plot_grades_json(metrics, options), chart_payload)
+
+    def test_lazy_report_plots(self):
+        options = MetricOptions()
+        options.set_neutrons()
+        nuclide = grade_isotope(3, 7, "Li", options)
+        report = nuclide.gen_report(options, for_web=True, lazy_plots=True)
+        self.assertIn('data-plot-url="/reaction_plot/7Li/N%2CTOT/endf8"', report)
+        self.assertNotIn("<script", report)
+
+        reaction = nuclide.reactions["N,TOT"]
+        plot_payload = plot_precision_json(reaction, "endf8")
+        self.assertIn("doc", json.loads(plot_payload))
+        self.assertIs(plot_precision_json(reaction, "endf8"), plot_payload)
+        self.assertIsNot(plot_precision_json(reaction, "endf7-1"), plot_payload)
+
+        # Plots are cached per channel, without holding its raw data
+        reloaded = Reaction(reaction.mt, reaction.name)
+        reloaded.data = load_channel(os.path.join("data", "n_3_7_N,TOT.csv"), options.get_report_columns())
+        data_ref = weakref.ref(reloaded.data)
+        self.assertIs(plot_precision_json(reloaded, "endf8"), plot_payload)
+        reloaded.data = None
+        gc.collect()
+        self.assertIsNone(data_ref())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+from nugrade import *
+from nugrade.result_cache import options_key, estimate_metrics_nbytes
+import unittest
+
+
+class TestResultCache(unittest.TestCase):
+    def test_options_key(self):
+        options_1 = MetricOptions()
+        options_1.set_neutrons()
+        options_2 = MetricOptions()
+        options_2.set_neutrons()
+        options_2.upper_energy = 5000000
+        self.assertEqual(options_key(options_1), options_key(options_2))
+
+        options_2.weighting_function = "watt"
+        self.assertNotEqual(options_key(options_1), options_key(options_2))
+        options_2.weighting_function = None
+        options_2.set_protons()
+        self.assertNotEqual(options_key(options_1), options_key(options_2))
+
+    def test_lru_eviction(self):
+        options = MetricOptions()
+        options.set_neutrons()
+        options.required_reaction_channels = [(1, 'N,TOT')]
+        metrics = {"7Li": grade_isotope(3, 7, "Li", options)}
+        nbytes = estimate_metrics_nbytes(metrics)
+
+        cache = GradeCache(max_bytes=2*nbytes)
+        self.assertIsNone(cache.get(options))
+        cache.put(options, metrics)
+        self.assertIs(cache.get(options), metrics)
+
+        thermal_options = MetricOptions()
+        thermal_options.set_neutrons()
+        thermal_options.required_reaction_channels = [(1, 'N,TOT')]
+        thermal_options.weighting_function = "maxwell-boltzmann-room-temp"
+        watt_options = MetricOptions()
+        watt_options.set_neutrons()
+        watt_options.required_reaction_channels = [(1, 'N,TOT')]
+        watt_options.weighting_function = "watt"
+        cache.put(thermal_options, metrics)
+        cache.get(options)
+        cache.put(watt_options, metrics)
+
+        # The thermal results were least recently used and do not fit the budget
+        self.assertIsNone(cache.get(thermal_options))
+        self.assertIs(cache.get(watt_options), metrics)
+        stats = cache.stats()
+        self.assertEqual(stats["hits"], 3)
+        self.assertEqual(stats["misses"], 2)
+        self.assertEqual(stats["evictions"], 1)
+        self.assertEqual(stats["entries"], 2)
+
+    def test_catalogue_and_engine_key(self):
+        options = MetricOptions()
+        options.set_neutrons()
+        metrics = {}
+        cache = GradeCache(max_bytes=2**20)
+        cache.put(options, metrics, catalogue_path="data/all_reactions.csv", engine="nuclide")
+        self.assertIs(cache.get(options, "data/all_reactions.csv", "nuclide"), metrics)
+        self.assertIsNone(cache.get(options, "data/other_reactions.csv", "nuclide"))
+        self.assertIsNone(cache.get(options, "data/all_reactions.csv", "chart"))
+
+
+if __name__ == '__main__':
+    unittest.main()
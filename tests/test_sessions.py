@@ -0,0 +1,52 @@
+from nugrade import *
+from nugrade.sessions import UserSession, SessionStore
+import threading
+import unittest
+
+
+def new_user_session():
+    options = MetricOptions()
+    options.set_neutrons()
+    return UserSession(options, jobs=None)
+
+
+class TestSessionStore(unittest.TestCase):
+    def test_sessions_are_isolated(self):
+        user_sessions = SessionStore(new_user_session)
+        first_id, first_session = user_sessions.get_or_create()
+        second_id, second_session = user_sessions.get_or_create("unknown")
+        self.assertNotEqual(first_id, second_id)
+        first_session.options.set_protons()
+        self.assertIs(user_sessions.get_or_create(first_id)[1], first_session)
+        self.assertEqual(user_sessions.get_or_create(second_id)[1].options.projectile, "n")
+
+    def test_eviction(self):
+        user_sessions = SessionStore(new_user_session, max_sessions=2)
+        first_id = user_sessions.get_or_create()[0]
+        second_id = user_sessions.get_or_create()[0]
+        user_sessions.get_or_create(first_id)
+        user_sessions.get_or_create()
+        self.assertEqual(len(user_sessions), 2)
+        self.assertNotEqual(user_sessions.get_or_create(second_id)[0], second_id)
+
+        idle_sessions = SessionStore(new_user_session, idle_seconds=-1)
+        idle_id = idle_sessions.get_or_create()[0]
+        self.assertNotEqual(idle_sessions.get_or_create(idle_id)[0], idle_id)
+
+    def test_concurrent_sessions(self):
+        user_sessions = SessionStore(new_user_session)
+        session_ids = []
+
+        def visit():
+            session_id = user_sessions.get_or_create()[0]
+            for _ in range(50):
+                self.assertEqual(user_sessions.get_or_create(session_id)[0], session_id)
+            session_ids.append(session_id)
+
+        threads = [threading.Thread(target=visit) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(set(session_ids)), 8)
+        self.assertEqual(len(user_sessions), 8)
@@ -0,0 +1,74 @@
+from nugrade import *
+from nugrade.data_cache import ChannelDataCache
+from nugrade.grading_functions import reaction_results_table, experiment_results_table
+from nugrade.snapshot import data_fingerprint, load_snapshot, save_snapshot
+import os
+import tempfile
+import unittest
+import pandas as pd
+
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.snapshot_dir = tempfile.TemporaryDirectory()
+        self.catalogue_path = os.path.join(self.snapshot_dir.name, "all_reactions.csv")
+        pd.DataFrame({"Z": [3, 4], "A": [7, 9], "Symbol": ["Li", "Be"]}).to_csv(self.catalogue_path, index=False)
+        self.options = MetricOptions()
+        self.options.set_neutrons()
+        self.metrics = grade_many_isotopes(self.options, catalogue_path=self.catalogue_path)
+        save_snapshot(self.metrics, self.options, catalogue_path=self.catalogue_path,
+                      snapshot_path=self.snapshot_dir.name)
+
+    def tearDown(self):
+        self.snapshot_dir.cleanup()
+
+    def load(self, options):
+        return load_snapshot(options, catalogue_path=self.catalogue_path, snapshot_path=self.snapshot_dir.name)
+
+    def test_round_trip(self):
+        restored = self.load(self.options)
+        self.assertEqual(list(restored.keys()), list(self.metrics.keys()))
+        pd.testing.assert_frame_equal(reaction_results_table(restored, self.options),
+                                      reaction_results_table(self.metrics, self.options))
+        pd.testing.assert_frame_equal(experiment_results_table(restored), experiment_results_table(self.metrics),
+                                      check_dtype=False)
+        self.assertEqual(restored["7Li"].num_datasets, self.metrics["7Li"].num_datasets)
+
+        # Raw data is only read once needed
+        total = restored["7Li"].reactions["N,TOT"]
+        self.assertIsNotNone(total.data_loader)
+        self.assertEqual(len(total.data), len(self.metrics["7Li"].reactions["N,TOT"].data))
+
+    def test_invalidation(self):
+        other_options = MetricOptions()
+        other_options.set_neutrons()
+        other_options.upper_energy = 1.0
+        self.assertIsNone(self.load(other_options))
+
+        # Snapshots are kept apart per catalogue and per grading engine
+        other_catalogue = os.path.join(self.snapshot_dir.name, "other_reactions.csv")
+        pd.DataFrame({"Z": [3, 4], "A": [7, 9], "Symbol": ["Li", "Be"]}).to_csv(other_catalogue, index=False)
+        self.assertIsNone(load_snapshot(self.options, catalogue_path=other_catalogue,
+                                        snapshot_path=self.snapshot_dir.name))
+        self.assertIsNone(load_snapshot(self.options, catalogue_path=self.catalogue_path,
+                                        snapshot_path=self.snapshot_dir.name, engine="chart"))
+        self.assertIsNotNone(self.load(self.options))
+
+        # Any change to an input file invalidates the snapshot
+        stat = os.stat(self.catalogue_path)
+        os.utime(self.catalogue_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertIsNone(self.load(self.options))
+
+    def test_data_fingerprint(self):
+        with tempfile.TemporaryDirectory() as data_dir:
+            data_cache = ChannelDataCache(2**20, data_path=data_dir)
+            channel_path = data_cache.channel_path("n", 3, 7, "N,TOT")
+            fingerprint = data_fingerprint(self.options, self.catalogue_path, data_cache)
+            self.assertEqual(data_fingerprint(self.options, self.catalogue_path, data_cache), fingerprint)
+            with open(channel_path, "w") as channel_file:
+                channel_file.write("Energy,Data\n")
+            self.assertNotEqual(data_fingerprint(self.options, self.catalogue_path, data_cache), fingerprint)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+from nugrade import *
+from nugrade.evaluations import register_library
+from nugrade.sweep import sweep_grades
+import os
+import tempfile
+import unittest
+import pandas as pd
+
+
+class TestSweep(unittest.TestCase):
+    def test_sweep_matches_grading(self):
+        options = MetricOptions()
+        options.set_neutrons()
+        grid = {"lower_energy": [0.01, 1E5],
+                "energy_width": [0.01, 0.1],
+                "evaluation": ["endf8", "endf7-1"],
+                "weighting_function": [None, "watt"]}
+        with tempfile.TemporaryDirectory() as catalogue_dir:
+            catalogue_path = os.path.join(catalogue_dir, "all_reactions.csv")
+            pd.DataFrame({"Z": [3, 4], "A": [7, 9], "Symbol": ["Li", "Be"]}).to_csv(catalogue_path, index=False)
+            results = sweep_grades(options, grid, catalogue_path=catalogue_path)
+
+        self.assertEqual(results.index.names, list(grid.keys()))
+        self.assertEqual(len(results), 16)
+        self.assertEqual(set(results["nuclide"]), {"7Li"})
+
+        options.lower_energy = 1E5
+        options.energy_width = 0.1
+        options.evaluation = "endf7-1"
+        options.weighting_function = "watt"
+        reaction = grade_isotope(3, 7, "Li", options).reactions["N,TOT"]
+        result = results.xs((1E5, 0.1, "endf7-1", "watt"))
+        self.assertEqual(result["score"].item(), reaction.score)
+        self.assertEqual(result["average_metric"].item(), reaction.average_metric)
+        self.assertEqual(result["num_datapoints"].item(), 8107)
+
+    def test_sweep_skips_ungraded_channels(self):
+        options = MetricOptions()
+        options.set_neutrons()
+        with tempfile.TemporaryDirectory() as catalogue_dir:
+            catalogue_path = os.path.join(catalogue_dir, "all_reactions.csv")
+            pd.DataFrame({"Z": [3], "A": [7], "Symbol": ["Li"]}).to_csv(catalogue_path, index=False)
+            # A library without the channel leaves it ungraded
+            register_library("endf8-empty-sweep", catalogue_dir)
+            results = sweep_grades(options, {"evaluation": ["endf8", "endf8-empty-sweep"]},
+                                   catalogue_path=catalogue_path)
+            self.assertEqual(list(results.index), ["endf8"])
+
+            # Each projectile is graded from its own channel files, of which there are none for protons
+            results = sweep_grades(options, {"projectile": ["n", "p"]}, catalogue_path=catalogue_path)
+            self.assertEqual(list(results.index), ["n"])
+
+
+if __name__ == '__main__':
+    unittest.main()
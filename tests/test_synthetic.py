@@ -0,0 +1,48 @@
+from nugrade import *
+from nugrade.synthetic import synthetic_channel, synthetic_nuclides, write_synthetic_dataset
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+
+
+class TestSyntheticData(unittest.TestCase):
+    def test_channel_schema(self):
+        fixture = pd.read_csv("data/n_3_7_N,TOT.csv", nrows=5)
+        channel_data = synthetic_channel(26, 56, 1, 5000, seed=3)
+        self.assertEqual(list(channel_data.columns), [column for column in fixture.columns
+                                                      if not column.startswith("Unnamed")])
+        self.assertEqual(len(channel_data), 5000)
+        self.assertTrue(np.all(np.diff(channel_data["Energy"].to_numpy()) >= 0))
+        self.assertTrue(channel_data["dData"].isna().any())
+        self.assertFalse(channel_data["dData_assumed"].isna().any())
+        self.assertGreater(channel_data["EXFOR_Entry"].nunique(), 1)
+
+    def test_deterministic(self):
+        pd.testing.assert_frame_equal(synthetic_channel(26, 56, 102, 2000, seed=1),
+                                      synthetic_channel(26, 56, 102, 2000, seed=1))
+        self.assertFalse(synthetic_channel(26, 56, 102, 2000, seed=1)["Data"].equals(
+                         synthetic_channel(26, 56, 102, 2000, seed=2)["Data"]))
+        nuclides = synthetic_nuclides(3000)
+        self.assertEqual(len(set(nuclides)), 3000)
+
+    def test_grade_synthetic_dataset(self):
+        options = MetricOptions()
+        options.set_neutrons()
+        with tempfile.TemporaryDirectory() as data_path:
+            num_points = write_synthetic_dataset(data_path, 4, 500, seed=0)
+            catalogue = pd.read_csv(os.path.join(data_path, "all_reactions.csv"))
+            Z, A = catalogue.iloc[-1][["Z", "A"]]
+            reaction = Reaction(1, "N,TOT")
+            reaction.load_data(os.path.join(data_path, f"n_{Z}_{A}_N,TOT.csv"), options.get_data_columns())
+            with contextlib.redirect_stdout(io.StringIO()):
+                reaction.calc_metrics(options)
+
+        self.assertEqual(len(catalogue), 4)
+        self.assertGreater(num_points, 0)
+        self.assertGreater(reaction.score, 0.0)
+        self.assertTrue(np.isfinite(reaction.score))
+        self.assertTrue(np.isfinite(reaction.average_metric))
@@ -0,0 +1,66 @@
+from nugrade import *
+from nugrade.weighting_functions import TabulatedSpectrum, WeightCache, register_spectrum, watt
+import os
+import tempfile
+import unittest
+import numpy as np
+
+
+class TestWeightingFunctions(unittest.TestCase):
+    def test_tabulated_spectra(self):
+        energies = np.logspace(-2, 7, 200)
+        pointwise = TabulatedSpectrum(energies, watt(energies))
+        test_energies = np.array([1E3, 2.5E5, 1E6])
+        self.assertTrue(np.allclose(pointwise(test_energies), watt(test_energies), rtol=1E-2))
+        self.assertEqual(pointwise(np.array([1E-3, 2E7])).tolist(), [0.0, 0.0])
+
+        # A 1/E spectrum in equal lethargy groups has the same flux in every group
+        boundaries = np.logspace(0, 6, 7)
+        grouped = TabulatedSpectrum(boundaries, np.ones(6), groups=True)
+        self.assertTrue(np.allclose(grouped(np.array([10.0, 1E3, 1E5])) * np.array([10.0, 1E3, 1E5]),
+                                    grouped(np.array([10.0]))[0] * 10.0, rtol=1E-9))
+
+        with tempfile.TemporaryDirectory() as spectrum_dir:
+            spectrum_path = os.path.join(spectrum_dir, "core.csv")
+            np.savetxt(spectrum_path, np.column_stack((boundaries[:-1], boundaries[1:], np.ones(6))),
+                       delimiter=",", header="Lower_Energy,Upper_Energy,Flux", comments="")
+            self.assertTrue(np.allclose(TabulatedSpectrum.from_csv(spectrum_path)(test_energies),
+                                        grouped(test_energies)))
+
+    def test_registered_spectrum_grading(self):
+        options = MetricOptions()
+        options.set_neutrons()
+        options.weighting_function = "watt"
+        watt_score = grade_isotope(3, 7, "Li", options).reactions["N,TOT"].score
+
+        # A registered spectrum replaces any cached results weighted by an older one of the same name
+        energies = np.logspace(-3, 8, 2000)
+        options.weighting_function = "core"
+        register_spectrum("core", TabulatedSpectrum(energies, np.ones(2000)))
+        flat_score = grade_isotope(3, 7, "Li", options).reactions["N,TOT"].score
+        register_spectrum("core", TabulatedSpectrum(energies, watt(energies)))
+        core_score = grade_isotope(3, 7, "Li", options).reactions["N,TOT"].score
+        self.assertNotEqual(flat_score, core_score)
+        self.assertAlmostEqual(core_score, watt_score, places=2)
+
+    def test_unknown_spectrum(self):
+        # An unknown name falls back to constant flux with a warning
+        options = MetricOptions()
+        options.set_neutrons()
+        constant_score = grade_isotope(3, 7, "Li", options).reactions["N,TOT"].score
+        options.weighting_function = "no-such-spectrum"
+        with self.assertLogs("nugrade.weighting_functions", level="WARNING"):
+            unknown_score = grade_isotope(3, 7, "Li", options).reactions["N,TOT"].score
+        self.assertEqual(unknown_score, constant_score)
+
+    def test_weight_cache(self):
+        weight_cache = WeightCache(max_bytes=1024**2)
+        energies = np.logspace(0, 6, 100)
+        weights = weight_cache.get_weights("watt", energies)
+        self.assertIs(weight_cache.get_weights("watt", energies), weights)
+        self.assertIsNot(weight_cache.get_weights("watt", energies.copy()), weights)
+        self.assertEqual(weight_cache.stats()["hits"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()